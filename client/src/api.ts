@@ -60,6 +60,22 @@ export interface Task {
   } | null
 }
 
+// Applies a change feed delta (GET /tasks/?since= or the task_delta WebSocket event):
+// changed rows replace or join the list, removed ids leave it. The feed only carries
+// regular tasks, so tutorial rows are left alone.
+export function applyTaskDelta(tasks: Task[], rows: Task[], removed: number[]): Task[] {
+  const changed = new Map(rows.map((t) => [t.id, t]))
+  const gone = new Set(removed)
+  const next = tasks
+    .filter((t) => t.is_tutorial || !gone.has(t.id))
+    .map((t) => {
+      const row = t.is_tutorial ? undefined : changed.get(t.id)
+      if (row) changed.delete(t.id)
+      return row ?? t
+    })
+  return [...next, ...changed.values()]
+}
+
 export interface TutorialAnswer {
   id: number
   text: string
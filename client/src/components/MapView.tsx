@@ -1,7 +1,7 @@
 import { useEffect, useState, useRef, useCallback } from 'react'
 import { MapContainer, TileLayer, CircleMarker, Circle, Marker, Popup, useMap } from 'react-leaflet'
 import L from 'leaflet'
-import api, { type Task, type User, type NewAchievement, STATE_LABELS, haversineKm, formatDistance, formatMinutes, formatCountdown, realTaskId } from '../api'
+import api, { type Task, type User, type NewAchievement, STATE_LABELS, haversineKm, formatDistance, formatMinutes, formatCountdown, realTaskId, applyTaskDelta } from '../api'
 import { getTheme, applyTheme, TILE_CONFIGS, getGoogleTileUrl, invalidateGoogleSession, type TileConfig, type Theme } from '../theme'
 import Chat from './Chat'
 import TasksSidebar from './TasksSidebar'
@@ -266,6 +266,7 @@ export default function MapView({ user, onLogout }: Props) {
   const {
     friends, publicUsers, chatMessages, selfLocation, sendChatMessage,
     friendEvents, clearFriendEvents, onlineFriendIds,
+    taskDeltas, clearTaskDeltas,
   } = useLocationSocket({
     token,
     username: user.username,
@@ -279,15 +280,44 @@ export default function MapView({ user, onLogout }: Props) {
     }
   }, [chatMessages.length]) // eslint-disable-line react-hooks/exhaustive-deps
 
+  // Change feed revision the task list is current to (from the last full fetch or ?since= sync)
+  const revisionRef = useRef<number | null>(null)
+
   const fetchTasks = useCallback(async () => {
     try {
-      const res = await api.get('/tasks/')
+      const res = await api.get('/tasks/', { params: { stream: 1 } })
       setTasks(res.data.tasks ?? res.data)
+      revisionRef.current = res.data.revision ?? null
     } catch {
       setError('Failed to load tasks')
     }
   }, [])
 
+  // Catch up on task rows through the change feed instead of re-reading the whole list.
+  // Tutorials are not in the feed, so tutorial changes still call fetchTasks().
+  const syncTasks = useCallback(async () => {
+    if (revisionRef.current == null) return fetchTasks()
+    try {
+      const res = await api.get('/tasks/', { params: { since: revisionRef.current } })
+      if (!('removed' in res.data)) {
+        // The feed no longer covers our revision: the response is the full list
+        setTasks(res.data.tasks)
+      } else {
+        setTasks((prev) => applyTaskDelta(prev, res.data.tasks, res.data.removed))
+      }
+      revisionRef.current = res.data.revision
+    } catch {
+      setError('Failed to load tasks')
+    }
+  }, [fetchTasks])
+
+  // ── Task deltas from WebSocket (rows already filtered to this user) ──
+  useEffect(() => {
+    if (taskDeltas.length === 0) return
+    setTasks((prev) => taskDeltas.reduce((list, d) => applyTaskDelta(list, d.tasks, d.removed), prev))
+    clearTaskDeltas()
+  }, [taskDeltas, clearTaskDeltas])
+
   const fetchUser = useCallback(async () => {
     try {
       const res = await api.get('/user/')
@@ -315,7 +345,7 @@ export default function MapView({ user, onLogout }: Props) {
     const urlPrefix = isTutorial && (action === 'start' || action === 'abandon') ? 'tutorial_task' : 'task'
     try {
       const res = await api.post(`/${urlPrefix}/${realId}/${action}`)
-      await fetchTasks()
+      await (isTutorial ? fetchTasks() : syncTasks())
       if (action === 'accept_review' || action === 'finish') await fetchUser()
       if (res.data?.new_achievements?.length) {
         setAchievementToasts((prev) => [...prev, ...res.data.new_achievements])
@@ -577,7 +607,7 @@ export default function MapView({ user, onLogout }: Props) {
             xpModifier={xpModifier}
             timeModifierMinutes={timeModifierMinutes}
             criticalityPercentage={criticalityPercentage}
-            onFinished={(id, name) => { setRatingTarget({ id, name, requireComment: activeTask.require_comment ?? false }); fetchTasks() }}
+            onFinished={(id, name) => { setRatingTarget({ id, name, requireComment: activeTask.require_comment ?? false }); syncTasks() }}
             onAction={handleTaskAction}
             onLocate={handleTaskClick}
           />
@@ -701,7 +731,7 @@ export default function MapView({ user, onLogout }: Props) {
           lat={createTaskPos.lat}
           lon={createTaskPos.lon}
           userSkills={currentUser.skills}
-          onCreated={fetchTasks}
+          onCreated={syncTasks}
           onClose={() => setCreateTaskPos(null)}
         />
       )}
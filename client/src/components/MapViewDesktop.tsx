@@ -1,7 +1,7 @@
 import { useEffect, useState, useRef, useCallback } from 'react'
 import { MapContainer, TileLayer, Circle, Marker, Popup, useMap, useMapEvents } from 'react-leaflet'
 import L from 'leaflet'
-import api, { type Task, type User, type NewAchievement, STATE_LABELS, haversineKm, formatDistance, formatMinutes, formatCountdown, realTaskId } from '../api'
+import api, { type Task, type User, type NewAchievement, STATE_LABELS, haversineKm, formatDistance, formatMinutes, formatCountdown, realTaskId, applyTaskDelta } from '../api'
 import { getTheme, applyTheme, TILE_CONFIGS, getGoogleTileUrl, invalidateGoogleSession, type TileConfig, type Theme } from '../theme'
 import Chat from './ChatDesktop'
 import TasksSidebar from './TasksSidebarDesktop'
@@ -241,7 +241,7 @@ export default function MapView({ user, onLogout }: Props) {
 
   const {
     friends, publicUsers, chatMessages, selfLocation, locationError, sendChatMessage,
-    taskUpdates, clearTaskUpdates, userStats, clearUserStats,
+    taskUpdates, clearTaskUpdates, taskDeltas, clearTaskDeltas, userStats, clearUserStats,
     wsAchievements, clearWsAchievements, friendEvents, clearFriendEvents, onlineFriendIds,
     tutorialReviewAccepted, clearTutorialReviewAccepted,
     tutorialReviewDeclined, clearTutorialReviewDeclined,
@@ -252,15 +252,44 @@ export default function MapView({ user, onLogout }: Props) {
     userId: user.id,
   })
 
+  // Change feed revision the task list is current to (from the last full fetch or ?since= sync)
+  const revisionRef = useRef<number | null>(null)
+
   const fetchTasks = useCallback(async () => {
     try {
-      const res = await api.get('/tasks/')
+      const res = await api.get('/tasks/', { params: { stream: 1 } })
       setTasks(res.data.tasks ?? res.data)
+      revisionRef.current = res.data.revision ?? null
     } catch {
       setError('Failed to load tasks')
     }
   }, [])
 
+  // Catch up on task rows through the change feed instead of re-reading the whole list.
+  // Tutorials are not in the feed, so tutorial changes still call fetchTasks().
+  const syncTasks = useCallback(async () => {
+    if (revisionRef.current == null) return fetchTasks()
+    try {
+      const res = await api.get('/tasks/', { params: { since: revisionRef.current } })
+      if (!('removed' in res.data)) {
+        // The feed no longer covers our revision: the response is the full list
+        setTasks(res.data.tasks)
+      } else {
+        setTasks((prev) => applyTaskDelta(prev, res.data.tasks, res.data.removed))
+      }
+      revisionRef.current = res.data.revision
+    } catch {
+      setError('Failed to load tasks')
+    }
+  }, [fetchTasks])
+
+  // ── Task deltas from WebSocket (rows already filtered to this user) ──
+  useEffect(() => {
+    if (taskDeltas.length === 0) return
+    setTasks((prev) => taskDeltas.reduce((list, d) => applyTaskDelta(list, d.tasks, d.removed), prev))
+    clearTaskDeltas()
+  }, [taskDeltas, clearTaskDeltas])
+
   const fetchUser = useCallback(async () => {
     try {
       const res = await api.get('/user/')
@@ -292,9 +321,9 @@ export default function MapView({ user, onLogout }: Props) {
     const needsRefetch = taskUpdates.some((e) =>
       ['decline_review', 'accept_review', 'abandon', 'reset'].includes(e.action)
     )
-    if (needsRefetch) fetchTasks()
+    if (needsRefetch) syncTasks()
     clearTaskUpdates()
-  }, [taskUpdates, clearTaskUpdates, fetchTasks])
+  }, [taskUpdates, clearTaskUpdates, syncTasks])
 
   // ── Live user stats from WebSocket ──
   useEffect(() => {
@@ -379,7 +408,7 @@ export default function MapView({ user, onLogout }: Props) {
         ? { latitude: selfLocation.lat, longitude: selfLocation.lon }
         : undefined
       const res = await api.post(`/${urlPrefix}/${realId}/${action}`, body)
-      await fetchTasks()
+      await (isTutorial ? fetchTasks() : syncTasks())
       if (action === 'accept_review' || action === 'finish') {
         await fetchUser()
       }
@@ -648,7 +677,7 @@ export default function MapView({ user, onLogout }: Props) {
                 xpModifier={xpModifier}
                 timeModifierMinutes={timeModifierMinutes}
                 criticalityPercentage={criticalityPercentage}
-                onFinished={(id, name) => { setRatingTarget({ id, name, requireComment: activeTask.require_comment ?? false }); fetchTasks() }}
+                onFinished={(id, name) => { setRatingTarget({ id, name, requireComment: activeTask.require_comment ?? false }); syncTasks() }}
                 onAction={handleTaskAction}
                 onLocate={handleTaskClick}
               />
@@ -681,7 +710,7 @@ export default function MapView({ user, onLogout }: Props) {
               lat={createTaskPos.lat}
               lon={createTaskPos.lon}
               userSkills={currentUser.skills}
-              onCreated={fetchTasks}
+              onCreated={syncTasks}
               onClose={() => setCreateTaskPos(null)}
             />
           )}
@@ -1,6 +1,6 @@
 import { useEffect, useRef, useState, useCallback } from 'react'
 import * as Sentry from '@sentry/react'
-import api from '../api'
+import api, { type Task } from '../api'
 
 export interface FriendLocation {
   userId: number
@@ -49,6 +49,12 @@ export interface TaskUpdateEvent {
   action: string
 }
 
+export interface TaskDeltaEvent {
+  revision: number
+  tasks: Task[]
+  removed: number[]
+}
+
 export interface UserStatsEvent {
   coins: number
   xp: number
@@ -121,6 +127,7 @@ export function useLocationSocket({ token, username, userId }: Props) {
 
   // New real-time state
   const [taskUpdates, setTaskUpdates] = useState<TaskUpdateEvent[]>([])
+  const [taskDeltas, setTaskDeltas] = useState<TaskDeltaEvent[]>([])
   const [userStats, setUserStats] = useState<UserStatsEvent | null>(null)
   const [wsAchievements, setWsAchievements] = useState<WsAchievement[]>([])
   const [friendEvents, setFriendEvents] = useState<FriendEvent[]>([])
@@ -216,6 +223,7 @@ export function useLocationSocket({ token, username, userId }: Props) {
 
   // Consume task updates (called by MapView after processing)
   const clearTaskUpdates = useCallback(() => setTaskUpdates([]), [])
+  const clearTaskDeltas = useCallback(() => setTaskDeltas([]), [])
   const clearUserStats = useCallback(() => setUserStats(null), [])
   const clearWsAchievements = useCallback(() => setWsAchievements([]), [])
   const clearFriendEvents = useCallback(() => setFriendEvents([]), [])
@@ -226,10 +234,16 @@ export function useLocationSocket({ token, username, userId }: Props) {
     if (!token) return
 
     const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws'
-    const ws = new WebSocket(`${protocol}://${window.location.host}/ws/location/?token=${token}`)
+    // deltas=1: task row changes arrive as task_delta (rows filtered to this user) instead of tasks_changed
+    const ws = new WebSocket(`${protocol}://${window.location.host}/ws/location/?token=${token}&deltas=1`)
     socketRef.current = ws
 
     ws.onopen = () => {
+      // Initial presence snapshot; later changes arrive as friend_online / user_offline / presence_update
+      api.get('/friends/presence/').then((res) => {
+        setOnlineFriendIds(new Set<number>(res.data.online ?? []))
+      }).catch(() => {})
+
       // Send heartbeat every 5s
       heartbeatIntervalRef.current = setInterval(() => {
         if (ws.readyState === WebSocket.OPEN) {
@@ -270,12 +284,6 @@ export function useLocationSocket({ token, username, userId }: Props) {
               })
               return next
             })
-            // Friend sending location = they're online
-            setOnlineFriendIds((prev) => {
-              const next = new Set(prev)
-              next.add(uid)
-              return next
-            })
             break
           }
 
@@ -330,6 +338,26 @@ export function useLocationSocket({ token, username, userId }: Props) {
             break
           }
 
+          case 'presence_update': {
+            // Batched presence changes (e.g. friends whose connections timed out)
+            const offline: number[] = data.offline ?? []
+            const online: number[] = data.online ?? []
+            if (offline.length) {
+              setFriends((prev) => {
+                const next = new Map(prev)
+                offline.forEach((uid) => next.delete(uid))
+                return next
+              })
+            }
+            setOnlineFriendIds((prev) => {
+              const next = new Set(prev)
+              offline.forEach((uid) => next.delete(uid))
+              online.forEach((uid) => next.add(uid))
+              return next
+            })
+            break
+          }
+
           case 'heartbeat_response':
             break
 
@@ -360,6 +388,10 @@ export function useLocationSocket({ token, username, userId }: Props) {
             setTaskUpdates((prev) => [...prev, data as TaskUpdateEvent])
             break
 
+          case 'task_delta':
+            setTaskDeltas((prev) => [...prev, data as TaskDeltaEvent])
+            break
+
           case 'user_stats_update':
             setUserStats(data as UserStatsEvent)
             break
@@ -439,6 +471,7 @@ export function useLocationSocket({ token, username, userId }: Props) {
     friends, publicUsers, chatMessages, selfLocation, locationError, sendChatMessage,
     // New real-time data
     taskUpdates, clearTaskUpdates,
+    taskDeltas, clearTaskDeltas,
     userStats, clearUserStats,
     wsAchievements, clearWsAchievements,
     friendEvents, clearFriendEvents,
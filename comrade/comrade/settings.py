@@ -21,6 +21,11 @@ DEBUG = os.environ.get('DEBUG', 'True') == 'True'
 
 ALLOWED_HOSTS = [h.strip() for h in os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',') if h.strip()]
 
+# Public base URL of the API (e.g. https://api.example.com). Rows serialized outside a
+# request (task_delta broadcasts) build absolute file URLs against it, as REST responses do
+# against the request host. Unset: those rows carry relative file URLs.
+SITE_URL = os.environ.get('SITE_URL', '')
+
 # Trust X-Forwarded-Proto from Railway's load balancer so Django knows requests are HTTPS
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
@@ -51,11 +56,12 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "comrade_core.middleware.WebSocketEventsMiddleware",
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'comrade_core.authentication.CachedTokenAuthentication',
     ],
 }
 
@@ -69,6 +75,35 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Shared cache (achievement progress snapshots, ...) on the same Redis as the channel layer.
+# Without REDIS_URL (tests, local dev without Redis) it falls back to a per-process LocMemCache.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', (
+    'django.core.cache.backends.redis.RedisCache' if 'REDIS_URL' in os.environ
+    else 'django.core.cache.backends.locmem.LocMemCache'
+))
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'comrade',
+    },
+}
+
+# Sorted-set leaderboards (comrade_core.leaderboard); per-process MemoryLeaderboardBackend without REDIS_URL
+LEADERBOARD_BACKEND = os.environ.get('LEADERBOARD_BACKEND', (
+    'comrade_core.leaderboard.RedisLeaderboardBackend' if 'REDIS_URL' in os.environ
+    else 'comrade_core.leaderboard.MemoryLeaderboardBackend'
+))
+
+# WebSocket presence registry (comrade_core.presence); per-process MemoryPresenceBackend without REDIS_URL
+PRESENCE_BACKEND = os.environ.get('PRESENCE_BACKEND', (
+    'comrade_core.presence.RedisPresenceBackend' if 'REDIS_URL' in os.environ
+    else 'comrade_core.presence.MemoryPresenceBackend'
+))
+
+# Tick (seconds) at which WebSocket connections opened with ?batch=1 receive their queued events
+WS_BATCH_INTERVAL = float(os.environ.get('WS_BATCH_INTERVAL', '0.25'))
+
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOWED_ORIGINS = [o.strip() for o in os.environ.get(
     'CORS_ALLOWED_ORIGINS', 'http://localhost:8000,http://127.0.0.1:8000,http://localhost:3000'
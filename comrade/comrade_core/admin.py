@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import UserChangeForm
 
-from .models import Skill, Task, User, GlobalConfig, Rating, Review, TutorialTask, TutorialPart, TutorialQuestion, TutorialAnswer, TutorialProgress, TutorialReview, TutorialPartSubmission, Achievement, UserAchievement, ChatMessage, BugReport, BugReportScreenshot, OnboardingTemplate, UserOnboardingTutorial, UserOnboardingTask
+from .models import Skill, Task, User, GlobalConfig, Rating, Review, TutorialTask, TutorialPart, TutorialQuestion, TutorialAnswer, TutorialProgress, TutorialReview, TutorialPartSubmission, Achievement, UserAchievement, RewardLedger, ChatMessage, BugReport, BugReportScreenshot, OnboardingTemplate, UserOnboardingTutorial, UserOnboardingTask
 
 
 class UserChangeForm(UserChangeForm):
@@ -21,6 +21,8 @@ class ComradeUserAdmin(UserAdmin):
     form = UserChangeForm
     list_display = ['username', 'email', 'location_sharing_level', 'coins', 'xp', 'task_streak']
     inlines = [UserAchievementInline]
+    # Balances are a snapshot of the reward ledger: correct them with an adjustment entry
+    readonly_fields = ['coins', 'xp', 'total_coins_earned', 'total_xp_earned']
     list_filter = ['location_sharing_level', 'is_staff', 'is_active']
     search_fields = ['username', 'email', 'first_name', 'last_name']
 
@@ -58,6 +60,31 @@ class ComradeUserAdmin(UserAdmin):
         return False
 
 
+class RewardLedgerAdmin(admin.ModelAdmin):
+    list_display = ['user', 'kind', 'coins', 'xp', 'task', 'achievement', 'note', 'created_at', 'compacted']
+    list_filter = ['kind', 'compacted']
+    search_fields = ['user__username', 'note']
+    date_hierarchy = 'created_at'
+    raw_id_fields = ['user']
+    fields = ['user', 'coins', 'xp', 'note']
+
+    def save_model(self, request, obj, form, change):
+        # Entries added here are always adjustments; rewards come from the write paths
+        obj.kind = RewardLedger.Kind.ADJUSTMENT
+        super().save_model(request, obj, form, change)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def has_module_permission(self, request):
+        if request.user.is_superuser:
+            return True
+        return False
+
+
 class TaskAdmin(admin.ModelAdmin):
     list_display = [
         'name', 'state', 'owner', 'assignee', 'lat', 'lon',
@@ -385,6 +412,7 @@ admin.site.register(TutorialQuestion, TutorialQuestionAdmin)
 admin.site.register(TutorialProgress, TutorialProgressAdmin)
 admin.site.register(Achievement, AchievementAdmin)
 admin.site.register(UserAchievement, UserAchievementAdmin)
+admin.site.register(RewardLedger, RewardLedgerAdmin)
 admin.site.register(ChatMessage, ChatMessageAdmin)
 
 
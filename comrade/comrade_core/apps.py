@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ComradeCoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "comrade_core"
+
+    def ready(self):
+        # Token cache invalidation receivers
+        from . import authentication  # noqa: F401
@@ -0,0 +1,111 @@
+"""
+Cached token authentication.
+
+Token → user lookups are served from the Django cache (Redis): the token
+maps to a user id and the user id to the User row's fields, both for
+_AUTH_TTL seconds. Credentials and the location columns are left out of the
+cached fields; the location is loaded from the database if a request reads
+it, so buffered location writes do not have to evict active users. The DRF authentication class and the WebSocket consumer share the
+cache, so a reconnect storm after a deploy costs cache reads instead of one
+token/user join per socket.
+
+Invalidation: User.save()/delete() and bulk User updates (invalidate_users())
+drop the user entry; deleting or rotating a token drops the token entry
+(signal receivers below, connected when the app is ready).
+"""
+
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+_AUTH_TTL = 300  # seconds; safety net for changes made outside the invalidating write paths
+
+# Never cached: credentials, and the position columns rewritten by every location flush
+_UNCACHED_USER_FIELDS = {'password', 'last_login', 'latitude', 'longitude', 'timestamp'}
+
+
+def _token_cache_key(key: str) -> str:
+    # Hashed so raw tokens never appear in cache key listings
+    return 'auth:token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def _user_cache_key(user_id: int) -> str:
+    return f'auth:user:{user_id}'
+
+
+def _user_fields(user) -> dict:
+    return {
+        field.attname: getattr(user, field.attname)
+        for field in user._meta.concrete_fields
+        if field.attname not in _UNCACHED_USER_FIELDS
+    }
+
+
+def _user_from_fields(fields: dict):
+    # The uncached fields are deferred and load on access
+    User = get_user_model()
+    return User.from_db(router.db_for_read(User), list(fields), list(fields.values()))
+
+
+def get_user_for_token(key: str | None):
+    """The User a token belongs to (cached), or None if the token does not exist."""
+    if not key:
+        return None
+    user_id = cache.get(_token_cache_key(key))
+    if user_id is not None:
+        fields = cache.get(_user_cache_key(user_id))
+        if fields is not None:
+            return _user_from_fields(fields)
+    try:
+        token = Token.objects.select_related('user').get(key=key)
+    except Token.DoesNotExist:
+        return None
+    cache.set_many({
+        _token_cache_key(key): token.user_id,
+        _user_cache_key(token.user_id): _user_fields(token.user),
+    }, _AUTH_TTL)
+    return token.user
+
+
+def invalidate_users(*user_ids) -> None:
+    """Drop cached User fields after they changed.
+
+    Dropped right away and again on commit, so a concurrent request cannot
+    keep a pre-commit copy cached.
+    """
+    keys = [_user_cache_key(user_id) for user_id in user_ids if user_id is not None]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_token(key: str) -> None:
+    cache.delete(_token_cache_key(key))
+    transaction.on_commit(lambda: cache.delete(_token_cache_key(key)))
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def _token_changed(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication backed by get_user_for_token(). request.auth is the token key."""
+
+    def authenticate_credentials(self, key):
+        user = get_user_for_token(key)
+        if user is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return user, key
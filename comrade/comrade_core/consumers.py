@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 import time as _time
@@ -6,89 +7,259 @@ from urllib.parse import parse_qs
 from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
 from django.utils import timezone
-from rest_framework.authtoken.models import Token
 
-from .models import User, ChatMessage
+from . import presence, wire
+from .authentication import get_user_for_token
+from .models import GlobalConfig, User, ChatMessage
+from .utils import geohash_encode, geohash_neighborhood, geohash_precision_for_radius, haversine_km
+from .visibility import TaskVisibility
 
 logger = logging.getLogger(__name__)
 
-# Shared group for public location broadcasts (all connected users join this)
+# Shared group for broadcasts to every socket (task deltas, tasks_changed; all connected users join this)
 PUBLIC_LOCATIONS_GROUP = 'public_locations'
 
+# Public locations are published to the sender's geohash cell group; each socket
+# subscribes to its own cell and the neighbouring ones. The cell precision is
+# derived from GlobalConfig.max_distance_km so the neighbourhood covers the radius.
+_CELL_GROUP_PREFIX = 'location_cell_'
+# Sockets that have not reported a position yet have no cell: they get every public location
+_UNPLACED_GROUP = 'location_unplaced'
+
 # How often to refresh user profile from DB (seconds)
 _PROFILE_REFRESH_INTERVAL = 60
 
-
-class LocationConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        query_string = self.scope['query_string'].decode()
-        query_params = parse_qs(query_string)
-        token_key = query_params.get('token', [None])[0]
+# Location pipeline: a ping is re-broadcast only if at least _LOCATION_MIN_INTERVAL
+# seconds passed and the user moved _LOCATION_MIN_DISTANCE_M since the last
+# broadcast, or _LOCATION_KEEPALIVE seconds passed (stationary users stay fresh)
+_LOCATION_MIN_INTERVAL = 3
+_LOCATION_MIN_DISTANCE_M = 10
+_LOCATION_KEEPALIVE = 30
+# Latest positions are written to the DB in one bulk UPDATE this often (seconds)
+_LOCATION_FLUSH_INTERVAL = 10
+
+
+def should_broadcast_location(last, latitude: float, longitude: float, at: float) -> bool:
+    """Throttle check against the last broadcast (latitude, longitude, monotonic time), or None."""
+    if last is None:
+        return True
+    last_lat, last_lon, last_at = last
+    elapsed = at - last_at
+    if elapsed < _LOCATION_MIN_INTERVAL:
+        return False
+    if elapsed >= _LOCATION_KEEPALIVE:
+        return True
+    return haversine_km(last_lat, last_lon, latitude, longitude) * 1000 >= _LOCATION_MIN_DISTANCE_M
+
+
+def _write_locations(pending: dict):
+    User.objects.bulk_update(
+        [
+            User(id=user_id, latitude=latitude, longitude=longitude, timestamp=timestamp)
+            for user_id, (latitude, longitude, timestamp) in pending.items()
+        ],
+        ['latitude', 'longitude', 'timestamp'],
+        batch_size=500,
+    )
+    # No invalidate_users(): the location columns are not part of the cached user
+
+
+class LocationBuffer:
+    """Latest reported position per user, persisted in one bulk UPDATE per flush interval.
+
+    Shared by every consumer in the process. A background task on the event
+    loop flushes it while positions are pending; a disconnecting consumer
+    flushes its own user right away.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: dict[int, tuple] = {}
+        self._task = None
+
+    def put(self, user_id: int, latitude: float, longitude: float, timestamp):
+        self._pending[user_id] = (latitude, longitude, timestamp)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def flush(self, user_id: int | None = None):
+        if user_id is None:
+            pending, self._pending = self._pending, {}
+        elif user_id in self._pending:
+            pending = {user_id: self._pending.pop(user_id)}
+        else:
+            return
+        if not pending:
+            return
         try:
-            token = await database_sync_to_async(Token.objects.get)(key=token_key)
-            self.user = await sync_to_async(lambda: token.user)()
-            if not self.user.is_authenticated:
-                await self.close()
-                return
+            await database_sync_to_async(_write_locations)(pending)
+        except Exception:
+            # Keep the positions for the next flush unless a newer one arrived
+            for pending_user_id, position in pending.items():
+                self._pending.setdefault(pending_user_id, position)
+            raise
 
-            # Per-user group for targeted messages (task updates, stats, achievements, etc.)
-            self.location_group = f"location_{self.user.id}"
-            await self.channel_layer.group_add(self.location_group, self.channel_name)
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Location flush failed")
 
-            # Shared group for public location broadcasts
-            await self.channel_layer.group_add(PUBLIC_LOCATIONS_GROUP, self.channel_name)
 
-            await self.accept()
-            logger.info("WS connect: user %d (%s)", self.user.id, self.user.username)
+_location_buffer = LocationBuffer(_LOCATION_FLUSH_INTERVAL)
 
-            # Cache friends list and profile refresh timestamp
-            self._friends_cache = await database_sync_to_async(lambda: list(self.user.get_friends()))()
-            self._friends_ids = {f.id for f in self._friends_cache}
-            self._profile_refreshed_at = _time.monotonic()
+# Events for which only the latest pending one matters (per user for locations)
+_COLLAPSED_PER_USER = ('friend_location', 'public_location')
+_COLLAPSED = ('tasks_changed',)
 
-            # Notify friends that this user came online
-            online_msg = {
-                'type': 'friend_online',
-                'userId': self.user.id,
-                'name': f"{self.user.first_name} {self.user.last_name}".strip() or self.user.username,
-            }
-            for friend in self._friends_cache:
-                await self.channel_layer.group_send(f"location_{friend.id}", online_msg)
 
-        except Token.DoesNotExist:
+def outbox_key(event: dict):
+    """Collapse key of an outbound event, or None if every occurrence must be delivered."""
+    if event['type'] in _COLLAPSED_PER_USER:
+        return event['type'], event['userId']
+    if event['type'] in _COLLAPSED:
+        return (event['type'],)
+    return None
+
+
+class Outbox:
+    """Per-connection buffer of encoded outbound frames, drained once per batching tick.
+
+    A frame with a collapse key replaces the pending frame with the same key
+    in its original slot, so superseded locations and repeated tasks_changed
+    signals are sent once without reordering the batch.
+    """
+
+    def __init__(self):
+        self._frames = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def add(self, key, frame):
+        if key is None:
+            # Unique int key; collapse keys are tuples, so they never clash
+            key = self._seq
+            self._seq += 1
+        self._frames[key] = frame
+
+    def drain(self) -> list:
+        frames = list(self._frames.values())
+        self._frames.clear()
+        return frames
+
+
+class LocationConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
+        query_string = self.scope['query_string'].decode()
+        query_params = parse_qs(query_string)
+        token_key = query_params.get('token', [None])[0]
+        self.user = await database_sync_to_async(get_user_for_token)(token_key)
+        if self.user is None or not self.user.is_active:
             logger.warning("WS connect: invalid token")
             await self.close()
+            return
+
+        # Opt-in incremental task updates (?deltas=1): task_delta events are filtered
+        # against this user's visibility here instead of triggering a full re-fetch
+        self._task_deltas = query_params.get('deltas', ['0'])[0] == '1'
+        if self._task_deltas:
+            await self._refresh_visibility()
+
+        # Wire protocol (?proto=json|compact|msgpack), see wire.py
+        self._protocol = query_params.get('proto', [wire.DEFAULT_PROTOCOL])[0]
+        if self._protocol not in wire.PROTOCOLS:
+            self._protocol = wire.DEFAULT_PROTOCOL
+
+        # Opt-in outbound batching (?batch=1): events are flushed as one `batch` frame per tick
+        self._outbox = Outbox() if query_params.get('batch', ['0'])[0] == '1' else None
+        self._batch_interval = settings.WS_BATCH_INTERVAL
+        self._flush_task = None
+
+        # Per-user group for targeted messages (task updates, stats, achievements, etc.)
+        self.location_group = f"location_{self.user.id}"
+        await self.channel_layer.group_add(self.location_group, self.channel_name)
+
+        # Shared group for task broadcasts
+        await self.channel_layer.group_add(PUBLIC_LOCATIONS_GROUP, self.channel_name)
+
+        # Geohash cell groups for public locations, joined on the first location ping;
+        # until then the socket receives all public locations
+        self._cell = None
+        self._cell_groups = set()
+        self._position = None
+        await self.channel_layer.group_add(_UNPLACED_GROUP, self.channel_name)
+        await self._refresh_sharing_radius()
+
+        # Register the connection before accepting, so a client that sees the socket open is present
+        came_online = await sync_to_async(presence.touch, thread_sensitive=False)(self.user.id, self.channel_name)
+
+        await self.accept()
+        if self._protocol != wire.DEFAULT_PROTOCOL:
+            # Always a JSON text frame, so clients can confirm before decoding binary frames
+            await self.send(text_data=json.dumps({'type': 'protocol', 'protocol': self._protocol}))
+        logger.info("WS connect: user %d (%s)", self.user.id, self.user.username)
+
+        # Cache friends list, skills and profile refresh timestamp
+        await self._refresh_friends_cache()
+        await self._refresh_skills()
+        self._profile_refreshed_at = _time.monotonic()
+        # (latitude, longitude, monotonic time) of the last location broadcast
+        self._last_broadcast = None
+
+        # Notify friends that this user came online (not when another device already is)
+        if came_online:
+            await self._announce_online()
 
     async def disconnect(self, close_code):
         if not hasattr(self, 'location_group'):
             return
         logger.info("WS disconnect: user %d (%s)", self.user.id, self.user.username)
 
-        offline_message = {
-            'type': 'user_offline',
-            'userId': self.user.id,
-        }
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+
+        # Persist the last reported position now instead of at the next flush
+        try:
+            await _location_buffer.flush(self.user.id)
+        except Exception:
+            logger.exception("Location flush failed for user %d", self.user.id)
+
+        # Only the user's last connection going away makes them offline
+        if await sync_to_async(presence.leave, thread_sensitive=False)(self.user.id, self.channel_name):
+            offline_message = wire.fanout({
+                'type': 'user_offline',
+                'userId': self.user.id,
+            })
 
-        # Notify friends
-        friends = getattr(self, '_friends_cache', None)
-        if friends is None:
-            friends = await database_sync_to_async(lambda: list(self.user.get_friends()))()
-        for friend in friends:
-            await self.channel_layer.group_send(f"location_{friend.id}", offline_message)
+            # Notify friends
+            friends = getattr(self, '_friends_cache', None)
+            if friends is None:
+                friends = await database_sync_to_async(lambda: list(self.user.get_friends()))()
+            await self._send_to_friends(friends, offline_message)
 
-        # Notify public users via shared group (single call instead of O(N))
-        if self.user.location_sharing_level == User.SharingLevel.ALL:
-            await self.channel_layer.group_send(PUBLIC_LOCATIONS_GROUP, offline_message)
+            # Notify nearby public users via the cell group (its subscribers are the neighbourhood)
+            if self.user.location_sharing_level == User.SharingLevel.ALL and self._cell is not None:
+                await self.channel_layer.group_send(_CELL_GROUP_PREFIX + self._cell, offline_message)
+                await self.channel_layer.group_send(_UNPLACED_GROUP, offline_message)
 
         # Leave groups
+        for group in self._cell_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        if self._cell is None:
+            await self.channel_layer.group_discard(_UNPLACED_GROUP, self.channel_name)
         await self.channel_layer.group_discard(PUBLIC_LOCATIONS_GROUP, self.channel_name)
         await self.channel_layer.group_discard(self.location_group, self.channel_name)
 
-    async def receive(self, text_data):
-        try:
-            data = json.loads(text_data)
-        except json.JSONDecodeError:
+    async def receive(self, text_data=None, bytes_data=None):
+        data = wire.decode(text_data, bytes_data)
+        if data is None:
             return
 
         msg_type = data.get('type')
@@ -99,7 +270,10 @@ class LocationConsumer(AsyncWebsocketConsumer):
             return
 
         if msg_type == 'heartbeat':
-            await self.send(text_data=json.dumps({'type': 'heartbeat_response'}))
+            # Keeps this connection's presence alive; a presence that had timed out comes back online
+            if await sync_to_async(presence.touch, thread_sensitive=False)(self.user.id, self.channel_name):
+                await self._announce_online()
+            await self._send_event({'type': 'heartbeat_response'})
             return
 
         if msg_type == 'chat_message':
@@ -120,72 +294,79 @@ class LocationConsumer(AsyncWebsocketConsumer):
         # Always use server-side username, never trust client
         sender = self.user.username
 
-        msg = await database_sync_to_async(ChatMessage.objects.create)(
-            sender=self.user, text=message,
+        msg = await database_sync_to_async(ChatMessage.post)(
+            self.user, message, [friend.id for friend in self._friends_cache],
         )
 
-        chat_event = {
+        chat_event = wire.fanout({
             'type': 'chat_message',
             'message': message,
             'sender': sender,
             'msgId': msg.id,
             'timestamp': msg.created_at.isoformat(),
-        }
+        })
 
-        for friend in self._friends_cache:
-            await self.channel_layer.group_send(f"location_{friend.id}", chat_event)
+        await self._send_to_friends(self._friends_cache, chat_event)
 
     async def _handle_location(self, data):
-        latitude = data.get('latitude')
-        longitude = data.get('longitude')
-        if latitude is None or longitude is None:
+        try:
+            latitude = float(data['latitude'])
+            longitude = float(data['longitude'])
+        except (KeyError, TypeError, ValueError):
             return
         accuracy = data.get('accuracy', 50)
 
         # Refresh profile periodically (not every ping)
         if _time.monotonic() - self._profile_refreshed_at > _PROFILE_REFRESH_INTERVAL:
             await database_sync_to_async(self.user.refresh_from_db)()
+            await self._refresh_skills()
+            await self._refresh_sharing_radius()
             self._profile_refreshed_at = _time.monotonic()
+            if self._task_deltas:
+                await self._refresh_visibility()
 
-        # Save location
-        await self._save_location(latitude, longitude)
+        # Save location (buffered, written in bulk)
+        self._save_location(latitude, longitude)
+        self._position = (latitude, longitude)
+        await self._update_cell_groups(latitude, longitude)
 
         # Only share if not set to NONE
         if self.user.location_sharing_level == User.SharingLevel.NONE:
             return
 
-        skills = await database_sync_to_async(
-            lambda: list(self.user.skills.values_list('name', flat=True))
-        )()
+        at = _time.monotonic()
+        if not should_broadcast_location(self._last_broadcast, latitude, longitude, at):
+            return
+        self._last_broadcast = (latitude, longitude, at)
 
         # Send detailed update to friends (small set, per-user groups)
-        friend_update = {
+        friend_update = wire.fanout({
             'type': 'friend_location',
             'userId': self.user.id,
-            'name': f"{self.user.first_name} {self.user.last_name}".strip() or self.user.username,
+            'name': self._display_name(),
             'latitude': latitude,
             'longitude': longitude,
             'accuracy': accuracy,
             'timestamp': timezone.now().isoformat(),
-            'friends': [{'id': f.id, 'name': f"{f.first_name} {f.last_name}".strip() or f.username} for f in self._friends_cache],
-            'skills': skills,
+            'friends': self._friends_payload,
+            'skills': self._skill_names,
             'profilePicture': self.user.profile_picture or '',
-        }
-        for friend in self._friends_cache:
-            await self.channel_layer.group_send(f"location_{friend.id}", friend_update)
+        })
+        await self._send_to_friends(self._friends_cache, friend_update)
 
-        # Public broadcast via shared group (single call instead of O(N))
+        # Public broadcast to the sender's cell group (reaches the sockets in this and neighbouring cells)
         if self.user.location_sharing_level == User.SharingLevel.ALL:
-            public_update = {
+            public_update = wire.fanout({
                 'type': 'public_location',
                 'userId': self.user.id,
-                'name': f"{self.user.first_name} {self.user.last_name}".strip() or self.user.username,
+                'name': self._display_name(),
                 'latitude': latitude,
                 'longitude': longitude,
                 'accuracy': accuracy,
                 'timestamp': timezone.now().isoformat(),
-            }
-            await self.channel_layer.group_send(PUBLIC_LOCATIONS_GROUP, public_update)
+            })
+            await self.channel_layer.group_send(_CELL_GROUP_PREFIX + self._cell, public_update)
+            await self.channel_layer.group_send(_UNPLACED_GROUP, public_update)
 
     async def _handle_preferences(self, preferences_data):
         sharing_level = preferences_data.get('sharing_level')
@@ -195,119 +376,210 @@ class LocationConsumer(AsyncWebsocketConsumer):
                 lambda: self.user.save(update_fields=['location_sharing_level'])
             )()
 
-        await self.send(text_data=json.dumps({
+        await self._send_event({
             'type': 'preferences_updated',
             'status': 'success',
             'preferences': {'sharing_level': self.user.location_sharing_level},
-        }))
+        })
 
-    async def _save_location(self, latitude, longitude):
+    async def _send_event(self, event):
+        """Send an event in this socket's protocol, using the publisher's pre-encoded frame when present.
+
+        With batching enabled the frame is queued in the outbox instead.
+        """
+        frame = wire.frame_for(event, self._protocol)
+        if self._outbox is None:
+            await self._send_frame(frame)
+            return
+        self._outbox.add(outbox_key(event), frame)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_outbox_later())
+
+    async def _send_frame(self, frame):
+        if isinstance(frame, bytes):
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+
+    async def _flush_outbox_later(self):
+        await asyncio.sleep(self._batch_interval)
+        frames = self._outbox.drain()
+        if len(frames) == 1:
+            await self._send_frame(frames[0])
+        elif frames:
+            await self._send_frame(wire.encode_batch(frames, self._protocol))
+
+    def _save_location(self, latitude, longitude):
         self.user.latitude = latitude
         self.user.longitude = longitude
         self.user.timestamp = timezone.now()
-        await database_sync_to_async(
-            lambda: self.user.save(update_fields=['latitude', 'longitude', 'timestamp'])
-        )()
+        _location_buffer.put(self.user.id, latitude, longitude, self.user.timestamp)
+
+    async def _announce_online(self):
+        online_msg = wire.fanout({
+            'type': 'friend_online',
+            'userId': self.user.id,
+            'name': self._display_name(),
+        })
+        await self._send_to_friends(self._friends_cache, online_msg)
+
+    async def _send_to_friends(self, friends, event):
+        """Send one event to every friend's group concurrently instead of one round trip at a time."""
+        await asyncio.gather(*(
+            self.channel_layer.group_send(f"location_{friend.id}", event) for friend in friends
+        ))
+
+    def _display_name(self):
+        return f"{self.user.first_name} {self.user.last_name}".strip() or self.user.username
 
     # ── Invalidate friends cache on friend events ──
 
     async def _refresh_friends_cache(self):
         self._friends_cache = await database_sync_to_async(lambda: list(self.user.get_friends()))()
         self._friends_ids = {f.id for f in self._friends_cache}
+        # Friend list shipped with every friend_location, built once per change
+        self._friends_payload = [
+            {'id': f.id, 'name': f"{f.first_name} {f.last_name}".strip() or f.username} for f in self._friends_cache
+        ]
+
+    async def _refresh_skills(self):
+        self._skill_names = await database_sync_to_async(
+            lambda: list(self.user.skills.values_list('name', flat=True))
+        )()
+
+    async def _refresh_sharing_radius(self):
+        config = await database_sync_to_async(GlobalConfig.get_config)()
+        self._sharing_radius_km = config.max_distance_km
+        self._cell_precision = geohash_precision_for_radius(config.max_distance_km)
+
+    async def _update_cell_groups(self, latitude, longitude):
+        """Subscribe to the cell groups around the current position when it moves to another cell."""
+        cell = geohash_encode(latitude, longitude, self._cell_precision)
+        if cell == self._cell:
+            return
+        groups = {_CELL_GROUP_PREFIX + c for c in geohash_neighborhood(latitude, longitude, self._cell_precision)}
+        for group in groups - self._cell_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        for group in self._cell_groups - groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        if self._cell is None:
+            await self.channel_layer.group_discard(_UNPLACED_GROUP, self.channel_name)
+        self._cell = cell
+        self._cell_groups = groups
+
+    async def _refresh_visibility(self):
+        self._visibility = await TaskVisibility.aload(self.user)
 
     # ── Channel event handlers (receive from group_send) ──
 
     async def friend_location(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'friend_location',
-            'userId': event['userId'],
-            'name': event['name'],
-            'latitude': event['latitude'],
-            'longitude': event['longitude'],
-            'accuracy': event['accuracy'],
-            'timestamp': event['timestamp'],
-            'friends': event['friends'],
-            'skills': event['skills'],
-            'profilePicture': event.get('profilePicture', ''),
-        }))
+        await self._send_event(event)
 
     async def public_location(self, event):
         # Don't echo own public location back
         if event.get('userId') == self.user.id:
             return
-        await self.send(text_data=json.dumps({
-            'type': 'public_location',
-            'userId': event['userId'],
-            'name': event['name'],
-            'latitude': event['latitude'],
-            'longitude': event['longitude'],
-            'accuracy': event['accuracy'],
-            'timestamp': event['timestamp'],
-        }))
+        # Cell groups are coarse: only forward locations within the sharing radius.
+        # Without a position yet there is nothing to filter by, so everything is forwarded.
+        if self._position is not None and haversine_km(
+            self._position[0], self._position[1], event['latitude'], event['longitude'],
+        ) > self._sharing_radius_km:
+            return
+        await self._send_event(event)
 
     async def user_offline(self, event):
         # Don't echo own offline event
         if event.get('userId') == self.user.id:
             return
-        await self.send(text_data=json.dumps({
-            'type': 'user_offline',
-            'userId': event['userId'],
-        }))
+        await self._send_event(event)
 
     async def friend_details(self, event):
-        await self.send(text_data=json.dumps({
+        # Sent to both sides of an accepted request
+        await self._refresh_friends_cache()
+        await self._send_event({
             'type': 'friend_details',
             'userId': event['userId'],
             'name': event['name'],
             'friends': event['friends'],
             'skills': event['skills'],
-        }))
+        })
 
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'chat_message',
-            'message': event['message'],
-            'sender': event['sender'],
-            'msgId': event.get('msgId'),
-            'timestamp': event.get('timestamp'),
-        }))
+        await self._send_event(event)
 
     # ── Real-time event handlers (forwarded from ws_events.py) ──
 
     async def task_update(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self._send_event(event)
 
     async def user_stats_update(self, event):
         # Refresh profile cache since stats/skills may have changed
         await database_sync_to_async(self.user.refresh_from_db)()
+        await self._refresh_skills()
         self._profile_refreshed_at = _time.monotonic()
-        await self.send(text_data=json.dumps(event))
+        if self._task_deltas:
+            await self._refresh_visibility()
+        await self._send_event(event)
 
     async def achievement_earned(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self._send_event(event)
 
     async def friend_request_received(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self._send_event(event)
 
     async def friend_request_accepted(self, event):
         await self._refresh_friends_cache()
-        await self.send(text_data=json.dumps(event))
+        await self._send_event(event)
 
     async def friend_request_rejected(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self._send_event(event)
 
     async def friend_removed(self, event):
         await self._refresh_friends_cache()
-        await self.send(text_data=json.dumps(event))
+        await self._send_event(event)
 
     async def friend_online(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self._send_event(event)
+
+    async def presence_update(self, event):
+        await self._send_event(event)
 
     async def tutorial_review_accepted(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self._send_event(event)
 
     async def tutorial_review_declined(self, event):
-        await self.send(text_data=json.dumps(event))
+        await self._send_event(event)
 
     async def tasks_changed(self, event):
-        await self.send(text_data=json.dumps(event))
+        # Sent when the user's visible set changes wholesale (skills, onboarding)
+        if self._task_deltas:
+            await self._refresh_visibility()
+        await self._send_event(event)
+
+    async def task_delta(self, event):
+        if not self._task_deltas:
+            await self._send_event({'type': 'tasks_changed'})
+            return
+        rows, removed = [], list(event['removed'])
+        for entry in event['tasks']:
+            descriptor = entry['visibility']
+            if not self._visibility.descriptor_visible(descriptor):
+                removed.append(descriptor['id'])
+                continue
+            row = entry['row']
+            if descriptor['id'] in self._visibility.onboarding_task_ids:
+                # Onboarding spawns are shown at the user's own location
+                lat, lon = self._visibility.user_location(descriptor['id'])
+                row = {**row, 'lat': lat, 'lon': lon}
+            rows.append(row)
+        await self._send_event({
+            'type': 'task_delta',
+            'revision': event['revision'],
+            'tasks': rows,
+            'removed': removed,
+        })
+
+    async def config_changed(self, event):
+        # Server-side only: GlobalConfig was saved somewhere in the fleet
+        GlobalConfig.invalidate_local()
+        await self._refresh_sharing_radius()
@@ -0,0 +1,253 @@
+"""
+Leaderboards kept as sorted sets.
+
+Every board is a sorted set of user id → score, so top-N is a range read and
+"my rank" is a single rank lookup (both O(log n)) regardless of user count.
+Boards are updated incrementally after the write that moves a score commits:
+
+- all-time `xp`, `coins` (lifetime totals) and `streak` (current task streak),
+  set from the user's stored values;
+- weekly / monthly `xp` and `coins`, incremented by what was gained in the
+  window and expiring once the window is over;
+- per-skill `xp`, incremented by XP from accepted tasks with that skill.
+
+Friends-only boards read the friends' scores from the global board and rank
+them in Python (friend lists are small). The backend is chosen by
+settings.LEADERBOARD_BACKEND: Redis (the channel layer instance) in
+production, a process-local one for tests. All-time boards can be rebuilt
+from the user table with `manage.py rebuild_leaderboards`.
+"""
+
+import logging
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('xp', 'coins', 'streak')
+PERIODS = ('all', 'week', 'month')
+
+_KEY_PREFIX = 'comrade:lb'
+# Windowed boards are kept a little past their window, then expire
+_PERIOD_TTL = {
+    'week': int(timedelta(days=14).total_seconds()),
+    'month': int(timedelta(days=62).total_seconds()),
+}
+
+
+class RedisLeaderboardBackend:
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+
+    def update(self, sets=(), increments=(), ttls=None):
+        """Apply absolute scores and increments ((key, member, value) triples) in one round trip."""
+        pipe = self.client.pipeline(transaction=False)
+        for key, member, score in sets:
+            pipe.zadd(key, {member: score})
+        for key, member, delta in increments:
+            pipe.zincrby(key, delta, member)
+        for key, ttl in (ttls or {}).items():
+            pipe.expire(key, ttl)
+        pipe.execute()
+
+    def replace(self, key, scores: dict):
+        """Atomically swap a board for the given member → score mapping."""
+        staging = f'{key}:rebuild'
+        pipe = self.client.pipeline()
+        pipe.delete(staging)
+        items = list(scores.items())
+        for i in range(0, len(items), 1000):
+            pipe.zadd(staging, dict(items[i:i + 1000]))
+        if items:
+            pipe.rename(staging, key)
+        else:
+            pipe.delete(key)
+        pipe.execute()
+
+    def top(self, key, limit: int) -> list[tuple[int, float]]:
+        return [(int(m), s) for m, s in self.client.zrevrange(key, 0, limit - 1, withscores=True)]
+
+    def rank(self, key, member) -> tuple[int, float] | None:
+        """0-based rank (highest score first) and score of a member, or None if it is not on the board."""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zrevrank(key, member)
+        pipe.zscore(key, member)
+        rank, score = pipe.execute()
+        return None if rank is None else (rank, score)
+
+    def scores(self, key, members) -> dict[int, float]:
+        members = list(members)
+        pipe = self.client.pipeline(transaction=False)
+        for member in members:
+            pipe.zscore(key, member)
+        return {int(m): s for m, s in zip(members, pipe.execute()) if s is not None}
+
+
+class MemoryLeaderboardBackend:
+    """Process-local boards for tests and single-process development. Ignores TTLs.
+
+    Ties are ordered like Redis (by member, descending, under equal scores).
+    """
+
+    def __init__(self):
+        self._scores: dict[str, dict[str, float]] = {}
+        self._sorted: dict[str, list[tuple[float, str]]] = {}
+
+    def clear(self):
+        self._scores.clear()
+        self._sorted.clear()
+
+    def _set(self, key, member, score):
+        member = str(member)
+        scores = self._scores.setdefault(key, {})
+        entries = self._sorted.setdefault(key, [])
+        if member in scores:
+            del entries[bisect_left(entries, (scores[member], member))]
+        scores[member] = float(score)
+        insort(entries, (float(score), member))
+
+    def update(self, sets=(), increments=(), ttls=None):
+        for key, member, score in sets:
+            self._set(key, member, score)
+        for key, member, delta in increments:
+            self._set(key, member, self._scores.get(key, {}).get(str(member), 0.0) + delta)
+
+    def replace(self, key, scores: dict):
+        self._scores.pop(key, None)
+        self._sorted.pop(key, None)
+        for member, score in scores.items():
+            self._set(key, member, score)
+
+    def top(self, key, limit: int) -> list[tuple[int, float]]:
+        return [(int(m), s) for s, m in reversed(self._sorted.get(key, [])[-limit:])] if limit > 0 else []
+
+    def rank(self, key, member) -> tuple[int, float] | None:
+        member = str(member)
+        score = self._scores.get(key, {}).get(member)
+        if score is None:
+            return None
+        entries = self._sorted[key]
+        return len(entries) - 1 - bisect_left(entries, (score, member)), score
+
+    def scores(self, key, members) -> dict[int, float]:
+        scores = self._scores.get(key, {})
+        return {int(m): scores[str(m)] for m in members if str(m) in scores}
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.LEADERBOARD_BACKEND)()
+    return _backend
+
+
+@receiver(setting_changed)
+def _reset_backend(setting, **kwargs):
+    global _backend
+    if setting in ('LEADERBOARD_BACKEND', 'REDIS_URL'):
+        _backend = None
+
+
+def board_key(metric: str, period: str = 'all', skill_id: int | None = None, when=None) -> str:
+    if skill_id is not None:
+        return f'{_KEY_PREFIX}:{metric}:skill:{skill_id}'
+    if period == 'all':
+        return f'{_KEY_PREFIX}:{metric}:all'
+    when = when or now()
+    if period == 'week':
+        year, week, _ = when.isocalendar()
+        return f'{_KEY_PREFIX}:{metric}:week:{year}-W{week:02d}'
+    if period == 'month':
+        return f'{_KEY_PREFIX}:{metric}:month:{when:%Y-%m}'
+    raise ValueError(f'Unknown leaderboard period: {period}')
+
+
+def _apply_on_commit(sets=(), increments=(), ttls=None):
+    # Boards are derived data: a failed update is logged (robust) and
+    # repaired by rebuild_leaderboards, never surfaced to the request.
+    transaction.on_commit(lambda: get_backend().update(sets, increments, ttls), robust=True)
+
+
+def record_rewards(user, xp: float = 0.0, coins: float = 0.0, skill_ids=()):
+    """Publish a user's lifetime XP/coin totals and what was just gained.
+
+    Call after the user's totals were refreshed from the database; the boards
+    are updated when the current transaction commits.
+    """
+    sets = [
+        (board_key('xp'), user.id, float(user.total_xp_earned)),
+        (board_key('coins'), user.id, float(user.total_coins_earned)),
+    ]
+    increments = []
+    ttls = {}
+    when = now()
+    for metric, gained in (('xp', xp), ('coins', coins)):
+        if not gained:
+            continue
+        for period, ttl in _PERIOD_TTL.items():
+            key = board_key(metric, period, when=when)
+            increments.append((key, user.id, float(gained)))
+            ttls[key] = ttl
+    if xp:
+        increments.extend((board_key('xp', skill_id=skill_id), user.id, float(xp)) for skill_id in skill_ids)
+    _apply_on_commit(sets, increments, ttls)
+
+
+def record_streak(user):
+    """Publish a user's current task streak when the transaction commits."""
+    _apply_on_commit([(board_key('streak'), user.id, int(user.task_streak))])
+
+
+def top(metric: str, period: str = 'all', skill_id: int | None = None, limit: int = 10) -> list[tuple[int, float]]:
+    """(user_id, score) pairs, highest first."""
+    return get_backend().top(board_key(metric, period, skill_id), limit)
+
+
+def rank_of(user_id: int, metric: str, period: str = 'all', skill_id: int | None = None) -> tuple[int, float] | None:
+    """1-based rank and score of a user, or None if the user is not on the board."""
+    found = get_backend().rank(board_key(metric, period, skill_id), user_id)
+    return None if found is None else (found[0] + 1, found[1])
+
+
+def among(user_ids, metric: str, period: str = 'all', skill_id: int | None = None) -> list[tuple[int, float]]:
+    """Rank a small set of users (e.g. friends) by their board scores; users without a score get 0."""
+    scores = get_backend().scores(board_key(metric, period, skill_id), user_ids)
+    return sorted(
+        ((user_id, scores.get(user_id, 0.0)) for user_id in user_ids),
+        key=lambda row: (row[1], str(row[0])), reverse=True,
+    )
+
+
+def rebuild() -> int:
+    """Replace the all-time xp/coins/streak boards from the user table. Returns the number of users.
+
+    Totals include the uncompacted reward ledger tail. Windowed and per-skill
+    boards only exist as increments and are not rebuilt.
+    """
+    from .models import RewardLedger, User
+
+    pending = RewardLedger.pending_totals()
+    boards = {metric: {} for metric in METRICS}
+    for user_id, xp, coins, streak in User.objects.values_list(
+        'id', 'total_xp_earned', 'total_coins_earned', 'task_streak',
+    ).iterator(chunk_size=2000):
+        tail = pending.get(user_id, {})
+        boards['xp'][user_id] = float(xp + tail.get('earned_xp', 0.0))
+        boards['coins'][user_id] = float(coins + tail.get('earned_coins', 0.0))
+        boards['streak'][user_id] = int(streak)
+    backend = get_backend()
+    for metric, scores in boards.items():
+        backend.replace(board_key(metric), scores)
+    return len(boards['xp'])
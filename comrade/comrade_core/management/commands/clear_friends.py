@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from comrade_core.models import User
+from comrade_core.models import User, UserStats
 
 class Command(BaseCommand):
     help = 'Clears all friend relationships'
@@ -10,5 +10,6 @@ class Command(BaseCommand):
             user.friends.clear()
             user.friend_requests_sent.clear()
             user.friend_requests_received.clear()
-            
+        UserStats.objects.update(friends_count=0)
+
         self.stdout.write(self.style.SUCCESS('Successfully cleared all friend relationships')) 
\ No newline at end of file
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from comrade_core import leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the all-time xp, coins and streak leaderboards from the user table'
+
+    def handle(self, *args, **options):
+        count = leaderboard.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt leaderboards for {count} user(s)'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from comrade_core.models import User, UserStats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the UserStats achievement counters from the raw task, rating, tutorial and friend tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only rebuild this user id (repeatable)')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids'] or User.objects.values_list('id', flat=True)
+        count = 0
+        for user_id in user_ids:
+            UserStats.rebuild(user_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} user(s)'))
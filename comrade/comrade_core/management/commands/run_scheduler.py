@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from comrade_core.scheduler import TaskScheduler
+
+
+class Command(BaseCommand):
+    help = "Run the task scheduler: respawns and stale-pause resets fired at their deadlines"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reload-interval', type=float, default=10.0,
+            help='Seconds between reloads of the deadline queue from the database (default 10)',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Apply all transitions that are currently due, compact the reward ledger and exit',
+        )
+
+    def handle(self, *args, **options):
+        scheduler = TaskScheduler(reload_interval=options['reload_interval'])
+        if options['once']:
+            scheduler.load()
+            changed = scheduler.run_due()
+            compacted = scheduler.compact_ledger()
+            self.stdout.write(self.style.SUCCESS(
+                f'Applied {len(changed)} due transition(s), compacted {compacted} reward ledger entries'
+            ))
+            return
+
+        self.stdout.write(f"Task scheduler running (reload every {options['reload_interval']}s)")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('Task scheduler stopped')
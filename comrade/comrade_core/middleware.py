@@ -0,0 +1,27 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import ws_events
+
+
+class WebSocketEventsMiddleware:
+    """Send the WebSocket events a request produces in one batch after its transactions commit.
+
+    Sync and async capable, so async views stay on the event loop under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with ws_events.batched():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        async with ws_events.abatched():
+            return await self.get_response(request)
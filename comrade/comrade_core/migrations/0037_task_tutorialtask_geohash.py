@@ -0,0 +1,49 @@
+# Generated by Django 5.0.10 on 2026-10-18 20:19
+
+from django.db import migrations, models
+
+from comrade_core.utils import geohash_encode
+
+
+def backfill_geohash(apps, schema_editor):
+    for model_name in ("Task", "TutorialTask"):
+        model = apps.get_model("comrade_core", model_name)
+        rows = list(model.objects.filter(lat__isnull=False, lon__isnull=False))
+        for row in rows:
+            row.geohash = geohash_encode(row.lat, row.lon)
+        model.objects.bulk_update(rows, ["geohash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comrade_core", "0036_tutorialreview_decline_reason_tutorialpartsubmission"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="geohash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="Geohash of lat/lon, used for viewport queries",
+                max_length=9,
+            ),
+        ),
+        migrations.AddField(
+            model_name="tutorialtask",
+            name="geohash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="Geohash of lat/lon, used for viewport queries",
+                max_length=9,
+            ),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.0.10 on 2026-10-18 20:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comrade_core", "0038_task_change_feed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("tasks_completed", models.PositiveIntegerField(default=0)),
+                (
+                    "tasks_completed_medium",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Completed tasks with MEDIUM criticality"
+                    ),
+                ),
+                (
+                    "tasks_completed_high",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Completed tasks with HIGH criticality"
+                    ),
+                ),
+                ("tasks_created", models.PositiveIntegerField(default=0)),
+                ("ratings_given", models.PositiveIntegerField(default=0)),
+                ("tutorials_completed", models.PositiveIntegerField(default=0)),
+                ("friends_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "user stats",
+            },
+        ),
+        migrations.CreateModel(
+            name="UserSkillStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tasks_completed", models.PositiveIntegerField(default=0)),
+                (
+                    "skill",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="user_stats",
+                        to="comrade_core.skill",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="skill_stats",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "user skill stats",
+                "unique_together": {("user", "skill")},
+            },
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.0.10 on 2026-10-18 21:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_inboxes(apps, schema_editor):
+    # Existing messages go to the sender and the sender's current friends,
+    # which is what the friends-filtered history used to show them.
+    ChatMessage = apps.get_model("comrade_core", "ChatMessage")
+    ChatDelivery = apps.get_model("comrade_core", "ChatDelivery")
+    User = apps.get_model("comrade_core", "User")
+    friends = {}
+    for from_id, to_id in User.friends.through.objects.values_list("from_user_id", "to_user_id"):
+        friends.setdefault(from_id, []).append(to_id)
+    batch = []
+    for message_id, sender_id in ChatMessage.objects.values_list("id", "sender_id").iterator(chunk_size=2000):
+        for recipient_id in (sender_id, *friends.get(sender_id, ())):
+            batch.append(ChatDelivery(recipient_id=recipient_id, message_id=message_id))
+        if len(batch) >= 2000:
+            ChatDelivery.objects.bulk_create(batch)
+            batch = []
+    ChatDelivery.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comrade_core", "0039_user_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChatDelivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "chat deliveries",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="chatmessage",
+            index=models.Index(
+                fields=["sender", "-created_at"], name="chat_sender_created_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="chatdelivery",
+            name="message",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="deliveries",
+                to="comrade_core.chatmessage",
+            ),
+        ),
+        migrations.AddField(
+            model_name="chatdelivery",
+            name="recipient",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="chat_inbox",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterUniqueTogether(
+            name="chatdelivery",
+            unique_together={("recipient", "message")},
+        ),
+        migrations.RunPython(backfill_inboxes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.10 on 2026-10-18 21:31
+
+from django.db import migrations, models
+
+
+def backfill_is_public(apps, schema_editor):
+    Task = apps.get_model("comrade_core", "Task")
+    Task.objects.filter(skill_read__isnull=False).update(is_public=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comrade_core", "0040_chat_delivery"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="is_public",
+            field=models.BooleanField(
+                db_index=True,
+                default=True,
+                editable=False,
+                help_text="No read skills: visible to everyone. Kept in sync with skill_read",
+            ),
+        ),
+        migrations.RunPython(backfill_is_public, migrations.RunPython.noop),
+    ]
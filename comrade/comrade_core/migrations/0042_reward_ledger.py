@@ -0,0 +1,91 @@
+# Generated by Django 5.0.10 on 2026-10-18 22:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("comrade_core", "0041_task_is_public"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RewardLedger",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("task", "Task accepted"),
+                            ("achievement", "Achievement bonus"),
+                            ("adjustment", "Admin adjustment"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("coins", models.FloatField(default=0)),
+                ("xp", models.FloatField(default=0)),
+                ("note", models.CharField(blank=True, default="", max_length=200)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "compacted",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Already folded into the user's balance snapshot",
+                    ),
+                ),
+                (
+                    "achievement",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="reward_entries",
+                        to="comrade_core.achievement",
+                    ),
+                ),
+                (
+                    "task",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="reward_entries",
+                        to="comrade_core.task",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reward_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "reward ledger",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "compacted"], name="ledger_user_compacted_idx"
+                    ),
+                    models.Index(
+                        fields=["user", "created_at"], name="ledger_user_created_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -1,17 +1,20 @@
 from .config import GlobalConfig
 from .skill import Skill
 from .user import User
-from .task import Task, Rating, Review
+from .ledger import RewardLedger
+from .task import Task, TaskChange, Rating, Review
 from .achievement import Achievement, UserAchievement
 from .tutorial import TutorialTask, TutorialPart, TutorialQuestion, TutorialAnswer, TutorialProgress, TutorialReview, TutorialPartSubmission, OnboardingTemplate, UserOnboardingTutorial, UserOnboardingTask
-from .chat import ChatMessage
+from .chat import ChatMessage, ChatDelivery
+from .stats import UserStats, UserSkillStats
 from .bug_report import BugReport, BugReportScreenshot
 
 __all__ = [
-    'GlobalConfig', 'Skill', 'User', 'Task', 'Rating', 'Review',
+    'GlobalConfig', 'Skill', 'User', 'RewardLedger', 'Task', 'TaskChange', 'Rating', 'Review',
     'Achievement', 'UserAchievement',
     'TutorialTask', 'TutorialPart', 'TutorialQuestion', 'TutorialAnswer', 'TutorialProgress', 'TutorialReview', 'TutorialPartSubmission',
     'OnboardingTemplate', 'UserOnboardingTutorial', 'UserOnboardingTask',
-    'ChatMessage',
+    'ChatMessage', 'ChatDelivery',
+    'UserStats', 'UserSkillStats',
     'BugReport', 'BugReportScreenshot',
 ]
@@ -1,4 +1,18 @@
-from django.db import models
+import time as _time
+
+from django.core.cache import cache
+from django.db import models, transaction
+
+
+_achievement_cache = {'active': None, 'by_event': {}, 'ts': 0, 'version': None, 'checked': 0}
+_ACHIEVEMENT_TTL = 60  # seconds
+
+# Definitions version in the shared cache, bumped when an achievement is saved or deleted.
+# It keys the per-user progress snapshots (see AchievementsView) and tells other processes
+# to reload their achievement list.
+_VERSION_KEY = 'achievements:version'
+_VERSION_CHECK_INTERVAL = 5  # seconds between version reads per process
+_PROGRESS_TTL = 3600  # seconds; safety net for changes made outside the invalidating write paths
 
 
 class Achievement(models.Model):
@@ -58,54 +72,179 @@ class Achievement(models.Model):
         prefix = f'{self.icon} ' if self.icon else ''
         return f'{prefix}{self.name}'
 
-    def compute_progress(self, user) -> float:
-        """Return user's current progress value toward this achievement's threshold."""
-        from .task import Task, Rating
-        from .tutorial import TutorialProgress
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.invalidate_cache()
 
-        f = self.condition_filter or {}
-        ct = self.condition_type
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.invalidate_cache()
+        return result
+
+    @staticmethod
+    def invalidate_cache():
+        _achievement_cache['active'] = None
+        # Definitions changed: other processes reload their list and every user's progress
+        # snapshot is stale. Bumped after commit so nobody reloads the old rows under the new version.
+        transaction.on_commit(Achievement._bump_version)
+
+    @staticmethod
+    def _bump_version():
+        try:
+            cache.incr(_VERSION_KEY)
+        except ValueError:
+            cache.set(_VERSION_KEY, 1, None)
 
-        if ct == self.CONDITION_TASK_COUNT:
-            return Task.objects.filter(assignee=user, state=Task.State.DONE).count()
+    @staticmethod
+    def _version():
+        return cache.get_or_set(_VERSION_KEY, 1, None)
 
-        if ct == self.CONDITION_TASK_COUNT_SKILL:
-            skill_name = f.get('skill_name', '')
-            return Task.objects.filter(
-                assignee=user, state=Task.State.DONE, skill_execute__name=skill_name
-            ).distinct().count()
+    @staticmethod
+    async def _aversion():
+        return await cache.aget_or_set(_VERSION_KEY, 1, None)
 
-        if ct == self.CONDITION_TASK_COUNT_CRITICALITY:
-            min_crit = f.get('min_criticality', 1)
-            return Task.objects.filter(
-                assignee=user, state=Task.State.DONE, criticality__gte=min_crit
-            ).count()
+    @staticmethod
+    def progress_cache_key(user_id: int, version=None) -> str:
+        if version is None:
+            version = Achievement._version()
+        return f'achievements:progress:{version}:{user_id}'
 
-        if ct == self.CONDITION_TASK_STREAK:
-            return user.task_streak
+    @classmethod
+    async def aget_progress_snapshot(cls, user_id: int) -> dict | None:
+        """The user's cached progress snapshot (see AchievementsView), or None."""
+        return await cache.aget(cls.progress_cache_key(user_id, await cls._aversion()))
 
-        if ct == self.CONDITION_XP_TOTAL:
-            return user.total_xp_earned
+    @classmethod
+    async def aset_progress_snapshot(cls, user_id: int, snapshot: dict) -> None:
+        """Cache a user's progress snapshot under the current definitions version."""
+        await cache.aset(cls.progress_cache_key(user_id, await cls._aversion()), snapshot, _PROGRESS_TTL)
 
-        if ct == self.CONDITION_COINS_TOTAL:
-            return user.total_coins_earned
+    @classmethod
+    def invalidate_progress(cls, user_id: int) -> None:
+        """Drop a user's progress snapshot after any of their achievement metrics changed.
 
-        if ct == self.CONDITION_SKILL_COUNT:
-            return user.skills.count()
+        Deferred to commit so a concurrent read cannot re-cache pre-commit values.
+        """
+        transaction.on_commit(lambda: cache.delete(cls.progress_cache_key(user_id)))
 
-        if ct == self.CONDITION_TUTORIAL_COUNT:
-            return TutorialProgress.objects.filter(user=user, state=TutorialProgress.State.DONE).count()
+    @classmethod
+    def triggered_by(cls, *events) -> list:
+        """Active achievements whose condition types the given events can affect (all if no events).
 
-        if ct == self.CONDITION_TASKS_CREATED:
-            return Task.objects.filter(owner=user).count()
+        Cached per event combination for 60s. Saving or deleting an achievement
+        clears this process's cache and bumps the shared version, which other
+        processes check at most every _VERSION_CHECK_INTERVAL seconds.
+        """
+        now_ts = _time.monotonic()
+        if _achievement_cache['active'] is not None and now_ts - _achievement_cache['checked'] >= _VERSION_CHECK_INTERVAL:
+            if cls._version() != _achievement_cache['version']:
+                _achievement_cache['active'] = None
+            _achievement_cache['checked'] = now_ts
+        if _achievement_cache['active'] is None or (now_ts - _achievement_cache['ts']) >= _ACHIEVEMENT_TTL:
+            # Read the version first: a change committed during the load is picked up on the next check
+            _achievement_cache['version'] = cls._version()
+            _achievement_cache['active'] = list(cls.objects.filter(is_active=True).select_related('reward_skill'))
+            _achievement_cache['by_event'] = {}
+            _achievement_cache['ts'] = _achievement_cache['checked'] = now_ts
+        key = frozenset(events)
+        if key not in _achievement_cache['by_event']:
+            active = _achievement_cache['active']
+            if events:
+                condition_types = set().union(*(cls.TRIGGERS[event] for event in events))
+                active = [a for a in active if a.condition_type in condition_types]
+            _achievement_cache['by_event'][key] = active
+        return _achievement_cache['by_event'][key]
 
-        if ct == self.CONDITION_RATINGS_GIVEN:
-            return Rating.objects.filter(user=user).count()
+    # Domain events that trigger achievement checks
+    EVENT_TASK_ACCEPTED = 'task_accepted'
+    EVENT_RATING_CREATED = 'rating_created'
+    EVENT_FRIEND_ADDED = 'friend_added'
+    EVENT_TUTORIAL_COMPLETED = 'tutorial_completed'
+    EVENT_TASK_CREATED = 'task_created'
+    EVENT_SKILL_GAINED = 'skill_gained'
+    EVENT_REWARD_GRANTED = 'reward_granted'  # bonus coins/XP/skill from another achievement
 
-        if ct == self.CONDITION_FRIENDS_COUNT:
-            return user.friends.count()
+    # Condition types each event can move; only those achievements are evaluated
+    TRIGGERS = {
+        EVENT_TASK_ACCEPTED: {
+            CONDITION_TASK_COUNT, CONDITION_TASK_COUNT_SKILL, CONDITION_TASK_COUNT_CRITICALITY,
+            CONDITION_TASK_STREAK, CONDITION_XP_TOTAL, CONDITION_COINS_TOTAL,
+        },
+        EVENT_RATING_CREATED: {CONDITION_RATINGS_GIVEN},
+        EVENT_FRIEND_ADDED: {CONDITION_FRIENDS_COUNT},
+        EVENT_TUTORIAL_COMPLETED: {CONDITION_TUTORIAL_COUNT},
+        EVENT_TASK_CREATED: {CONDITION_TASKS_CREATED},
+        EVENT_SKILL_GAINED: {CONDITION_SKILL_COUNT},
+        EVENT_REWARD_GRANTED: {CONDITION_XP_TOTAL, CONDITION_COINS_TOTAL, CONDITION_SKILL_COUNT},
+    }
 
-        return 0
+    # Metrics read from the UserStats counters
+    STATS_CONDITIONS = {
+        CONDITION_TASK_COUNT, CONDITION_TASK_COUNT_CRITICALITY, CONDITION_TASKS_CREATED,
+        CONDITION_RATINGS_GIVEN, CONDITION_TUTORIAL_COUNT, CONDITION_FRIENDS_COUNT,
+    }
+
+    def metric_key(self) -> tuple:
+        """Identity of the measured metric. Achievements with the same key (e.g. threshold tiers) share one computation."""
+        f = self.condition_filter or {}
+        if self.condition_type == self.CONDITION_TASK_COUNT_SKILL:
+            return (self.condition_type, f.get('skill_name', ''))
+        if self.condition_type == self.CONDITION_TASK_COUNT_CRITICALITY:
+            return (self.condition_type, f.get('min_criticality', 1))
+        return (self.condition_type,)
+
+    @classmethod
+    def compute_metrics(cls, user, keys) -> dict:
+        """Compute each distinct metric key once for a user. Returns {metric_key: value}.
+
+        Counted conditions read the user's UserStats row (and UserSkillStats
+        for per-skill counts); the rest come from fields on the user, with
+        XP/coin totals including the uncompacted reward ledger tail.
+        """
+        from .stats import UserStats, UserSkillStats
+
+        keys = set(keys)
+        if any(k[0] in (cls.CONDITION_XP_TOTAL, cls.CONDITION_COINS_TOTAL) for k in keys):
+            user.ensure_balances()
+        stats = UserStats.for_user(user.id) if any(k[0] in cls.STATS_CONDITIONS for k in keys) else None
+        skill_names = [k[1] for k in keys if k[0] == cls.CONDITION_TASK_COUNT_SKILL]
+        skill_counts = dict(
+            UserSkillStats.objects.filter(user=user, skill__name__in=skill_names).values_list('skill__name', 'tasks_completed')
+        ) if skill_names else {}
+
+        metrics = {}
+        for key in keys:
+            ct = key[0]
+            if ct == cls.CONDITION_TASK_COUNT:
+                metrics[key] = stats.tasks_completed
+            elif ct == cls.CONDITION_TASK_COUNT_SKILL:
+                metrics[key] = skill_counts.get(key[1], 0)
+            elif ct == cls.CONDITION_TASK_COUNT_CRITICALITY:
+                metrics[key] = stats.tasks_completed_min_criticality(key[1])
+            elif ct == cls.CONDITION_TASKS_CREATED:
+                metrics[key] = stats.tasks_created
+            elif ct == cls.CONDITION_RATINGS_GIVEN:
+                metrics[key] = stats.ratings_given
+            elif ct == cls.CONDITION_TUTORIAL_COUNT:
+                metrics[key] = stats.tutorials_completed
+            elif ct == cls.CONDITION_FRIENDS_COUNT:
+                metrics[key] = stats.friends_count
+            elif ct == cls.CONDITION_TASK_STREAK:
+                metrics[key] = user.task_streak
+            elif ct == cls.CONDITION_XP_TOTAL:
+                metrics[key] = user.total_xp_earned
+            elif ct == cls.CONDITION_COINS_TOTAL:
+                metrics[key] = user.total_coins_earned
+            elif ct == cls.CONDITION_SKILL_COUNT:
+                metrics[key] = user.skills.count()
+            else:
+                metrics[key] = 0
+        return metrics
+
+    def compute_progress(self, user) -> float:
+        """Return user's current progress value toward this achievement's threshold."""
+        key = self.metric_key()
+        return self.compute_metrics(user, [key])[key]
 
 
 class UserAchievement(models.Model):
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 
 class ChatMessage(models.Model):
@@ -8,6 +8,37 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [models.Index(fields=['sender', '-created_at'], name='chat_sender_created_idx')]
 
     def __str__(self):
         return f'{self.sender.username}: {self.text[:50]}'
+
+    @classmethod
+    def post(cls, sender, text: str, recipient_ids=()) -> 'ChatMessage':
+        """Store a message and deliver it to the sender's and the recipients' inboxes."""
+        with transaction.atomic():
+            message = cls.objects.create(sender=sender, text=text)
+            ChatDelivery.objects.bulk_create([
+                ChatDelivery(recipient_id=recipient_id, message=message)
+                for recipient_id in {sender.id, *recipient_ids}
+            ])
+        return message
+
+
+class ChatDelivery(models.Model):
+    """A message in a recipient's inbox (fan-out on write).
+
+    Written once per recipient when the message is sent, so reading a page of
+    history is one range scan of the (recipient, message) index instead of
+    filtering every message by the reader's current friends. Rows are kept
+    when users unfriend: the inbox holds what a user received while friends.
+    """
+    recipient = models.ForeignKey('User', on_delete=models.CASCADE, related_name='chat_inbox')
+    message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE, related_name='deliveries')
+
+    class Meta:
+        unique_together = ['recipient', 'message']
+        verbose_name_plural = 'chat deliveries'
+
+    def __str__(self):
+        return f'{self.message_id} → {self.recipient_id}'
@@ -1,10 +1,16 @@
 import time as _time
+from uuid import uuid4
 
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 
 
-_config_cache = {'obj': None, 'ts': 0}
-_CONFIG_TTL = 60  # seconds
+# Shared through the Django cache: the row under a version stamp that save() replaces
+_CONFIG_KEY = 'global_config'
+_VERSION_KEY = 'global_config:version'
+_VERSION_CHECK_INTERVAL = 5  # seconds between version reads per process
+
+_config_cache = {'obj': None, 'version': None, 'checked': 0}
 
 
 class GlobalConfig(models.Model):
@@ -64,14 +70,106 @@ class GlobalConfig(models.Model):
 
     @classmethod
     def get_config(cls):
-        """Get or create the global configuration (cached for 60s)."""
-        now_ts = _time.monotonic()
-        if _config_cache['obj'] is not None and (now_ts - _config_cache['ts']) < _CONFIG_TTL:
-            return _config_cache['obj']
-        config, created = cls.objects.get_or_create(pk=1)
-        _config_cache['obj'] = config
-        _config_cache['ts'] = now_ts
+        """Get or create the global configuration.
+
+        Each process keeps its copy and only re-reads the shared version stamp
+        (at most every _VERSION_CHECK_INTERVAL seconds); the row is fetched from
+        the shared cache, or the database, when the stamp changed. save() stamps
+        a new version and tells the WebSocket processes to drop their copy.
+        """
+        config, version = cls._shared_config()
+        if config is None:
+            config, created = cls.objects.get_or_create(pk=1)
+            cls._share(config, version)
+        return config
+
+    @classmethod
+    async def aget_config(cls):
+        """get_config() for async views: the shared cache and, on a miss in both caches, the database are awaited."""
+        config, version = await cls._ashared_config()
+        if config is None:
+            config, created = await cls.objects.aget_or_create(pk=1)
+            await cls._ashare(config, version)
         return config
 
+    @classmethod
+    def _shared_config(cls):
+        """(config, version) from this process or the shared cache; config is None when the row must be read."""
+        if cls._checked_recently():
+            return _config_cache['obj'], _config_cache['version']
+        version = cache.get(_VERSION_KEY)
+        return cls._adopt(version, cache.get(_CONFIG_KEY) if cls._is_stale(version) else None)
+
+    @classmethod
+    async def _ashared_config(cls):
+        """_shared_config() with the shared cache reads awaited."""
+        if cls._checked_recently():
+            return _config_cache['obj'], _config_cache['version']
+        version = await cache.aget(_VERSION_KEY)
+        return cls._adopt(version, await cache.aget(_CONFIG_KEY) if cls._is_stale(version) else None)
+
+    @staticmethod
+    def _checked_recently() -> bool:
+        return _config_cache['obj'] is not None and (_time.monotonic() - _config_cache['checked']) < _VERSION_CHECK_INTERVAL
+
+    @staticmethod
+    def _is_stale(version) -> bool:
+        """Whether this process' copy has to be replaced under the shared version stamp."""
+        return _config_cache['obj'] is None or version is None or version != _config_cache['version']
+
+    @classmethod
+    def _adopt(cls, version, cached):
+        """Take the shared row if it was published under version (cached is only read when the local copy is stale)."""
+        if cls._is_stale(version):
+            if version is None or cached is None or cached[0] != version:
+                return None, version
+            _config_cache['obj'] = cached[1]
+            _config_cache['version'] = version
+        _config_cache['checked'] = _time.monotonic()
+        return _config_cache['obj'], version
+
+    @staticmethod
+    def _share(config, version):
+        """Publish a row read from the database under the version stamp it was read for."""
+        if version is None:
+            version = uuid4().hex
+            cache.set(_VERSION_KEY, version, None)
+        cache.set(_CONFIG_KEY, (version, config), None)
+        GlobalConfig._keep(config, version)
+
+    @staticmethod
+    async def _ashare(config, version):
+        """_share() with the cache writes awaited."""
+        if version is None:
+            version = uuid4().hex
+            await cache.aset(_VERSION_KEY, version, None)
+        await cache.aset(_CONFIG_KEY, (version, config), None)
+        GlobalConfig._keep(config, version)
+
+    @staticmethod
+    def _keep(config, version):
+        _config_cache['obj'] = config
+        _config_cache['version'] = version
+        _config_cache['checked'] = _time.monotonic()
+
+    @classmethod
+    def invalidate_local(cls):
+        """Make the next get_config() in this process check the version stamp."""
+        _config_cache['checked'] = 0
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        transaction.on_commit(self._publish, robust=True)
+
+    @staticmethod
+    def _publish():
+        from ..ws_events import send_config_changed
+
+        # Readers load the committed row once under the new stamp
+        cache.delete(_CONFIG_KEY)
+        cache.set(_VERSION_KEY, uuid4().hex, None)
+        GlobalConfig.invalidate_local()
+        send_config_changed()
+
     def __str__(self):
         return f"Global config (sharing: {self.max_distance_km}km, task proximity: {self.task_proximity_km}km)"
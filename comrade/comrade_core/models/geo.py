@@ -0,0 +1,35 @@
+from django.db import models
+
+from ..utils import GEOHASH_PRECISION, geohash_cover, geohash_encode
+
+
+class GeohashIndexed(models.Model):
+    """Abstract base that keeps an indexed geohash of the row's lat/lon in sync on save."""
+    geohash = models.CharField(
+        max_length=GEOHASH_PRECISION, blank=True, default='', db_index=True, editable=False,
+        help_text="Geohash of lat/lon, used for viewport queries",
+    )
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self.lat is not None and self.lon is not None:
+            self.geohash = geohash_encode(self.lat, self.lon)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and ('lat' in update_fields or 'lon' in update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def bbox_q(min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> models.Q:
+        """Q matching rows inside the bounding box, driven by geohash prefix lookups."""
+        cells = models.Q()
+        for prefix in geohash_cover(min_lat, min_lon, max_lat, max_lon):
+            cells |= models.Q(geohash__startswith=prefix)
+        return cells & models.Q(
+            lat__gte=min_lat, lat__lte=max_lat,
+            lon__gte=min_lon, lon__lte=max_lon,
+        )
@@ -0,0 +1,119 @@
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+
+from ..authentication import invalidate_users
+
+
+class RewardLedger(models.Model):
+    """Insert-only log of coin/XP changes.
+
+    The balance columns on User (coins, xp, total_*_earned) are a snapshot:
+    a user's balance is the snapshot plus their uncompacted entries (see
+    User.refresh_balances). Rewards only insert rows here, so concurrent
+    payouts never wait on the user row; compact() folds the tail into the
+    snapshot in the background. Entries are kept after compaction as the
+    audit trail and for per-period earnings.
+    """
+    class Kind(models.TextChoices):
+        TASK = 'task', 'Task accepted'
+        ACHIEVEMENT = 'achievement', 'Achievement bonus'
+        ADJUSTMENT = 'adjustment', 'Admin adjustment'
+
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='reward_entries')
+    kind = models.CharField(max_length=16, choices=Kind.choices)
+    coins = models.FloatField(default=0)
+    xp = models.FloatField(default=0)
+    task = models.ForeignKey('Task', null=True, blank=True, on_delete=models.SET_NULL, related_name='reward_entries')
+    achievement = models.ForeignKey('Achievement', null=True, blank=True, on_delete=models.SET_NULL, related_name='reward_entries')
+    note = models.CharField(max_length=200, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    compacted = models.BooleanField(default=False, help_text="Already folded into the user's balance snapshot")
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'compacted'], name='ledger_user_compacted_idx'),
+            models.Index(fields=['user', 'created_at'], name='ledger_user_created_idx'),
+        ]
+        verbose_name_plural = 'reward ledger'
+
+    def __str__(self):
+        return f'{self.user_id} {self.kind}: {self.coins:+g} coins, {self.xp:+g} XP'
+
+    @classmethod
+    def sums(cls) -> dict:
+        """Sum aggregates over entries: balance_coins/balance_xp and earned_coins/earned_xp (lifetime).
+
+        The names do not shadow the coins/xp fields, so they can be used with
+        annotate() on ledger querysets.
+        """
+        # Adjustments move the balance but not the lifetime earned totals
+        earned = ~models.Q(kind=cls.Kind.ADJUSTMENT)
+        return {
+            'balance_coins': Coalesce(models.Sum('coins'), 0.0),
+            'balance_xp': Coalesce(models.Sum('xp'), 0.0),
+            'earned_coins': Coalesce(models.Sum('coins', filter=earned), 0.0),
+            'earned_xp': Coalesce(models.Sum('xp', filter=earned), 0.0),
+        }
+
+    @classmethod
+    def tail(cls, user) -> dict:
+        """sums() over the uncompacted entries of user (an id or OuterRef), as one subquery per total."""
+        entries = cls.objects.filter(user=user, compacted=False).values('user').annotate(**cls.sums())
+        return {name: models.Subquery(entries.values(name)) for name in cls.sums()}
+
+    @classmethod
+    def adjust(cls, user_id: int, coins: float = 0.0, xp: float = 0.0, note: str = '') -> 'RewardLedger':
+        """Record an admin correction. It changes the balance, not the lifetime totals."""
+        return cls.objects.create(user_id=user_id, kind=cls.Kind.ADJUSTMENT, coins=coins, xp=xp, note=note)
+
+    @classmethod
+    def earnings(cls, user_id: int, since=None, until=None) -> dict:
+        """Coins and XP a user earned in [since, until). Adjustments are not earnings."""
+        entries = cls.objects.filter(user_id=user_id)
+        if since is not None:
+            entries = entries.filter(created_at__gte=since)
+        if until is not None:
+            entries = entries.filter(created_at__lt=until)
+        totals = entries.aggregate(**cls.sums())
+        return {'coins': totals['earned_coins'], 'xp': totals['earned_xp']}
+
+    @classmethod
+    def pending_totals(cls) -> dict:
+        """{user_id: sums()} over the uncompacted tail of every user that has one."""
+        return {
+            row.pop('user_id'): row
+            for row in cls.objects.filter(compacted=False).values('user_id').annotate(**cls.sums())
+        }
+
+    @classmethod
+    def compact(cls, batch_size: int = 5000) -> int:
+        """Fold up to batch_size uncompacted entries into the users' snapshots. Returns the entry count.
+
+        The snapshot update and the compacted flag commit together, so a
+        reader computing snapshot + tail in one statement never counts an
+        entry twice or misses it. Entries locked by a concurrent compactor
+        are skipped.
+        """
+        from .user import User
+
+        with transaction.atomic():
+            ids = list(
+                cls.objects.select_for_update(skip_locked=True)
+                .filter(compacted=False).order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return 0
+            rows = cls.objects.filter(id__in=ids).values('user_id').annotate(**cls.sums())
+            user_ids = []
+            for row in rows:
+                User.objects.filter(pk=row['user_id']).update(
+                    coins=models.F('coins') + row['balance_coins'],
+                    xp=models.F('xp') + row['balance_xp'],
+                    total_coins_earned=models.F('total_coins_earned') + row['earned_coins'],
+                    total_xp_earned=models.F('total_xp_earned') + row['earned_xp'],
+                )
+                user_ids.append(row['user_id'])
+            cls.objects.filter(id__in=ids).update(compacted=True)
+            invalidate_users(*user_ids)
+        return len(ids)
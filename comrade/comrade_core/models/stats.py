@@ -0,0 +1,134 @@
+from django.db import models, transaction
+from django.db.models.functions import Greatest
+
+
+class UserStats(models.Model):
+    """Denormalized activity counters backing achievement conditions.
+
+    Updated by the write paths (review accept, task and rating creation and
+    deletion, tutorial completion, friend accept/remove) so achievement
+    checks read one row instead of counting over Task. A missing row is
+    rebuilt from the raw tables on first use; `manage.py rebuild_user_stats`
+    rebuilds every row.
+    """
+    user = models.OneToOneField('User', on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    tasks_completed = models.PositiveIntegerField(default=0)
+    tasks_completed_medium = models.PositiveIntegerField(default=0, help_text="Completed tasks with MEDIUM criticality")
+    tasks_completed_high = models.PositiveIntegerField(default=0, help_text="Completed tasks with HIGH criticality")
+    tasks_created = models.PositiveIntegerField(default=0)
+    ratings_given = models.PositiveIntegerField(default=0)
+    tutorials_completed = models.PositiveIntegerField(default=0)
+    friends_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'user stats'
+
+    def __str__(self):
+        return f'Stats of {self.user_id}'
+
+    def tasks_completed_min_criticality(self, min_criticality: int) -> int:
+        if min_criticality <= 1:
+            return self.tasks_completed
+        if min_criticality == 2:
+            return self.tasks_completed_medium + self.tasks_completed_high
+        if min_criticality == 3:
+            return self.tasks_completed_high
+        return 0
+
+    @classmethod
+    def for_user(cls, user_id: int) -> 'UserStats':
+        try:
+            return cls.objects.get(user_id=user_id)
+        except cls.DoesNotExist:
+            return cls.rebuild(user_id)
+
+    @classmethod
+    def record(cls, user_id: int, skill_ids=(), **deltas) -> None:
+        """Apply counter deltas (e.g. tasks_completed=1) after the underlying write.
+
+        skill_ids bumps the per-skill completed-task counters. Call after the
+        write itself: if the row does not exist yet, it is rebuilt from the
+        raw tables, which already include the change.
+        """
+        from .achievement import Achievement
+
+        Achievement.invalidate_progress(user_id)
+        with transaction.atomic():
+            updated = cls.objects.filter(user_id=user_id).update(**{
+                # Decrements are clamped: the counters are unsigned, and a row rebuilt mid-flight may already exclude the change
+                field: Greatest(models.F(field) + delta, 0) if delta < 0 else models.F(field) + delta
+                for field, delta in deltas.items()
+            })
+            if not updated:
+                cls.rebuild(user_id)
+                return
+            for skill_id in skill_ids:
+                skill_stats, created = UserSkillStats.objects.get_or_create(
+                    user_id=user_id, skill_id=skill_id, defaults={'tasks_completed': 1},
+                )
+                if not created:
+                    UserSkillStats.objects.filter(pk=skill_stats.pk).update(tasks_completed=models.F('tasks_completed') + 1)
+
+    @classmethod
+    def rebuild(cls, user_id: int) -> 'UserStats':
+        """Recompute a user's counters (and per-skill counters) from the raw tables.
+
+        Completions are history, not current task state: they are counted
+        from the user's accepted-task ledger entries, which survive respawns,
+        plus DONE tasks accepted before the ledger existed.
+        """
+        from .achievement import Achievement
+        from .ledger import RewardLedger
+        from .task import Task, Rating
+        from .tutorial import TutorialProgress
+        from .user import User
+
+        Achievement.invalidate_progress(user_id)
+
+        accepted = RewardLedger.objects.filter(user_id=user_id, kind=RewardLedger.Kind.TASK)
+        before_ledger = Task.objects.filter(assignee_id=user_id, state=Task.State.DONE).filter(
+            ~models.Exists(accepted.filter(task=models.OuterRef('pk'))),
+        )
+        counts = {'tasks_completed': 0, 'tasks_completed_medium': 0, 'tasks_completed_high': 0}
+        skill_counts = {}
+        for completions, task_path in ((accepted, 'task__'), (before_ledger, '')):
+            totals = completions.aggregate(
+                tasks_completed=models.Count('id'),
+                tasks_completed_medium=models.Count('id', filter=models.Q(**{task_path + 'criticality': Task.Criticality.MEDIUM})),
+                tasks_completed_high=models.Count('id', filter=models.Q(**{task_path + 'criticality': Task.Criticality.HIGH})),
+            )
+            for field, n in totals.items():
+                counts[field] += n
+            for skill_id, n in completions.filter(**{task_path + 'skill_execute__isnull': False}).values(
+                task_path + 'skill_execute',
+            ).annotate(n=models.Count('id')).values_list(task_path + 'skill_execute', 'n'):
+                skill_counts[skill_id] = skill_counts.get(skill_id, 0) + n
+        counts['tasks_created'] = Task.objects.filter(owner_id=user_id).count()
+        counts['ratings_given'] = Rating.objects.filter(user_id=user_id).count()
+        counts['tutorials_completed'] = TutorialProgress.objects.filter(
+            user_id=user_id, state=TutorialProgress.State.DONE,
+        ).count()
+        counts['friends_count'] = User.friends.through.objects.filter(from_user_id=user_id).count()
+
+        with transaction.atomic():
+            stats, _ = cls.objects.update_or_create(user_id=user_id, defaults=counts)
+            UserSkillStats.objects.filter(user_id=user_id).delete()
+            UserSkillStats.objects.bulk_create([
+                UserSkillStats(user_id=user_id, skill_id=skill_id, tasks_completed=n)
+                for skill_id, n in skill_counts.items()
+            ])
+        return stats
+
+
+class UserSkillStats(models.Model):
+    """Per-skill completed-task counter (task_count_skill achievements)."""
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='skill_stats')
+    skill = models.ForeignKey('Skill', on_delete=models.CASCADE, related_name='user_stats')
+    tasks_completed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user', 'skill']
+        verbose_name_plural = 'user skill stats'
+
+    def __str__(self):
+        return f'{self.user_id} – {self.skill_id}: {self.tasks_completed}'
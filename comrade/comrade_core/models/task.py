@@ -3,13 +3,20 @@ from datetime import timedelta
 
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
 from django.utils.timezone import now
 
+from .. import leaderboard
+from .achievement import Achievement
 from .config import GlobalConfig
+from .geo import GeohashIndexed
+from .ledger import RewardLedger
+from .stats import UserStats
 
 
-class Task(models.Model):
+class Task(GeohashIndexed):
     class Criticality(models.IntegerChoices):
         LOW = 1
         MEDIUM = 2
@@ -34,6 +41,10 @@ class Task(models.Model):
     skill_read = models.ManyToManyField("Skill", related_name="read", blank=True)
     skill_write = models.ManyToManyField("Skill", related_name="write", blank=True)
     skill_execute = models.ManyToManyField("Skill", related_name="execute", blank=True)
+    is_public = models.BooleanField(
+        default=True, db_index=True, editable=False,
+        help_text="No read skills: visible to everyone. Kept in sync with skill_read",
+    )
 
     # task state
     state = models.IntegerField(choices=State, default=1, blank=True)
@@ -98,8 +109,111 @@ class Task(models.Model):
     datetime_finish = models.DateTimeField(auto_now_add=False, blank=True, null=True)
     datetime_paused = models.DateTimeField(null=True, blank=True, help_text="When the task entered WAITING state")
 
-    def start(self, user):
-        if user == self.owner:
+    # change feed
+    revision = models.BigIntegerField(
+        default=0, db_index=True, editable=False,
+        help_text="ID of the TaskChange that last touched this task",
+    )
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            if self.owner_id:
+                UserStats.record(self.owner_id, tasks_created=1)
+            # The revision needs the new id, so it is stamped with a second statement
+            self.revision = TaskChange.objects.create(task_id=self.pk).id
+            Task.objects.filter(pk=self.pk).update(revision=self.revision, is_public=Task._public_expression())
+            return
+        # Existing rows get their revision in the save's own UPDATE. is_public is left out:
+        # only refresh_public() writes it, so a save from a stale instance cannot undo a skill_read change
+        self.revision = TaskChange.objects.create(task_id=self.pk).id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name != 'is_public' and f.attname not in deferred
+            ]
+        kwargs['update_fields'] = {*update_fields, 'revision'} - {'is_public'}
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def _public_expression():
+        return ~models.Exists(Task.skill_read.through.objects.filter(task_id=models.OuterRef('pk')))
+
+    @classmethod
+    def refresh_public(cls, task_ids=None) -> None:
+        """Recompute is_public from skill_read (for all tasks when task_ids is None)."""
+        tasks = cls.objects.all() if task_ids is None else cls.objects.filter(id__in=task_ids)
+        tasks.update(is_public=cls._public_expression())
+
+    @classmethod
+    def bump_revisions(cls, task_ids) -> dict:
+        """Record a change for tasks modified without save() (bulk .update(), M2M, reviews).
+
+        Returns the new revision of each task.
+        """
+        changes = TaskChange.objects.bulk_create([TaskChange(task_id=task_id) for task_id in task_ids])
+        cls.objects.bulk_update([cls(id=c.task_id, revision=c.id) for c in changes], ['revision'])
+        return {c.task_id: c.id for c in changes}
+
+    def _transition(self, from_state: int, conflict: str, guard: models.Q | None = None, **changes) -> None:
+        """Apply a state change as one conditional UPDATE, recorded in the change feed.
+
+        The row is only written while it is still in from_state (and matches
+        guard), so of two concurrent transitions exactly one wins and the
+        other raises ValidationError(conflict) without holding a row lock
+        across the request. A losing attempt leaves a spare TaskChange, which
+        only makes clients re-read the row.
+        """
+        revision = TaskChange.objects.create(task_id=self.pk).id
+        updated = Task.objects.filter(guard or models.Q(), pk=self.pk, state=from_state).update(revision=revision, **changes)
+        if not updated:
+            raise ValidationError(conflict)
+        for field, value in changes.items():
+            setattr(self, field, value)
+        self.revision = revision
+
+    @classmethod
+    def pause_in_progress(cls, user, exclude_id: int | None = None) -> list:
+        """Pause the user's IN_PROGRESS tasks with one UPDATE, adding their elapsed time. Returns their ids."""
+        running = cls.objects.filter(assignee=user, state=cls.State.IN_PROGRESS)
+        if exclude_id is not None:
+            running = running.exclude(pk=exclude_id)
+        rows = list(running.values_list('id', 'datetime_start', 'time_spent_minutes'))
+        if not rows:
+            return []
+        current = now()
+        match = models.Q()
+        spent = []
+        for task_id, started, minutes in rows:
+            # Only rows still started at the time the elapsed minutes were computed from
+            match |= models.Q(id=task_id, datetime_start=started)
+            spent.append(models.When(id=task_id, then=models.Value(cls._spent_minutes(started, minutes, current))))
+        paused = cls.objects.filter(match, state=cls.State.IN_PROGRESS).update(
+            state=cls.State.WAITING,
+            datetime_start=None,
+            datetime_paused=current,
+            time_spent_minutes=models.Case(*spent, output_field=models.FloatField()),
+        )
+        ids = [task_id for task_id, _, _ in rows]
+        if paused < len(ids):
+            # Some rows changed since they were read; only the ones this UPDATE paused get a revision
+            ids = list(cls.objects.filter(id__in=ids, state=cls.State.WAITING, datetime_paused=current).values_list('id', flat=True))
+        if ids:
+            cls.bump_revisions(ids)
+        return ids
+
+    @staticmethod
+    def _spent_minutes(started, minutes, at):
+        """time_spent_minutes plus the time elapsed since datetime_start."""
+        if started is None:
+            return minutes
+        return (minutes or 0) + (at - started).total_seconds() / 60
+
+    def start(self, user) -> list:
+        """Assign the task to user and start it. Returns the ids of the user's tasks it paused."""
+        if user.id == self.owner_id:
             raise ValidationError("Owner cannot start the task")
         if self.state != Task.State.OPEN:
             raise ValidationError("Task is not open")
@@ -110,69 +224,68 @@ class Task(models.Model):
             if not has_all_skills:
                 raise ValidationError("User does not have required skills")
 
-        # Pause any task currently in progress for this user
-        for other in Task.objects.filter(assignee=user, state=Task.State.IN_PROGRESS):
-            other._accumulate_time()
-            other.state = Task.State.WAITING
-            other.datetime_paused = now()
-            other.save(update_fields=['state', 'time_spent_minutes', 'datetime_start', 'datetime_paused'])
-
-        self.state = Task.State.IN_PROGRESS
-        self.datetime_start = now()
-        self.datetime_paused = None
-        self.time_spent_minutes = None
-        self.assignee = user
-        self.save()
-
-    def _accumulate_time(self):
-        """Add elapsed time since datetime_start into time_spent_minutes."""
-        if self.datetime_start is not None:
-            elapsed_minutes = (now() - self.datetime_start).total_seconds() / 60
-            self.time_spent_minutes = (self.time_spent_minutes or 0) + elapsed_minutes
-            self.datetime_start = None
+        self._transition(
+            Task.State.OPEN, "Task is not open",
+            state=Task.State.IN_PROGRESS,
+            datetime_start=now(),
+            datetime_paused=None,
+            time_spent_minutes=None,
+            assignee=user,
+        )
+        # Pause any other task in progress for this user, only once this start has won
+        return Task.pause_in_progress(user, exclude_id=self.pk)
 
     def pause(self, user):
-        if user != self.assignee:
+        if user.id != self.assignee_id:
             raise ValidationError("Only assignee can pause the task")
 
         if self.state != Task.State.IN_PROGRESS:
             raise ValidationError("Task is not in progress")
 
-        self._accumulate_time()
-        self.state = Task.State.WAITING
-        self.datetime_paused = now()
-        self.save(update_fields=['state', 'time_spent_minutes', 'datetime_start', 'datetime_paused'])
+        current = now()
+        self._transition(
+            Task.State.IN_PROGRESS, "Task is not in progress",
+            guard=models.Q(assignee=user, datetime_start=self.datetime_start),
+            state=Task.State.WAITING,
+            time_spent_minutes=self._spent_minutes(self.datetime_start, self.time_spent_minutes, current),
+            datetime_start=None,
+            datetime_paused=current,
+        )
 
-    def resume(self, user):
+    def resume(self, user) -> list:
+        """Resume the task. Returns the ids of the user's other tasks it paused."""
         if self.state != Task.State.WAITING:
             raise ValidationError("Task is not waiting")
 
-        if user != self.assignee:
+        if user.id != self.assignee_id:
             raise ValidationError("Only assignee can resume the task")
 
-        # Pause any other in-progress task for this user (accumulate their time first)
-        for other in Task.objects.filter(assignee=user, state=Task.State.IN_PROGRESS).exclude(pk=self.pk):
-            other._accumulate_time()
-            other.state = Task.State.WAITING
-            other.datetime_paused = now()
-            other.save(update_fields=['state', 'time_spent_minutes', 'datetime_start', 'datetime_paused'])
-
-        self.state = Task.State.IN_PROGRESS
-        self.datetime_start = now()
-        self.datetime_paused = None
-        self.save(update_fields=['state', 'datetime_start', 'datetime_paused'])
+        self._transition(
+            Task.State.WAITING, "Task is not waiting",
+            guard=models.Q(assignee=user),
+            state=Task.State.IN_PROGRESS,
+            datetime_start=now(),
+            datetime_paused=None,
+        )
+        # Pause any other in-progress task for this user (accumulating their time), only once this resume has won
+        return Task.pause_in_progress(user, exclude_id=self.pk)
 
     def finish(self, user):
         if self.state != Task.State.IN_PROGRESS:
             raise ValidationError("Task is not in progress")
 
-        if user != self.owner and user != self.assignee:
+        if user.id != self.owner_id and user.id != self.assignee_id:
             raise ValidationError("Only owner and assignee can finish the task")
 
-        self._accumulate_time()
-        self.datetime_finish = now()
-        self.state = Task.State.IN_REVIEW
-        self.save()
+        current = now()
+        self._transition(
+            Task.State.IN_PROGRESS, "Task is not in progress",
+            guard=models.Q(assignee_id=self.assignee_id, datetime_start=self.datetime_start),
+            state=Task.State.IN_REVIEW,
+            time_spent_minutes=self._spent_minutes(self.datetime_start, self.time_spent_minutes, current),
+            datetime_start=None,
+            datetime_finish=current,
+        )
 
     def _can_review(self, user) -> bool:
         if self.owner is None:
@@ -197,25 +310,29 @@ class Task(models.Model):
         self.save()
         new_achievements = []
         if self.assignee is not None:
-            update_fields = []
+            earned_xp = earned_coins = 0.0
             config = GlobalConfig.get_config()
             time_multiplier = (self.minutes / config.time_modifier_minutes) if config.time_modifier_minutes > 0 else 1.0
             criticality_factor = 1.0 + (self.criticality - 1) * config.criticality_percentage
             if self.coins is not None:
                 earned_coins = self.coins * config.coins_modifier * time_multiplier
-                self.assignee.coins = models.F('coins') + earned_coins
-                self.assignee.total_coins_earned = models.F('total_coins_earned') + earned_coins
-                update_fields.extend(['coins', 'total_coins_earned'])
             if self.xp is not None:
                 earned_xp = self.xp * config.xp_modifier * time_multiplier * criticality_factor
-                self.assignee.xp = models.F('xp') + earned_xp
-                self.assignee.total_xp_earned = models.F('total_xp_earned') + earned_xp
-                update_fields.extend(['xp', 'total_xp_earned'])
-            self.assignee.task_streak = models.F('task_streak') + 1
-            update_fields.append('task_streak')
-            self.assignee.save(update_fields=update_fields)
-            self.assignee.refresh_from_db()
-            new_achievements = self.assignee.check_and_award_achievements()
+            self.assignee.grant_rewards(
+                RewardLedger(kind=RewardLedger.Kind.TASK, task=self, coins=earned_coins, xp=earned_xp),
+                streak=1,
+            )
+            skill_ids = list(self.skill_execute.values_list('id', flat=True))
+            leaderboard.record_rewards(self.assignee, xp=earned_xp, coins=earned_coins, skill_ids=skill_ids)
+            leaderboard.record_streak(self.assignee)
+            UserStats.record(
+                self.assignee_id,
+                skill_ids=skill_ids,
+                tasks_completed=1,
+                tasks_completed_medium=int(self.criticality == Task.Criticality.MEDIUM),
+                tasks_completed_high=int(self.criticality == Task.Criticality.HIGH),
+            )
+            new_achievements = self.assignee.check_and_award_achievements(Achievement.EVENT_TASK_ACCEPTED)
         return new_achievements
 
     def decline_review(self, user):
@@ -231,16 +348,21 @@ class Task(models.Model):
         self.save()
 
     def abandon(self, user):
-        if user != self.assignee:
+        if user.id != self.assignee_id:
             raise ValidationError("Only the assignee can abandon the task")
         if self.state not in (Task.State.IN_PROGRESS, Task.State.WAITING):
             raise ValidationError("Task cannot be abandoned in its current state")
+        self._transition(
+            self.state, "Task cannot be abandoned in its current state",
+            guard=models.Q(assignee=user),
+            state=Task.State.OPEN,
+            assignee=None,
+            datetime_start=None,
+        )
         user.task_streak = 0
         user.save(update_fields=['task_streak'])
-        self.state = Task.State.OPEN
-        self.assignee = None
-        self.datetime_start = None
-        self.save()
+        Achievement.invalidate_progress(user.id)
+        leaderboard.record_streak(user)
 
     def _schedule_respawn(self):
         """Set datetime_respawn based on respawn_offset or fixed respawn_time."""
@@ -257,45 +379,60 @@ class Task(models.Model):
             self.datetime_respawn = respawn_dt
 
     @classmethod
-    def check_and_respawn(cls):
-        """Reset all DONE tasks whose respawn time has passed back to OPEN."""
-        cls.objects.filter(
+    def check_and_respawn(cls, task_ids=None) -> list:
+        """Reset DONE tasks whose respawn time has passed back to OPEN. Returns the reset task IDs."""
+        due = cls.objects.filter(
             respawn=True,
             state=cls.State.DONE,
             datetime_respawn__lte=now(),
-        ).update(
-            state=cls.State.OPEN,
-            assignee=None,
-            datetime_start=None,
-            datetime_finish=None,
-            time_spent_minutes=None,
-            photo='',
         )
+        if task_ids is not None:
+            due = due.filter(id__in=task_ids)
+        with transaction.atomic():
+            ids = list(due.select_for_update().values_list('id', flat=True))
+            if ids:
+                due.filter(id__in=ids).update(
+                    state=cls.State.OPEN,
+                    assignee=None,
+                    datetime_start=None,
+                    datetime_finish=None,
+                    time_spent_minutes=None,
+                    photo='',
+                )
+                cls.bump_revisions(ids)
+        return ids
 
     @classmethod
-    def check_and_reset_stale(cls):
-        """Abandon WAITING tasks that have been paused longer than their estimated minutes x pause_multiplier."""
-        from datetime import timedelta as _td
-        from django.db.models import F, ExpressionWrapper, DurationField
+    def check_and_reset_stale(cls, task_ids=None) -> list:
+        """Abandon WAITING tasks paused longer than their estimated minutes x pause_multiplier. Returns the reset task IDs."""
         config = GlobalConfig.get_config()
-        cutoff = ExpressionWrapper(
-            _td(minutes=1) * F('minutes') * config.pause_multiplier,
-            output_field=DurationField(),
-        )
-        cls.objects.filter(
+        paused = cls.objects.filter(
             state=cls.State.WAITING,
             datetime_paused__isnull=False,
-        ).annotate(
-            max_pause=cutoff,
-        ).filter(
-            datetime_paused__lte=now() - F('max_pause'),
-        ).update(
-            state=cls.State.OPEN,
-            assignee=None,
-            datetime_start=None,
-            datetime_paused=None,
-            time_spent_minutes=None,
         )
+        if task_ids is not None:
+            paused = paused.filter(id__in=task_ids)
+        current = now()
+        with transaction.atomic():
+            # The cutoff is compared in Python: duration arithmetic on F('minutes')
+            # is not portable across database backends (SQLite in development).
+            ids = [
+                task_id
+                for task_id, paused_at, minutes in paused.select_for_update().values_list(
+                    'id', 'datetime_paused', 'minutes',
+                )
+                if paused_at <= current - timedelta(minutes=minutes * config.pause_multiplier)
+            ]
+            if ids:
+                cls.objects.filter(id__in=ids, state=cls.State.WAITING).update(
+                    state=cls.State.OPEN,
+                    assignee=None,
+                    datetime_start=None,
+                    datetime_paused=None,
+                    time_spent_minutes=None,
+                )
+                cls.bump_revisions(ids)
+        return ids
 
     def debug_reset(self):
         """Debug method to reset task to OPEN state"""
@@ -307,6 +444,72 @@ class Task(models.Model):
         self.reviews.filter(status=Review.Status.PENDING).delete()
 
 
+class TaskChange(models.Model):
+    """Append-only change feed for tasks. The auto-increment id is the revision.
+
+    task_id is not a foreign key so deletions stay in the feed.
+
+    Ids are allocated at insert, not at commit: a transaction can commit
+    revision N after a reader has already seen N+1. changed_since() therefore
+    also replays changes recorded up to REPLAY_WINDOW before the client's
+    revision, so a change is only missed if its transaction commits more than
+    REPLAY_WINDOW after recording it.
+    """
+    REPLAY_WINDOW = timedelta(seconds=60)
+
+    task_id = models.BigIntegerField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    @classmethod
+    def current_revision(cls) -> int:
+        return cls.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    @classmethod
+    def covers(cls, since: int) -> bool:
+        """Whether every change after `since` is still in the feed (not pruned)."""
+        oldest = cls.objects.order_by('id').values_list('id', flat=True).first()
+        return oldest is None or since >= oldest - 1
+
+    @classmethod
+    def _since(cls, since: int):
+        """Changes after `since`, plus earlier ones recorded within REPLAY_WINDOW before it (may have committed late).
+
+        `since` itself was committed when the client read it, so it is not replayed.
+        """
+        recorded_at = cls.objects.filter(id__lte=since).order_by('-id').values('created_at')[:1]
+        replay_from = models.ExpressionWrapper(
+            models.Subquery(recorded_at) - models.Value(cls.REPLAY_WINDOW),
+            output_field=models.DateTimeField(),
+        )
+        return cls.objects.filter(models.Q(id__gt=since) | models.Q(id__lt=since, created_at__gte=replay_from))
+
+    @classmethod
+    def changed_since(cls, since: int) -> set:
+        return set(cls._since(since).values_list('task_id', flat=True))
+
+    # Async counterparts for async views
+
+    @classmethod
+    async def acurrent_revision(cls) -> int:
+        return await cls.objects.order_by('-id').values_list('id', flat=True).afirst() or 0
+
+    @classmethod
+    async def acovers(cls, since: int) -> bool:
+        oldest = await cls.objects.order_by('id').values_list('id', flat=True).afirst()
+        return oldest is None or since >= oldest - 1
+
+    @classmethod
+    async def achanged_since(cls, since: int) -> set:
+        return {task_id async for task_id in cls._since(since).values_list('task_id', flat=True)}
+
+    @classmethod
+    def prune(cls, older_than: timedelta = timedelta(days=7)) -> int:
+        """Delete old changes, always keeping the newest so the current revision survives."""
+        latest = cls.current_revision()
+        deleted, _ = cls.objects.filter(created_at__lt=now() - older_than, id__lt=latest).delete()
+        return deleted
+
+
 class Rating(models.Model):
     task = models.ForeignKey(
         "comrade_core.Task", default=None, on_delete=models.RESTRICT, blank=True
@@ -321,6 +524,12 @@ class Rating(models.Model):
     def __str__(self) -> str:
         return f'Rating of task "{self.task}"'
 
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding and self.user_id:
+            UserStats.record(self.user_id, ratings_given=1)
+
 
 class Review(models.Model):
     class Status(models.TextChoices):
@@ -338,3 +547,82 @@ class Review(models.Model):
 
     def __str__(self) -> str:
         return f'Review of task "{self.task}" [{self.status}]'
+
+
+_SKILL_THROUGHS = (Task.skill_read.through, Task.skill_write.through, Task.skill_execute.through)
+
+
+def _tasks_with_skill(skill_id: int) -> set:
+    ids = set()
+    for through in _SKILL_THROUGHS:
+        ids.update(through.objects.filter(skill_id=skill_id).values_list('task_id', flat=True))
+    return ids
+
+
+def _task_skills_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Skill M2M edits change the serialized row: bump revisions (and is_public for skill_read)."""
+    if action == 'pre_clear' and reverse:
+        # Cleared from the skill side: the affected tasks are gone after the clear
+        instance._cleared_task_ids = set(sender.objects.filter(skill_id=instance.pk).values_list('task_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        task_ids = [instance.pk]
+    elif action == 'post_clear':
+        task_ids = instance.__dict__.pop('_cleared_task_ids', ())
+    else:
+        task_ids = pk_set
+    if sender is Task.skill_read.through:
+        Task.refresh_public(task_ids)
+    revisions = Task.bump_revisions(task_ids)
+    if not reverse:
+        instance.revision = revisions[instance.pk]
+        if sender is Task.skill_read.through:
+            instance.is_public = not instance.skill_read.exists()
+
+
+for _through in _SKILL_THROUGHS:
+    m2m_changed.connect(_task_skills_changed, sender=_through)
+
+
+@receiver(pre_delete, sender='comrade_core.Skill')
+def _skill_deleting(sender, instance, **kwargs):
+    instance._task_ids = _tasks_with_skill(instance.pk)
+
+
+@receiver(post_delete, sender='comrade_core.Skill')
+def _skill_deleted(sender, instance, **kwargs):
+    # The cascade removes the M2M rows without m2m_changed
+    task_ids = instance.__dict__.pop('_task_ids', ())
+    Task.refresh_public(task_ids)
+    Task.bump_revisions(task_ids)
+
+
+@receiver(post_save, sender='comrade_core.Skill')
+def _skill_saved(sender, instance, created, **kwargs):
+    if not created:
+        # Skill names are part of the serialized task rows
+        Task.bump_revisions(_tasks_with_skill(instance.pk))
+
+
+@receiver(post_delete, sender=Task)
+def _task_deleted(sender, instance, **kwargs):
+    # Sent per row for queryset deletes too (admin bulk delete, cleanups), so every deletion reaches the feed
+    TaskChange.objects.create(task_id=instance.pk)
+    # Completions stay counted (history), but tasks_created follows the owner's current tasks
+    if instance.owner_id:
+        UserStats.record(instance.owner_id, tasks_created=-1)
+
+
+@receiver(post_delete, sender=Rating)
+def _rating_deleted(sender, instance, **kwargs):
+    if instance.user_id:
+        UserStats.record(instance.user_id, ratings_given=-1)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def _review_changed(sender, instance, **kwargs):
+    # pending_review is part of the serialized task row
+    Task.bump_revisions([instance.task_id])
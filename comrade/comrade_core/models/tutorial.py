@@ -1,8 +1,10 @@
 from django.db import models
 from django.utils.timezone import now
 
+from .geo import GeohashIndexed
 
-class TutorialTask(models.Model):
+
+class TutorialTask(GeohashIndexed):
     """Standalone tutorial task — not linked to the regular Task model."""
     name = models.CharField(max_length=64)
     description = models.CharField(max_length=200, blank=True)
@@ -2,8 +2,12 @@ from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.db import models
 
+from .. import leaderboard
+from ..authentication import invalidate_users
 from ..utils import haversine_km, compute_level
 from .config import GlobalConfig
+from .ledger import RewardLedger
+from .stats import UserStats
 
 
 class User(AbstractUser):
@@ -61,18 +65,23 @@ class User(AbstractUser):
         symmetrical=False
     )
 
+    def _level_info(self) -> tuple[int, float, float]:
+        """compute_level for this user, memoized until total_xp_earned or level_modifier changes."""
+        key = (self.total_xp_earned, GlobalConfig.get_config().level_modifier)
+        memo = getattr(self, '_level_memo', None)
+        if memo is None or memo[0] != key:
+            memo = self._level_memo = (key, compute_level(*key))
+        return memo[1]
+
     @property
     def level(self) -> int:
         """Compute current level from total_xp_earned."""
-        config = GlobalConfig.get_config()
-        lvl, _, _ = compute_level(self.total_xp_earned, config.level_modifier)
-        return lvl
+        return self._level_info()[0]
 
     @property
     def level_progress(self) -> dict:
         """Return current level, XP into current level, and XP required for next level."""
-        config = GlobalConfig.get_config()
-        lvl, current_xp, required_xp = compute_level(self.total_xp_earned, config.level_modifier)
+        lvl, current_xp, required_xp = self._level_info()
         return {'level': lvl, 'current_xp': current_xp, 'required_xp': required_xp}
 
     def has_skill(self, skill_name):
@@ -117,6 +126,8 @@ class User(AbstractUser):
 
         self.friends.add(user)
         self.friend_requests_received.remove(user)
+        UserStats.record(self.id, friends_count=1)
+        UserStats.record(user.id, friends_count=1)
         return True
 
     def reject_friend_request(self, user):
@@ -133,6 +144,8 @@ class User(AbstractUser):
             raise ValidationError("Not friends with this user")
 
         self.friends.remove(user)
+        UserStats.record(self.id, friends_count=-1)
+        UserStats.record(user.id, friends_count=-1)
         return True
 
     def get_friends(self):
@@ -159,32 +172,143 @@ class User(AbstractUser):
         """Check if user has sent a friend request to another user"""
         return user in self.friend_requests_sent.all()
 
-    def check_and_award_achievements(self) -> list:
-        """Check all active achievements and award newly unlocked ones. Returns list of newly awarded Achievement objects."""
+    # True once coins/XP hold snapshot + ledger tail on this instance (see ensure_balances())
+    _balances_fresh = False
+
+    def refresh_balances(self) -> None:
+        """Load coins/XP (balance and lifetime total) and streak as snapshot + unapplied ledger tail.
+
+        The balance columns only hold what RewardLedger.compact() has folded
+        in so far; both parts are read in one statement so a concurrent
+        compaction cannot be counted twice.
+        """
+        self._set_balances(self._balances().get())
+
+    async def arefresh_balances(self) -> None:
+        """refresh_balances() for async views."""
+        self._set_balances(await self._balances().aget())
+
+    def ensure_balances(self) -> None:
+        """refresh_balances() unless this instance already holds them.
+
+        grant_rewards() (and any refresh) leaves the totals on the instance,
+        so the achievement check and the user_stats_update push that follow a
+        payout in the same request do not read them again.
+        """
+        if not self._balances_fresh:
+            self.refresh_balances()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        # The row only holds the snapshot part of the balances
+        self._balances_fresh = False
+
+    def _balances(self):
+        return User.objects.filter(pk=self.pk).values(
+            'coins', 'xp', 'total_coins_earned', 'total_xp_earned', 'task_streak',
+        ).annotate(**{
+            f'pending_{name}': total for name, total in RewardLedger.tail(models.OuterRef('pk')).items()
+        })
+
+    def _set_balances(self, row: dict) -> None:
+        # A user without uncompacted entries gets NULL from the tail subqueries
+        self.coins = row['coins'] + (row['pending_balance_coins'] or 0.0)
+        self.xp = row['xp'] + (row['pending_balance_xp'] or 0.0)
+        self.total_coins_earned = row['total_coins_earned'] + (row['pending_earned_coins'] or 0.0)
+        self.total_xp_earned = row['total_xp_earned'] + (row['pending_earned_xp'] or 0.0)
+        self.task_streak = row['task_streak']
+        self._balances_fresh = True
+
+    def grant_rewards(self, *entries: RewardLedger, streak: int = 0) -> None:
+        """Append reward entries to the ledger, add to the streak, and refresh balances.
+
+        Entries are inserted rather than added to the user row, so concurrent
+        payouts to one user do not serialize on its row lock. Only a streak
+        change writes the user row.
+        """
+        # Accepted-task entries are kept without a reward too: they are the completion history (UserStats.rebuild)
+        entries = [e for e in entries if e.coins or e.xp or e.kind == RewardLedger.Kind.TASK]
+        for entry in entries:
+            entry.user = self
+        RewardLedger.objects.bulk_create(entries)
+        if streak:
+            User.objects.filter(pk=self.pk).update(task_streak=models.F('task_streak') + streak)
+            invalidate_users(self.pk)
+        self.refresh_balances()
+
+    def check_and_award_achievements(self, *events) -> list:
+        """Check active achievements and award newly unlocked ones. Returns list of newly awarded Achievement objects.
+
+        Pass the domain events that just happened (Achievement.EVENT_*) to only
+        evaluate the achievements they can affect; with no events, all are checked.
+        """
         from .achievement import Achievement, UserAchievement
+        # The triggering event moved at least one metric (streak, XP, counters, skills)
+        Achievement.invalidate_progress(self.id)
         earned_ids = set(self.user_achievements.values_list('achievement_id', flat=True))
+        pending = [a for a in Achievement.triggered_by(*events) if a.id not in earned_ids]
+        considered = {a.id for a in pending}
         new_awards = []
-        for achievement in Achievement.objects.filter(is_active=True).exclude(id__in=earned_ids):
-            progress = achievement.compute_progress(self)
-            if progress >= achievement.condition_value:
-                UserAchievement.objects.create(user=self, achievement=achievement, progress=progress)
-                update_fields = []
-                if achievement.reward_coins > 0:
-                    self.coins = models.F('coins') + achievement.reward_coins
-                    self.total_coins_earned = models.F('total_coins_earned') + achievement.reward_coins
-                    update_fields.extend(['coins', 'total_coins_earned'])
-                if achievement.reward_xp > 0:
-                    self.xp = models.F('xp') + achievement.reward_xp
-                    self.total_xp_earned = models.F('total_xp_earned') + achievement.reward_xp
-                    update_fields.extend(['xp', 'total_xp_earned'])
-                if update_fields:
-                    self.save(update_fields=update_fields)
-                    self.refresh_from_db()
-                if achievement.reward_skill:
-                    self.skills.add(achievement.reward_skill)
-                new_awards.append(achievement)
+        metrics = {}
+        while pending:
+            metrics.update(Achievement.compute_metrics(
+                self, {a.metric_key() for a in pending} - metrics.keys(),
+            ))
+            crossed_ids = [a.id for a in pending if metrics[a.metric_key()] >= a.condition_value]
+            if not crossed_ids:
+                break
+            # The achievement list is cached: confirm against current rows before awarding
+            fresh = Achievement.objects.filter(id__in=crossed_ids, is_active=True).select_related('reward_skill').in_bulk()
+            crossed = [
+                a for a in (fresh.get(i) for i in crossed_ids)
+                if a is not None and metrics.get(a.metric_key(), 0) >= a.condition_value
+            ]
+            pending = [a for a in pending if a.id not in crossed_ids]
+            if not crossed:
+                continue
+            UserAchievement.objects.bulk_create([
+                UserAchievement(user=self, achievement=a, progress=metrics[a.metric_key()])
+                for a in crossed
+            ])
+            new_awards.extend(crossed)
+
+            reward_coins = sum(a.reward_coins for a in crossed if a.reward_coins > 0)
+            reward_xp = sum(a.reward_xp for a in crossed if a.reward_xp > 0)
+            reward_skills = [a.reward_skill for a in crossed if a.reward_skill]
+            if reward_coins or reward_xp:
+                self.grant_rewards(*(
+                    RewardLedger(
+                        kind=RewardLedger.Kind.ACHIEVEMENT, achievement=a,
+                        coins=max(a.reward_coins, 0), xp=max(a.reward_xp, 0),
+                    )
+                    for a in crossed
+                ))
+                leaderboard.record_rewards(self, xp=reward_xp, coins=reward_coins)
+            if reward_skills:
+                self.skills.add(*reward_skills)
+            if not (reward_coins or reward_xp or reward_skills):
+                break
+            # Rewards can unlock further achievements: recompute only the metrics they move
+            reward_conditions = Achievement.TRIGGERS[Achievement.EVENT_REWARD_GRANTED]
+            for key in list(metrics):
+                if key[0] in reward_conditions:
+                    del metrics[key]
+            for a in Achievement.triggered_by(Achievement.EVENT_REWARD_GRANTED):
+                if a.id not in earned_ids and a.id not in considered:
+                    pending.append(a)
+                    considered.add(a.id)
         return new_awards
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_users(self.pk)
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        invalidate_users(user_id)
+        return result
+
     def distance_to(self, other_user):
         """Calculate distance to another user in kilometers."""
         return haversine_km(self.latitude, self.longitude, other_user.latitude, other_user.longitude)
@@ -0,0 +1,196 @@
+"""
+Presence registry: which users currently have a live WebSocket connection.
+
+Every connection (keyed by its channel name) is registered with an expiry
+that the client's `heartbeat` message pushes forward by _PRESENCE_TTL
+seconds. A user is online while at least one of their connections has not
+expired, so several devices count as one presence and a worker that dies
+without running `disconnect` only leaves entries that time out.
+
+touch() / leave() report whether the user went online / offline, so
+consumers only announce real transitions. sweep() (run periodically by
+`run_scheduler`) finds users whose last connection expired and pushes
+their friends one batched `presence_update` per recipient.
+
+The backend is chosen by settings.PRESENCE_BACKEND: Redis (the channel layer
+instance) in production, a process-local one for tests.
+"""
+
+import threading
+import time as _time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+_PRESENCE_TTL = 30  # seconds; clients send a heartbeat every 5s
+
+_KEY_PREFIX = 'comrade:presence'
+_USERS_KEY = f'{_KEY_PREFIX}:users'
+
+# Register/refresh a connection. Returns the number of live connections before it.
+_TOUCH_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+local before = redis.call('ZCARD', KEYS[1])
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[4])
+return before
+"""
+
+# Drop a connection (ARGV[1], may be empty) and expired ones. Returns 1 if the user went offline.
+_LEAVE_SCRIPT = """
+if ARGV[1] ~= '' then
+  redis.call('ZREM', KEYS[1], ARGV[1])
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+if redis.call('ZCARD', KEYS[1]) == 0 then
+  redis.call('DEL', KEYS[1])
+  return redis.call('ZREM', KEYS[2], ARGV[3])
+end
+local latest = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+redis.call('ZADD', KEYS[2], latest[2], ARGV[3])
+return 0
+"""
+
+
+def _connections_key(user_id: int) -> str:
+    return f'{_KEY_PREFIX}:conns:{user_id}'
+
+
+class RedisPresenceBackend:
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+        self._touch = self.client.register_script(_TOUCH_SCRIPT)
+        self._leave = self.client.register_script(_LEAVE_SCRIPT)
+
+    def touch(self, user_id: int, connection: str, now: float) -> bool:
+        before = self._touch(
+            keys=[_connections_key(user_id), _USERS_KEY],
+            args=[connection, now, now + _PRESENCE_TTL, user_id, _PRESENCE_TTL * 2],
+        )
+        return before == 0
+
+    def leave(self, user_id: int, connection: str, now: float) -> bool:
+        return self._leave(keys=[_connections_key(user_id), _USERS_KEY], args=[connection, now, user_id]) == 1
+
+    def online(self, user_ids, now: float) -> set[int]:
+        user_ids = list(user_ids)
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zscore(_USERS_KEY, user_id)
+        return {user_id for user_id, expiry in zip(user_ids, pipe.execute()) if expiry is not None and expiry > now}
+
+    def expired(self, now: float) -> list[int]:
+        """Users whose latest connection expired; expire() confirms each one."""
+        return [int(user_id) for user_id in self.client.zrangebyscore(_USERS_KEY, '-inf', now)]
+
+    def expire(self, user_id: int, now: float) -> bool:
+        return self.leave(user_id, '', now)
+
+
+class MemoryPresenceBackend:
+    """Process-local registry for tests and single-process development."""
+
+    def __init__(self):
+        self._connections: dict[int, dict[str, float]] = {}
+        # Consumers call in from worker threads
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self._connections.clear()
+
+    def _live(self, user_id: int, now: float) -> dict[str, float]:
+        connections = {c: e for c, e in self._connections.get(user_id, {}).items() if e > now}
+        if connections:
+            self._connections[user_id] = connections
+        else:
+            self._connections.pop(user_id, None)
+        return connections
+
+    def touch(self, user_id: int, connection: str, now: float) -> bool:
+        with self._lock:
+            was_online = bool(self._live(user_id, now))
+            self._connections.setdefault(user_id, {})[connection] = now + _PRESENCE_TTL
+            return not was_online
+
+    def leave(self, user_id: int, connection: str, now: float) -> bool:
+        with self._lock:
+            if user_id not in self._connections:
+                return False
+            self._connections[user_id].pop(connection, None)
+            return not self._live(user_id, now)
+
+    def online(self, user_ids, now: float) -> set[int]:
+        with self._lock:
+            return {
+                user_id for user_id in user_ids
+                if any(e > now for e in self._connections.get(user_id, {}).values())
+            }
+
+    def expired(self, now: float) -> list[int]:
+        with self._lock:
+            return [
+                user_id for user_id, connections in self._connections.items()
+                if all(e <= now for e in connections.values())
+            ]
+
+    def expire(self, user_id: int, now: float) -> bool:
+        return self.leave(user_id, '', now)
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.PRESENCE_BACKEND)()
+    return _backend
+
+
+@receiver(setting_changed)
+def _reset_backend(setting, **kwargs):
+    global _backend
+    if setting in ('PRESENCE_BACKEND', 'REDIS_URL'):
+        _backend = None
+
+
+def touch(user_id: int, connection: str) -> bool:
+    """Register or refresh a connection. Returns True if the user just came online."""
+    return get_backend().touch(user_id, connection, _time.time())
+
+
+def leave(user_id: int, connection: str) -> bool:
+    """Unregister a connection. Returns True if it was the user's last live connection."""
+    return get_backend().leave(user_id, connection, _time.time())
+
+
+def online_ids(user_ids) -> set[int]:
+    """The subset of user_ids that are online."""
+    return get_backend().online(user_ids, _time.time())
+
+
+def sweep() -> list[int]:
+    """Mark users whose connections all expired as offline and notify their friends. Returns their ids."""
+    from .models import User
+    from .ws_events import batched, send_presence
+
+    now = _time.time()
+    backend = get_backend()
+    offline = [user_id for user_id in backend.expired(now) if backend.expire(user_id, now)]
+    if not offline:
+        return []
+    changes = {}
+    for user_id, friend_id in User.friends.through.objects.filter(
+        from_user_id__in=offline,
+    ).values_list('from_user_id', 'to_user_id'):
+        changes.setdefault(friend_id, []).append(user_id)
+    with batched():
+        for recipient_id, user_ids in changes.items():
+            send_presence(recipient_id, offline=user_ids)
+    return offline
@@ -0,0 +1,151 @@
+"""
+Deadline scheduler for task state transitions.
+
+Respawns (DONE → OPEN at datetime_respawn) and stale-pause resets
+(WAITING → OPEN after minutes × pause_multiplier) are kept in a min-heap
+ordered by due time and applied as soon as they are due, so request
+handlers never sweep the task table. The same loop folds the reward ledger
+tail into user balances. Run it with `manage.py run_scheduler`.
+
+Queue entries are only wake-up hints: the transitions themselves re-check
+their conditions in SQL, so an entry made stale by a later resume or
+restart is a harmless no-op.
+"""
+
+import heapq
+import logging
+import time as _time
+from datetime import datetime, timedelta
+
+from django.db import close_old_connections
+from django.utils.timezone import now
+
+from . import presence
+from .models import GlobalConfig, RewardLedger, Task, TaskChange
+from .ws_events import batched, send_task_update
+
+logger = logging.getLogger(__name__)
+
+RESPAWN = 'respawn'
+STALE_RESET = 'stale_reset'
+
+# How often the task change feed is pruned (seconds)
+_PRUNE_INTERVAL = 3600
+# How often expired WebSocket presences are swept (seconds)
+_PRESENCE_SWEEP_INTERVAL = 10
+# How often the reward ledger is compacted into user balances (seconds)
+_COMPACT_INTERVAL = 5
+
+
+class TaskScheduler:
+    def __init__(self, reload_interval: float = 10.0):
+        # New deadlines are created by other processes, so the queue is
+        # rebuilt from the database every reload_interval seconds.
+        self.reload_interval = reload_interval
+        self._queue: list[tuple[datetime, int, str]] = []
+        self._loaded_at: float | None = None
+        self._pruned_at: float | None = None
+        self._presence_swept_at: float | None = None
+        self._compacted_at: float | None = None
+
+    def load(self):
+        """Rebuild the deadline queue from the database."""
+        queue = [
+            (due, task_id, RESPAWN)
+            for task_id, due in Task.objects.filter(
+                respawn=True, state=Task.State.DONE, datetime_respawn__isnull=False,
+            ).values_list('id', 'datetime_respawn')
+        ]
+        pause_multiplier = GlobalConfig.get_config().pause_multiplier
+        queue.extend(
+            (paused + timedelta(minutes=minutes * pause_multiplier), task_id, STALE_RESET)
+            for task_id, paused, minutes in Task.objects.filter(
+                state=Task.State.WAITING, datetime_paused__isnull=False,
+            ).values_list('id', 'datetime_paused', 'minutes')
+        )
+        heapq.heapify(queue)
+        self._queue = queue
+        self._loaded_at = _time.monotonic()
+
+    def seconds_until_next(self) -> float | None:
+        """Seconds until the earliest queued deadline, or None if the queue is empty."""
+        if not self._queue:
+            return None
+        return max((self._queue[0][0] - now()).total_seconds(), 0.0)
+
+    def run_due(self) -> list:
+        """Apply every transition that is due and notify clients. Returns the changed tasks."""
+        current = now()
+        due = {RESPAWN: [], STALE_RESET: []}
+        while self._queue and self._queue[0][0] <= current:
+            _, task_id, kind = heapq.heappop(self._queue)
+            due[kind].append(task_id)
+
+        changed = []
+        if due[RESPAWN]:
+            for task_id in Task.check_and_respawn(task_ids=due[RESPAWN]):
+                changed.append((task_id, RESPAWN, None))
+        if due[STALE_RESET]:
+            # Remember who was working on the task so they learn it was reset
+            previous_assignees = dict(
+                Task.objects.filter(id__in=due[STALE_RESET]).values_list('id', 'assignee_id')
+            )
+            for task_id in Task.check_and_reset_stale(task_ids=due[STALE_RESET]):
+                changed.append((task_id, STALE_RESET, previous_assignees.get(task_id)))
+
+        tasks = Task.objects.select_related('owner', 'assignee').in_bulk([c[0] for c in changed])
+        with batched():
+            for task_id, action, previous_assignee_id in changed:
+                task = tasks[task_id]
+                notify = (previous_assignee_id,) if previous_assignee_id else ()
+                send_task_update(task, action=action, notify_user_ids=notify)
+                logger.info("Scheduler: task %d %s", task_id, action)
+        return [tasks[c[0]] for c in changed]
+
+    def compact_ledger(self, batch_size: int = 5000) -> int:
+        """Fold every uncompacted reward ledger entry into user balances. Returns the entry count."""
+        total = 0
+        while True:
+            compacted = RewardLedger.compact(batch_size=batch_size)
+            total += compacted
+            if compacted < batch_size:
+                return total
+
+    def run_forever(self):
+        while True:
+            close_old_connections()
+            if self._loaded_at is None or _time.monotonic() - self._loaded_at >= self.reload_interval:
+                self.load()
+            self.run_due()
+            if self._pruned_at is None or _time.monotonic() - self._pruned_at >= _PRUNE_INTERVAL:
+                pruned = TaskChange.prune()
+                if pruned:
+                    logger.info("Scheduler: pruned %d task changes", pruned)
+                self._pruned_at = _time.monotonic()
+            if self._presence_swept_at is None or _time.monotonic() - self._presence_swept_at >= _PRESENCE_SWEEP_INTERVAL:
+                try:
+                    offline = presence.sweep()
+                except Exception:
+                    logger.exception("Scheduler: presence sweep failed")
+                else:
+                    if offline:
+                        logger.info("Scheduler: %d user(s) timed out offline", len(offline))
+                self._presence_swept_at = _time.monotonic()
+            if self._compacted_at is None or _time.monotonic() - self._compacted_at >= _COMPACT_INTERVAL:
+                try:
+                    compacted = self.compact_ledger()
+                except Exception:
+                    logger.exception("Scheduler: reward ledger compaction failed")
+                else:
+                    if compacted:
+                        logger.info("Scheduler: compacted %d reward ledger entries", compacted)
+                self._compacted_at = _time.monotonic()
+            sleep_for = min(
+                self.reload_interval - (_time.monotonic() - self._loaded_at),
+                _PRESENCE_SWEEP_INTERVAL - (_time.monotonic() - self._presence_swept_at),
+                _COMPACT_INTERVAL - (_time.monotonic() - self._compacted_at),
+            )
+            next_due = self.seconds_until_next()
+            if next_due is not None:
+                sleep_for = min(sleep_for, next_due)
+            _time.sleep(max(sleep_for, 0.05))
@@ -1,7 +1,12 @@
 import datetime
+import hashlib
+from urllib.parse import urljoin
 
+from django.core.cache import cache
+from django.db import models
 from comrade_core.models import Task, User, Review, Skill, TutorialTask, TutorialPart, TutorialQuestion, TutorialAnswer, TutorialProgress, TutorialPartSubmission, OnboardingTemplate
 from rest_framework import serializers
+from rest_framework.utils.serializer_helpers import ReturnList
 
 
 class UserDetailSerializer(serializers.ModelSerializer):
@@ -13,10 +18,15 @@ class UserDetailSerializer(serializers.ModelSerializer):
         """Return skill names, hiding onboarding reward skills only after all onboarding tutorials are complete.
 
         Only tutorials gate onboarding completion — tasks may respawn and shouldn't
-        re-trigger onboarding mode.
+        re-trigger onboarding mode. Async views pass the names preloaded by
+        aload_skill_names() as context['skill_names'].
         """
         from comrade_core.models import UserOnboardingTutorial, UserOnboardingTask
 
+        preloaded = self.context.get('skill_names')
+        if preloaded is not None:
+            return preloaded[obj.id]
+
         onboarding_tutorial_ids = set(
             UserOnboardingTutorial.objects.filter(user=obj).values_list('tutorial_id', flat=True)
         )
@@ -62,13 +72,134 @@ class UserDetailSerializer(serializers.ModelSerializer):
         fields = ["id", "username", "email", "latitude", "longitude", "skills", "is_superuser", "is_staff", "coins", "xp", "total_coins_earned", "total_xp_earned", "task_streak", "level", "level_progress", "profile_picture"]
 
 
+async def aload_skill_names(user_ids) -> dict:
+    """UserDetailSerializer.get_skills() for many users through the async ORM: {user_id: [names]}.
+
+    Same rules, but batched: a fixed number of queries regardless of how many
+    users are serialized.
+    """
+    from comrade_core.models import UserOnboardingTutorial, UserOnboardingTask
+
+    user_ids = list(user_ids)
+    skills = {user_id: [] for user_id in user_ids}
+    async for user_id, skill_id, name in User.skills.through.objects.filter(
+        user_id__in=user_ids,
+    ).order_by('skill_id').values_list('user_id', 'skill_id', 'skill__name'):
+        skills[user_id].append((skill_id, name))
+
+    pending = {user_id: set() for user_id in user_ids}  # onboarding items not completed yet
+    onboarding = set()
+    onboarding_tutorial_ids = set()
+    async for user_id, tutorial_id in UserOnboardingTutorial.objects.filter(
+        user_id__in=user_ids,
+    ).values_list('user_id', 'tutorial_id'):
+        onboarding.add(user_id)
+        pending[user_id].add(('tutorial', tutorial_id))
+        onboarding_tutorial_ids.add(tutorial_id)
+    async for user_id, task_id, completed in UserOnboardingTask.objects.filter(
+        user_id__in=user_ids,
+    ).values_list('user_id', 'task_id', 'completed'):
+        onboarding.add(user_id)
+        if not completed:
+            pending[user_id].add(('task', task_id))
+    if onboarding_tutorial_ids:
+        async for user_id, tutorial_id in TutorialProgress.objects.filter(
+            user_id__in=user_ids, state=TutorialProgress.State.DONE, tutorial_id__in=onboarding_tutorial_ids,
+        ).values_list('user_id', 'tutorial_id'):
+            pending[user_id].discard(('tutorial', tutorial_id))
+
+    # Onboarding reward skills are hidden only once all onboarding items are complete
+    done = {user_id for user_id in onboarding if not pending[user_id]}
+    hide_skill_ids = {
+        skill_id async for skill_id in OnboardingTemplate.objects.filter(
+            is_active=True, tutorial__isnull=False,
+        ).values_list('tutorial__reward_skill_id', flat=True)
+    } if done else set()
+    return {
+        user_id: [name for skill_id, name in rows if user_id not in done or skill_id not in hide_skill_ids]
+        for user_id, rows in skills.items()
+    }
+
+
 class PendingReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = ['id', 'comment', 'photo', 'status', 'created_at']
 
 
+_TASK_ROW_TTL = 60 * 60 * 24  # seconds; rows are keyed by revision, so this only bounds memory
+
+
+def _task_row_cache_key(task, request) -> str:
+    # File fields render as absolute URLs when a request is present
+    base = request.build_absolute_uri('/') if request is not None else ''
+    return f'task:row:{task.id}:{task.revision}:{hashlib.sha1(base.encode()).hexdigest()[:12]}'
+
+
+class SiteRequest:
+    """Stand-in for the request when serializing outside one (WebSocket broadcasts).
+
+    Builds absolute URIs against the site's base URL (settings.SITE_URL), so
+    file fields render as they do for REST readers of that site and rows
+    share their cache entries.
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/') + '/'
+
+    def build_absolute_uri(self, location: str = '/') -> str:
+        return urljoin(self.base_url, location)
+
+
+class TaskListSerializer(serializers.ListSerializer):
+    """Serializes a task list through the row cache with one get_many / set_many.
+
+    Async views use adata(), which awaits the cache round trips instead of
+    blocking the event loop.
+    """
+
+    def to_representation(self, data):
+        tasks, keys = self._keys(data)
+        rows, missing = self._rows(tasks, keys, cache.get_many(keys))
+        if missing:
+            cache.set_many(missing, _TASK_ROW_TTL)
+        return rows
+
+    async def ato_representation(self, data):
+        tasks, keys = self._keys(data)
+        rows, missing = self._rows(tasks, keys, await cache.aget_many(keys))
+        if missing:
+            await cache.aset_many(missing, _TASK_ROW_TTL)
+        return rows
+
+    async def adata(self):
+        """data for async views: the rows of the instance list, built with ato_representation()."""
+        return ReturnList(await self.ato_representation(self.instance), serializer=self)
+
+    def _keys(self, data):
+        tasks = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        request = self.context.get('request')
+        return tasks, [_task_row_cache_key(task, request) for task in tasks]
+
+    def _rows(self, tasks, keys, cached):
+        """Rows for tasks from the cached rows; also returns the rows that were missing, by key."""
+        missing = {}
+        rows = []
+        for task, key in zip(tasks, keys):
+            row = cached.get(key)
+            if row is None:
+                row = missing[key] = self.child.shared_representation(task)
+            rows.append(self.child.with_overlay(row, task))
+        return rows, missing
+
+
 class TaskSerializer(serializers.ModelSerializer):
+    """Task rows, cached per task revision.
+
+    Everything but the overlay fields is the same for every reader, so rows
+    are cached under (task id, revision): any write to a task bumps its
+    revision (save(), bump_revisions()), which makes stale rows unreachable.
+    """
     skill_execute_names = serializers.SerializerMethodField()
     skill_read_names = serializers.SerializerMethodField()
     skill_write_names = serializers.SerializerMethodField()
@@ -109,8 +240,28 @@ class TaskSerializer(serializers.ModelSerializer):
             return PendingReviewSerializer(pending[0], context=self.context).data
         return None
 
+    def shared_representation(self, instance) -> dict:
+        return dict(super().to_representation(instance))
+
+    def with_overlay(self, row: dict, instance) -> dict:
+        """Fill in the fields that are not cached: per-user onboarding locations and the assignee's current name."""
+        row = dict(row)
+        row['lat'] = self.get_lat(instance)
+        row['lon'] = self.get_lon(instance)
+        row['assignee_name'] = self.get_assignee_name(instance)
+        return row
+
+    def to_representation(self, instance):
+        key = _task_row_cache_key(instance, self.context.get('request'))
+        row = cache.get(key)
+        if row is None:
+            row = self.shared_representation(instance)
+            cache.set(key, row, _TASK_ROW_TTL)
+        return self.with_overlay(row, instance)
+
     class Meta:
         model = Task
+        list_serializer_class = TaskListSerializer
         fields = [
             'id', 'name', 'description', 'lat', 'lon',
             'state', 'criticality', 'minutes', 'coins', 'xp',
@@ -284,6 +435,9 @@ class TutorialTaskFlatSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_tutorial_pending_review(self, obj):
+        pending_review_ids = self.context.get('pending_review_ids')
+        if pending_review_ids is not None:
+            return obj.pk in pending_review_ids
         request = self.context.get('request')
         if not request:
             return False
@@ -297,6 +451,9 @@ class TutorialTaskFlatSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or obj.owner_id != request.user.id:
             return 0
+        owner_pending_counts = self.context.get('owner_pending_counts')
+        if owner_pending_counts is not None:
+            return owner_pending_counts.get(obj.pk, 0)
         from comrade_core.models import TutorialReview
         return TutorialReview.objects.filter(tutorial=obj, status='pending').count()
 
@@ -1,9 +1,9 @@
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework.test import APITestCase, APIClient
 from rest_framework.authtoken.models import Token
 
-from comrade_core.models import Skill, Task, User, Review, Achievement, TutorialTask, TutorialPart, TutorialQuestion, TutorialAnswer, TutorialProgress, TutorialReview, TutorialPartSubmission, OnboardingTemplate, UserOnboardingTutorial
+from comrade_core.models import Skill, Task, User, Review, Achievement, RewardLedger, TutorialTask, TutorialPart, TutorialQuestion, TutorialAnswer, TutorialProgress, TutorialReview, TutorialPartSubmission, OnboardingTemplate, UserOnboardingTutorial
 
 
 class TaskTestCase(TestCase):
@@ -123,6 +123,278 @@ class TaskListVisibilityTest(APITestCase):
         t.skill_write.add(self.skill_a)
         self.assertIn(t.id, self._task_ids())
 
+    def test_is_public_follows_read_skills(self):
+        t = Task.objects.create(name='t', owner=self.owner, state=Task.State.OPEN)
+        stale = Task.objects.get(pk=t.pk)
+        t.skill_read.add(self.skill_a, self.skill_b)
+        self.assertFalse(Task.objects.get(pk=t.pk).is_public)
+        stale.save()  # a stale instance does not make the task public again
+        self.assertFalse(Task.objects.get(pk=t.pk).is_public)
+        self.skill_a.read.remove(t)
+        self.assertFalse(Task.objects.get(pk=t.pk).is_public)
+        self.skill_b.delete()
+        self.assertTrue(Task.objects.get(pk=t.pk).is_public)
+        t.skill_read.set([self.skill_a])
+        t.skill_read.clear()
+        self.assertTrue(Task.objects.get(pk=t.pk).is_public)
+
+    def test_task_query_has_no_joins(self):
+        from comrade_core.visibility import TaskVisibility
+        self.user.skills.add(self.skill_a)
+        sql = str(Task.objects.filter(TaskVisibility(self.user).tasks_q()).query)
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('DISTINCT', sql)
+
+
+class TaskRowCacheTest(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass')
+        self.user = User.objects.create_user(username='worker', password='pass', first_name='Wo')
+        self.skill = Skill.objects.create(name='Old')
+        self.task = Task.objects.create(name='t', owner=self.owner, state=Task.State.OPEN)
+        self.task.skill_execute.add(self.skill)
+        self.client.force_authenticate(self.user)
+
+    def _row(self):
+        resp = self.client.get('/api/tasks/')
+        return next(t for t in resp.data['tasks'] if t['id'] == self.task.id)
+
+    def test_rows_are_served_from_cache_until_the_revision_changes(self):
+        from unittest import mock
+        from comrade_core.serializers import TaskSerializer
+        self._row()
+        with mock.patch.object(TaskSerializer, 'shared_representation', side_effect=AssertionError('not cached')):
+            self.assertEqual(self._row()['skill_execute_names'], ['Old'])
+        self.skill.name = 'New'
+        self.skill.save()
+        self.assertEqual(self._row()['skill_execute_names'], ['New'])
+
+    @override_settings(SITE_URL='http://testserver')
+    def test_delta_rows_share_the_rest_cache_entry(self):
+        from unittest import mock
+        from comrade_core import ws_events
+        from comrade_core.serializers import TaskSerializer
+        with mock.patch.object(ws_events, '_send') as send:
+            ws_events.send_task_delta([self.task])
+        delta_row = send.call_args.args[1]['tasks'][0]['row']
+        with mock.patch.object(TaskSerializer, 'shared_representation', side_effect=AssertionError('not cached')):
+            self.assertEqual(self._row(), delta_row)
+
+    def test_streamed_list_matches_buffered_list(self):
+        import json
+        from asgiref.sync import async_to_sync
+        from unittest import mock
+        from comrade_core.views.task import TaskListView
+        locked = Task.objects.create(name='locked', owner=self.owner, state=Task.State.OPEN)
+        locked.skill_read.add(self.skill)
+        Task.objects.create(name='second', owner=self.owner, state=Task.State.OPEN)
+        TutorialTask.objects.create(name='Learn', reward_skill=self.skill)
+        buffered = self.client.get('/api/tasks/').data
+        with mock.patch.object(TaskListView, 'STREAM_CHUNK_SIZE', 1):
+            resp = self.client.get('/api/tasks/?stream=1')
+        self.assertTrue(resp.streaming)
+
+        async def body():
+            return b''.join([chunk async for chunk in resp.streaming_content])
+        streamed = json.loads(async_to_sync(body)())
+        self.assertEqual(streamed, json.loads(json.dumps(buffered, default=str)))
+        self.assertEqual(len(streamed['tasks']), 3)
+
+    def test_tutorial_review_fields_are_batched(self):
+        mine = TutorialTask.objects.create(name='Mine', owner=self.user, reward_skill=Skill.objects.create(name='Mine'))
+        theirs = TutorialTask.objects.create(name='Theirs', owner=self.owner, reward_skill=self.skill)
+        TutorialReview.objects.create(tutorial=mine, user=self.owner)
+        TutorialReview.objects.create(tutorial=mine, user=User.objects.create_user(username='third', password='pass'))
+        TutorialProgress.objects.create(user=self.user, tutorial=theirs, review_status='pending')
+        resp = self.client.get('/api/tasks/')
+        rows = {t['name']: t for t in resp.data['tasks'] if t['is_tutorial']}
+        self.assertEqual(rows['Mine']['owner_pending_review_count'], 2)
+        self.assertEqual(rows['Theirs']['owner_pending_review_count'], 0)
+        self.assertTrue(rows['Theirs']['tutorial_pending_review'])
+        self.assertTrue(rows['Theirs']['in_progress'])
+        self.assertFalse(rows['Mine']['tutorial_pending_review'])
+
+    def test_reviews_and_assignee_names_are_not_stale(self):
+        from comrade_core.models import Review
+        self.user.skills.add(self.skill)
+        self.task.start(self.user)
+        self.assertEqual(self._row()['assignee_name'], 'Wo')
+        self.task.finish(self.user)
+        self._row()
+        Review.objects.create(task=self.task, comment='done')
+        self.assertEqual(self._row()['pending_review']['comment'], 'done')
+        User.objects.filter(pk=self.user.pk).update(first_name='Renamed')
+        self.assertEqual(self._row()['assignee_name'], 'Renamed')
+
+
+class GeohashTest(TestCase):
+    def test_encode_known_value(self):
+        from comrade_core.utils import geohash_encode
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_cover_contains_points_inside_bbox(self):
+        from comrade_core.utils import geohash_cover, geohash_encode
+        cells = geohash_cover(50.0, 14.0, 50.1, 14.2)
+        self.assertLessEqual(len(cells), 32)
+        for lat, lon in [(50.0, 14.0), (50.05, 14.1), (50.1, 14.2)]:
+            gh = geohash_encode(lat, lon)
+            self.assertTrue(any(gh.startswith(c) for c in cells))
+
+    def test_task_save_sets_geohash(self):
+        t = Task.objects.create(name='geo', lat=50.08, lon=14.42)
+        self.assertEqual(len(t.geohash), 9)
+        t.lat = None
+        t.save()
+        self.assertEqual(t.geohash, '')
+
+
+class TaskListViewportTest(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass')
+        self.user = User.objects.create_user(username='viewer', password='pass')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.near = Task.objects.create(name='near', owner=self.owner, lat=50.08, lon=14.42)
+        self.far = Task.objects.create(name='far', owner=self.owner, lat=48.85, lon=2.35)
+        self.nowhere = Task.objects.create(name='nowhere', owner=self.owner)
+
+    def _task_ids(self, params):
+        resp = self.client.get('/api/tasks/', params)
+        self.assertEqual(resp.status_code, 200)
+        return {t['id'] for t in resp.data['tasks'] if not t.get('is_tutorial')}
+
+    def test_bbox_filters_out_distant_tasks(self):
+        ids = self._task_ids({'bbox': '14.3,50.0,14.5,50.2'})
+        self.assertIn(self.near.id, ids)
+        self.assertNotIn(self.far.id, ids)
+        self.assertIn(self.nowhere.id, ids)
+
+    def test_radius_mode(self):
+        ids = self._task_ids({'lat': 48.85, 'lon': 2.35, 'radius_km': 5})
+        self.assertIn(self.far.id, ids)
+        self.assertNotIn(self.near.id, ids)
+
+    def test_assigned_task_outside_viewport_still_listed(self):
+        self.far.assignee = self.user
+        self.far.state = Task.State.IN_PROGRESS
+        self.far.save()
+        self.assertIn(self.far.id, self._task_ids({'bbox': '14.3,50.0,14.5,50.2'}))
+
+    def test_invalid_bbox_returns_400(self):
+        resp = self.client.get('/api/tasks/', {'bbox': '14.5,50.2,14.3,50.0'})
+        self.assertEqual(resp.status_code, 400)
+
+
+class TaskDeltaTest(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass')
+        self.user = User.objects.create_user(username='viewer', password='pass')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+        self.secret = Skill.objects.create(name='secret')
+        self.a = Task.objects.create(name='a', owner=self.owner)
+        self.b = Task.objects.create(name='b', owner=self.owner)
+        self._settle()
+
+    def _settle(self):
+        """Space the recorded changes further apart than the replay window, as if written long ago."""
+        from datetime import timedelta
+        from django.utils.timezone import now
+        from comrade_core.models import TaskChange
+        gap = TaskChange.REPLAY_WINDOW + timedelta(seconds=1)
+        for age, change_id in enumerate(TaskChange.objects.order_by('-id').values_list('id', flat=True), start=1):
+            TaskChange.objects.filter(id=change_id).update(created_at=now() - age * gap)
+
+    def _revision(self):
+        return self.client.get('/api/tasks/').data['revision']
+
+    def test_delta_returns_only_changed_tasks(self):
+        rev = self._revision()
+        self.a.description = 'changed'
+        self.a.save()
+        resp = self.client.get('/api/tasks/', {'since': rev})
+        self.assertEqual([t['id'] for t in resp.data['tasks']], [self.a.id])
+        self.assertEqual(resp.data['removed'], [])
+        self.assertGreater(resp.data['revision'], rev)
+        self._settle()
+        self.assertEqual(self.client.get('/api/tasks/', {'since': resp.data['revision']}).data['tasks'], [])
+
+    def test_late_commit_below_revision_is_replayed(self):
+        from comrade_core.models import TaskChange
+        # Revision N is allocated first but commits after a reader already saw N+1
+        late = TaskChange.objects.create(task_id=self.a.id)
+        TaskChange.objects.create(task_id=self.b.id)
+        rev = self._revision()
+        self.assertGreater(rev, late.id)
+        resp = self.client.get('/api/tasks/', {'since': rev})
+        self.assertEqual([t['id'] for t in resp.data['tasks']], [self.a.id])
+
+    def test_save_stamps_revision_in_one_update(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            self.a.description = 'changed'
+            self.a.save()
+        task_writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "comrade_core_task" ')]
+        self.assertEqual(len(task_writes), 1)
+        self.assertNotIn('"is_public"', task_writes[0])
+        revision = self.a.revision
+        self.a.refresh_from_db()
+        self.assertEqual((self.a.description, self.a.revision), ('changed', revision))
+        self.assertEqual(revision, self.client.get('/api/tasks/').data['revision'])
+
+    def test_hidden_and_deleted_tasks_are_removed(self):
+        rev = self._revision()
+        self.a.skill_read.add(self.secret)
+        self.a.save()
+        b_id = self.b.id
+        self.b.delete()
+        resp = self.client.get('/api/tasks/', {'since': rev})
+        self.assertEqual(resp.data['tasks'], [])
+        self.assertEqual(resp.data['removed'], sorted([self.a.id, b_id]))
+
+    def test_queryset_delete_reaches_the_feed(self):
+        from comrade_core.models import TaskChange
+        rev = self._revision()
+        b_id = self.b.id
+        Task.objects.filter(pk=b_id).delete()
+        self.assertIn(b_id, TaskChange.changed_since(rev))
+        self.assertEqual(self.client.get('/api/tasks/', {'since': rev}).data['removed'], [b_id])
+
+    def test_bulk_transitions_bump_revision(self):
+        from django.utils.timezone import now
+        from datetime import timedelta
+        self.a.state = Task.State.DONE
+        self.a.respawn = True
+        self.a.datetime_respawn = now() - timedelta(minutes=1)
+        self.a.save()
+        rev = self._revision()
+        Task.check_and_respawn()
+        resp = self.client.get('/api/tasks/', {'since': rev})
+        self.assertEqual([t['id'] for t in resp.data['tasks']], [self.a.id])
+        self.assertEqual(resp.data['tasks'][0]['state'], Task.State.OPEN)
+
+    def test_pruned_feed_falls_back_to_full_list(self):
+        from comrade_core.models import TaskChange
+        rev = self._revision()
+        self.a.save()
+        TaskChange.objects.filter(id__lte=rev).delete()
+        resp = self.client.get('/api/tasks/', {'since': 0})
+        self.assertNotIn('removed', resp.data)
+        self.assertEqual({t['id'] for t in resp.data['tasks']}, {self.a.id, self.b.id})
+
+    def test_descriptor_visibility_matches_list(self):
+        from comrade_core.visibility import TaskVisibility, task_descriptor
+        self.a.skill_read.add(self.secret)
+        visibility = TaskVisibility(self.user)
+        self.assertFalse(visibility.descriptor_visible(task_descriptor(self.a)))
+        self.assertTrue(visibility.descriptor_visible(task_descriptor(self.b)))
+        self.user.skills.add(self.secret)
+        self.assertTrue(TaskVisibility(self.user).descriptor_visible(task_descriptor(self.a)))
+
 
 class TaskLifecycleTest(TestCase):
     def setUp(self):
@@ -211,7 +483,7 @@ class TaskLifecycleTest(TestCase):
         self.task.accept_review(self.owner)
         self.task.refresh_from_db()
         self.assertEqual(self.task.state, Task.State.DONE)
-        self.worker.refresh_from_db()
+        self.worker.refresh_balances()
         self.assertGreater(self.worker.coins, 0)
         self.assertGreater(self.worker.xp, 0)
         self.assertEqual(self.worker.task_streak, 1)
@@ -225,6 +497,67 @@ class TaskLifecycleTest(TestCase):
         self.assertEqual(self.task.state, Task.State.OPEN)
         self.assertIsNone(self.task.assignee)
 
+    def test_concurrent_start_has_one_winner(self):
+        other = User.objects.create_user(username='other', password='pass')
+        stale = Task.objects.get(pk=self.task.pk)
+        self.task.start(self.worker)
+        with self.assertRaisesMessage(ValidationError, 'Task is not open'):
+            stale.start(other)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.assignee, self.worker)
+
+    def test_stale_abandon_keeps_streak(self):
+        self.task.start(self.worker)
+        stale = Task.objects.get(pk=self.task.pk)
+        self.task.abandon(self.worker)
+        self.worker.task_streak = 3
+        self.worker.save()
+        with self.assertRaises(ValidationError):
+            stale.abandon(self.worker)
+        self.worker.refresh_from_db()
+        self.assertEqual(self.worker.task_streak, 3)
+
+    def test_start_pauses_running_tasks_in_one_update(self):
+        from django.utils.timezone import now
+        from datetime import timedelta
+        first = Task.objects.create(name='first', owner=self.owner, state=Task.State.OPEN)
+        first.start(self.worker)
+        Task.objects.filter(pk=first.pk).update(datetime_start=now() - timedelta(minutes=10))
+        before = first.revision
+        with self.assertNumQueries(7):
+            # skills check, own change + UPDATE, running tasks, pause UPDATE, their revision bump (2)
+            self.task.start(self.worker)
+        first.refresh_from_db()
+        self.assertEqual(first.state, Task.State.WAITING)
+        self.assertIsNone(first.datetime_start)
+        self.assertAlmostEqual(first.time_spent_minutes, 10, delta=0.1)
+        self.assertGreater(first.revision, before)
+
+    def test_lost_start_does_not_pause_running_task(self):
+        first = Task.objects.create(name='first', owner=self.owner, state=Task.State.OPEN)
+        first.start(self.worker)
+        stale = Task.objects.get(pk=self.task.pk)
+        self.task.start(User.objects.create_user(username='other', password='pass'))
+        with self.assertRaisesMessage(ValidationError, 'Task is not open'):
+            stale.start(self.worker)
+        first.refresh_from_db()
+        self.assertEqual(first.state, Task.State.IN_PROGRESS)
+
+    def test_pause_in_progress_bumps_only_paused_rows(self):
+        from unittest import mock
+        first = Task.objects.create(name='first', owner=self.owner, state=Task.State.OPEN)
+        first.start(self.worker)
+        before = Task.objects.get(pk=first.pk).revision
+        spent_minutes = Task._spent_minutes
+
+        def racing_spent_minutes(*args):
+            # Another request pauses the task between the read and the UPDATE
+            Task.objects.filter(pk=first.pk).update(state=Task.State.WAITING, datetime_start=None)
+            return spent_minutes(*args)
+
+        with mock.patch.object(Task, '_spent_minutes', side_effect=racing_spent_minutes):
+            self.assertEqual(Task.pause_in_progress(self.worker), [])
+        self.assertEqual(Task.objects.get(pk=first.pk).revision, before)
 
     def test_ownerless_task_auto_accepts_on_finish(self):
         """Ownerless tasks should auto-accept: finish → IN_REVIEW → DONE in one step."""
@@ -236,7 +569,7 @@ class TaskLifecycleTest(TestCase):
         new_achievements = task.accept_review(self.worker)
         task.refresh_from_db()
         self.assertEqual(task.state, Task.State.DONE)
-        self.worker.refresh_from_db()
+        self.worker.refresh_balances()
         self.assertGreater(self.worker.coins, 0)
 
     def test_finish_ownerless_via_api(self):
@@ -254,7 +587,133 @@ class TaskLifecycleTest(TestCase):
         self.assertEqual(task.state, Task.State.DONE)
 
 
+class TaskSchedulerTest(TestCase):
+    def setUp(self):
+        from comrade_core.scheduler import TaskScheduler
+        self.scheduler = TaskScheduler()
+        self.owner = User.objects.create_user(username='owner', password='pass')
+        self.worker = User.objects.create_user(username='worker', password='pass')
+
+    def test_due_respawn_reopens_task(self):
+        from django.utils.timezone import now
+        from datetime import timedelta
+        task = Task.objects.create(
+            name='respawn', owner=self.owner, assignee=self.worker, state=Task.State.DONE,
+            respawn=True, datetime_respawn=now() - timedelta(minutes=1),
+        )
+        self.scheduler.load()
+        changed = self.scheduler.run_due()
+        self.assertEqual([t.id for t in changed], [task.id])
+        task.refresh_from_db()
+        self.assertEqual(task.state, Task.State.OPEN)
+        self.assertIsNone(task.assignee)
+
+    def test_future_respawn_stays_queued(self):
+        from django.utils.timezone import now
+        from datetime import timedelta
+        task = Task.objects.create(
+            name='later', owner=self.owner, state=Task.State.DONE,
+            respawn=True, datetime_respawn=now() + timedelta(hours=1),
+        )
+        self.scheduler.load()
+        self.assertEqual(self.scheduler.run_due(), [])
+        self.assertGreater(self.scheduler.seconds_until_next(), 0)
+        task.refresh_from_db()
+        self.assertEqual(task.state, Task.State.DONE)
+
+    def test_stale_pause_is_reset(self):
+        from django.utils.timezone import now
+        from datetime import timedelta
+        task = Task.objects.create(
+            name='stale', owner=self.owner, assignee=self.worker, state=Task.State.WAITING,
+            minutes=10, datetime_paused=now() - timedelta(hours=2),
+        )
+        self.scheduler.load()
+        self.scheduler.run_due()
+        task.refresh_from_db()
+        self.assertEqual(task.state, Task.State.OPEN)
+
+    def test_task_list_does_not_respawn(self):
+        from django.utils.timezone import now
+        from datetime import timedelta
+        task = Task.objects.create(
+            name='respawn', owner=self.owner, state=Task.State.DONE,
+            respawn=True, datetime_respawn=now() - timedelta(minutes=1),
+        )
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.worker).key)
+        client.get('/api/tasks/')
+        task.refresh_from_db()
+        self.assertEqual(task.state, Task.State.DONE)
+
+
 class UserModelTest(TestCase):
+    def test_grant_rewards_appends_to_ledger(self):
+        u = User.objects.create_user(username='new', password='pass', coins=1, total_coins_earned=4, task_streak=2)
+        with self.assertNumQueries(3):  # ledger insert, streak update, balance read
+            u.grant_rewards(RewardLedger(kind=RewardLedger.Kind.ACHIEVEMENT, coins=2.5, xp=3), streak=1)
+        self.assertEqual((u.coins, u.total_coins_earned, u.xp, u.total_xp_earned, u.task_streak), (3.5, 6.5, 3, 3, 3))
+        u.refresh_from_db()
+        # The row only holds the snapshot until the ledger is compacted
+        self.assertEqual((u.coins, u.xp, u.task_streak), (1, 0, 3))
+        self.assertEqual(RewardLedger.compact(), 1)
+        u.refresh_from_db()
+        self.assertEqual((u.coins, u.total_coins_earned, u.xp, u.total_xp_earned), (3.5, 6.5, 3, 3))
+        u.refresh_balances()
+        self.assertEqual((u.coins, u.xp), (3.5, 3))
+
+    def test_totals_from_grant_rewards_are_not_read_again(self):
+        from comrade_core.ws_events import send_user_stats
+        u = User.objects.create_user(username='new', password='pass')
+        u.grant_rewards(RewardLedger(kind=RewardLedger.Kind.ACHIEVEMENT, coins=2, xp=5))
+        with self.assertNumQueries(0):
+            metrics = Achievement.compute_metrics(u, [(Achievement.CONDITION_XP_TOTAL,), (Achievement.CONDITION_COINS_TOTAL,)])
+        self.assertEqual(metrics, {(Achievement.CONDITION_XP_TOTAL,): 5, (Achievement.CONDITION_COINS_TOTAL,): 2})
+        with self.assertNumQueries(1):  # skills only
+            send_user_stats(u)
+        u.refresh_from_db()
+        with self.assertNumQueries(1):
+            u.ensure_balances()
+
+    def test_accept_review_does_not_write_balances_to_user_row(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        owner = User.objects.create_user(username='owner', password='pass')
+        worker = User.objects.create_user(username='worker', password='pass')
+        task = Task.objects.create(name='t', owner=owner, state=Task.State.OPEN, coins=0.5, xp=0.5, minutes=15)
+        task.start(worker)
+        task.finish(worker)
+        Review.objects.create(task=task)
+        with CaptureQueriesContext(connection) as ctx:
+            task.accept_review(owner)
+        user_writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "comrade_core_user" ')]
+        self.assertEqual(len(user_writes), 1)
+        self.assertNotIn('"coins"', user_writes[0])
+        entry = RewardLedger.objects.get(user=worker)
+        self.assertEqual((entry.kind, entry.task_id), (RewardLedger.Kind.TASK, task.id))
+        self.assertEqual(task.assignee.task_streak, 1)
+        self.assertEqual(task.assignee.coins, entry.coins)
+
+    def test_adjustment_moves_balance_not_lifetime_total(self):
+        u = User.objects.create_user(username='new', password='pass', coins=10, total_coins_earned=10)
+        RewardLedger.adjust(u.id, coins=-4, note='refund')
+        u.refresh_balances()
+        self.assertEqual((u.coins, u.total_coins_earned), (6, 10))
+        RewardLedger.compact()
+        u.refresh_from_db()
+        self.assertEqual((u.coins, u.total_coins_earned), (6, 10))
+
+    def test_earnings_per_period(self):
+        from datetime import timedelta
+        from django.utils.timezone import now
+        u = User.objects.create_user(username='new', password='pass')
+        old = RewardLedger.objects.create(user=u, kind=RewardLedger.Kind.TASK, coins=1, xp=2)
+        RewardLedger.objects.filter(pk=old.pk).update(created_at=now() - timedelta(days=10))
+        RewardLedger.objects.create(user=u, kind=RewardLedger.Kind.ACHIEVEMENT, coins=3, xp=4)
+        RewardLedger.adjust(u.id, coins=100)
+        self.assertEqual(RewardLedger.earnings(u.id), {'coins': 4, 'xp': 6})
+        self.assertEqual(RewardLedger.earnings(u.id, since=now() - timedelta(days=7)), {'coins': 3, 'xp': 4})
+
     def test_level_starts_at_zero(self):
         u = User.objects.create_user(username='new', password='pass')
         self.assertEqual(u.level, 0)
@@ -270,6 +729,35 @@ class UserModelTest(TestCase):
         self.assertIn('current_xp', progress)
         self.assertIn('required_xp', progress)
 
+    def test_compute_level_closed_form_matches_iteration(self):
+        from comrade_core.utils import compute_level, compute_levels
+
+        def iterative(total_xp, modifier):
+            xp, lvl, required = total_xp, 0, 1000.0 * modifier
+            while xp >= required:
+                xp -= required
+                lvl += 1
+                required = 1000.0 * modifier * (1.1 ** lvl)
+            return lvl, xp, required
+
+        totals = [0, 999.99, 1000, 2099, 2100, 2101, 12345.6, 5e6]
+        for modifier in (0.5, 1.0, 2.5):
+            for total in totals:
+                lvl, current, required = compute_level(total, modifier)
+                expected = iterative(total, modifier)
+                self.assertEqual(lvl, expected[0], (total, modifier))
+                self.assertAlmostEqual(current, expected[1], places=4)
+                self.assertAlmostEqual(required, expected[2], places=4)
+            self.assertEqual(compute_levels(totals, modifier), [compute_level(t, modifier) for t in totals])
+        self.assertEqual(compute_level(1500, 0), compute_level(1500, 1.0))
+
+    def test_level_memo_follows_xp(self):
+        u = User.objects.create_user(username='new', password='pass', total_xp_earned=1500)
+        self.assertEqual(u.level, 1)
+        self.assertEqual(u.level_progress['level'], 1)
+        u.total_xp_earned = 2100
+        self.assertEqual(u.level, 2)
+
     def test_distance_to(self):
         u1 = User.objects.create_user(username='a', password='p', latitude=50.0, longitude=14.0)
         u2 = User.objects.create_user(username='b', password='p', latitude=50.0, longitude=14.01)
@@ -310,6 +798,418 @@ class FriendsTest(TestCase):
         self.assertNotIn(self.u2, self.u1.friends.all())
 
 
+class LocationPipelineTest(TestCase):
+    def test_broadcast_throttle(self):
+        from comrade_core.consumers import should_broadcast_location
+        self.assertTrue(should_broadcast_location(None, 50.0, 14.0, 100.0))
+        last = (50.0, 14.0, 100.0)
+        # Moved far, but too soon after the last broadcast
+        self.assertFalse(should_broadcast_location(last, 50.01, 14.0, 101.0))
+        self.assertTrue(should_broadcast_location(last, 50.01, 14.0, 104.0))
+        # GPS jitter below the distance threshold is dropped until the keepalive
+        self.assertFalse(should_broadcast_location(last, 50.00001, 14.0, 110.0))
+        self.assertTrue(should_broadcast_location(last, 50.00001, 14.0, 131.0))
+
+    def test_buffer_flushes_latest_positions_in_bulk(self):
+        from asgiref.sync import async_to_sync
+        from django.utils import timezone
+        from comrade_core.consumers import LocationBuffer
+        users = [User.objects.create_user(username=f'u{i}', password='p') for i in range(3)]
+        buffer = LocationBuffer(interval=3600)
+
+        async def report_and_flush():
+            for i, user in enumerate(users):
+                buffer.put(user.id, 40.0, 10.0, timezone.now())
+                buffer.put(user.id, 50.0 + i, 14.0, timezone.now())
+            await buffer.flush(users[0].id)
+            await buffer.flush()
+
+        with self.assertNumQueries(2):
+            async_to_sync(report_and_flush)()
+        self.assertEqual(
+            list(User.objects.filter(id__in=[u.id for u in users]).order_by('id').values_list('latitude', 'longitude')),
+            [(50.0, 14.0), (51.0, 14.0), (52.0, 14.0)],
+        )
+
+    def test_geohash_neighborhood_covers_sharing_radius(self):
+        from comrade_core.utils import geohash_encode, geohash_neighborhood, geohash_precision_for_radius, haversine_km
+        precision = geohash_precision_for_radius(1.0)
+        cells = geohash_neighborhood(50.08, 14.42, precision)
+        self.assertEqual(len(cells), 9)
+        self.assertIn(geohash_encode(50.08, 14.42, precision), cells)
+        for dlat, dlon in [(0.0089, 0), (-0.0089, 0), (0, 0.0139), (0, -0.0139), (0.006, 0.009)]:
+            self.assertLessEqual(haversine_km(50.08, 14.42, 50.08 + dlat, 14.42 + dlon), 1.0)
+            self.assertIn(geohash_encode(50.08 + dlat, 14.42 + dlon, precision), cells)
+        self.assertLess(geohash_precision_for_radius(50.0), precision)
+
+    def test_public_location_reaches_only_nearby_sockets(self):
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from comrade_core.consumers import LocationConsumer
+
+        users = {
+            name: User.objects.create_user(username=name, password='p', location_sharing_level=User.SharingLevel.ALL)
+            for name in ('sender', 'near', 'far')
+        }
+        tokens = {name: Token.objects.create(user=user).key for name, user in users.items()}
+        positions = {'sender': (50.080, 14.420), 'near': (50.083, 14.425), 'far': (48.85, 2.35)}
+
+        async def scenario():
+            sockets = {}
+            for name in ('near', 'far', 'sender'):
+                socket = WebsocketCommunicator(LocationConsumer.as_asgi(), f'/ws/location/?token={tokens[name]}')
+                connected, _ = await socket.connect()
+                self.assertTrue(connected)
+                lat, lon = positions[name]
+                await socket.send_json_to({'type': 'location_update', 'latitude': lat, 'longitude': lon})
+                sockets[name] = socket
+            received = {}
+            for name in ('near', 'far'):
+                received[name] = []
+                while not await sockets[name].receive_nothing(timeout=0.2):
+                    received[name].append(await sockets[name].receive_json_from())
+            for socket in sockets.values():
+                await socket.disconnect()
+            return received
+
+        received = async_to_sync(scenario)()
+        self.assertIn(users['sender'].id, [e['userId'] for e in received['near'] if e['type'] == 'public_location'])
+        self.assertEqual([e for e in received['far'] if e['type'] == 'public_location'], [])
+
+    def test_socket_without_position_receives_all_public_locations(self):
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from comrade_core.consumers import LocationConsumer
+
+        sender = User.objects.create_user(username='sender', password='p', location_sharing_level=User.SharingLevel.ALL)
+        viewer = User.objects.create_user(username='viewer', password='p')
+        tokens = {user: Token.objects.create(user=user).key for user in (sender, viewer)}
+
+        async def scenario():
+            # The viewer never reports a position (e.g. geolocation denied)
+            unplaced = WebsocketCommunicator(LocationConsumer.as_asgi(), f'/ws/location/?token={tokens[viewer]}')
+            self.assertTrue((await unplaced.connect())[0])
+            publisher = WebsocketCommunicator(LocationConsumer.as_asgi(), f'/ws/location/?token={tokens[sender]}')
+            self.assertTrue((await publisher.connect())[0])
+            await publisher.send_json_to({'type': 'location_update', 'latitude': 48.85, 'longitude': 2.35})
+            received = []
+            while not await unplaced.receive_nothing(timeout=0.2):
+                received.append(await unplaced.receive_json_from())
+            await publisher.disconnect()
+            await unplaced.disconnect()
+            return received
+
+        received = async_to_sync(scenario)()
+        self.assertIn(sender.id, [e['userId'] for e in received if e['type'] == 'public_location'])
+
+
+class WireProtocolTest(TestCase):
+    def test_round_trip(self):
+        from comrade_core import wire
+        event = {'type': 'public_location', 'userId': 7, 'latitude': 50.08, 'longitude': 14.42, 'extra': 1}
+        self.assertEqual(wire.decode(wire.encode(event, 'json')), event)
+        self.assertEqual(wire.decode(wire.encode(event, 'compact')), event)
+        self.assertEqual(wire.decode(bytes_data=wire.encode(event, 'msgpack')), event)
+        self.assertLess(len(wire.encode(event, 'msgpack')), len(wire.encode(event, 'json')) / 2)
+        self.assertEqual(wire.decode('not json'), None)
+        self.assertEqual(wire.decode(bytes_data=b'\xc1'), None)
+
+    def test_frames_encoded_once_per_fan_out(self):
+        from comrade_core import wire
+        event = wire.fanout({'type': 'user_offline', 'userId': 3})
+        self.assertEqual(len(event), 3)  # only a frame id travels with the event
+        frame = wire.frame_for(event, 'compact')
+        self.assertEqual(frame, '{"t":"uo","u":3}')
+        # Another socket of the process gets its own copy of the message and reuses the frame
+        self.assertIs(wire.frame_for(dict(event), 'compact'), frame)
+        self.assertEqual(wire.decode(bytes_data=wire.frame_for(event, 'msgpack')), {'type': 'user_offline', 'userId': 3})
+
+    def test_negotiated_socket_receives_binary_frames(self):
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from comrade_core import wire
+        from comrade_core.consumers import LocationConsumer
+
+        sender = User.objects.create_user(username='s', password='p', location_sharing_level=User.SharingLevel.ALL)
+        viewer = User.objects.create_user(username='v', password='p')
+        sender_token = Token.objects.create(user=sender).key
+        viewer_token = Token.objects.create(user=viewer).key
+
+        async def scenario():
+            viewer_socket = WebsocketCommunicator(LocationConsumer.as_asgi(), f'/ws/location/?token={viewer_token}&proto=msgpack')
+            await viewer_socket.connect()
+            hello = await viewer_socket.receive_json_from()
+            await viewer_socket.send_to(bytes_data=wire.encode({'type': 'location_update', 'latitude': 50.0, 'longitude': 14.0}, 'msgpack'))
+            sender_socket = WebsocketCommunicator(LocationConsumer.as_asgi(), f'/ws/location/?token={sender_token}&proto=compact')
+            await sender_socket.connect()
+            await sender_socket.receive_from()  # protocol hello
+            await sender_socket.send_to(text_data=wire.encode({'type': 'location_update', 'latitude': 50.001, 'longitude': 14.0}, 'compact'))
+            frame = await viewer_socket.receive_output()
+            await sender_socket.disconnect()
+            await viewer_socket.disconnect()
+            return hello, frame
+
+        hello, frame = async_to_sync(scenario)()
+        self.assertEqual(hello, {'type': 'protocol', 'protocol': 'msgpack'})
+        event = wire.decode(bytes_data=frame['bytes'])
+        self.assertEqual((event['type'], event['userId'], event['latitude']), ('public_location', sender.id, 50.001))
+
+    @override_settings(WS_BATCH_INTERVAL=0.05)
+    def test_batched_socket_collapses_superseded_events(self):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+        from channels.testing import WebsocketCommunicator
+        from comrade_core import wire
+        from comrade_core.consumers import LocationConsumer
+
+        user = User.objects.create_user(username='b', password='p')
+        token = Token.objects.create(user=user).key
+        group = f'location_{user.id}'
+
+        def location(lat):
+            return wire.fanout({'type': 'friend_location', 'userId': 99, 'latitude': lat, 'longitude': 14.0})
+
+        async def scenario():
+            socket = WebsocketCommunicator(LocationConsumer.as_asgi(), f'/ws/location/?token={token}&batch=1')
+            await socket.connect()
+            layer = get_channel_layer()
+            for event in (location(50.0), {'type': 'tasks_changed'}, location(50.1),
+                          {'type': 'tasks_changed'}, wire.fanout({'type': 'task_update', 'taskId': 1})):
+                await layer.group_send(group, event)
+            frame = await socket.receive_json_from(timeout=2)
+            await socket.disconnect()
+            return frame
+
+        frame = async_to_sync(scenario)()
+        self.assertEqual(frame['type'], 'batch')
+        self.assertEqual([e['type'] for e in frame['events']], ['friend_location', 'tasks_changed', 'task_update'])
+        self.assertEqual(frame['events'][0]['latitude'], 50.1)
+
+    def test_collapsed_frame_keeps_its_slot(self):
+        from comrade_core.consumers import Outbox
+        outbox = Outbox()
+        outbox.add(('location', 1), 'old')
+        outbox.add(None, 'chat')
+        outbox.add(('location', 1), 'new')
+        self.assertEqual(outbox.drain(), ['new', 'chat'])
+
+    def test_batch_frame_in_every_protocol(self):
+        from comrade_core import wire
+        events = [{'type': 'user_offline', 'userId': 1}, {'type': 'tasks_changed'}]
+        for protocol in wire.PROTOCOLS:
+            frames = [wire.encode(e, protocol) for e in events]
+            batch = wire.encode_batch(frames, protocol)
+            decoded = wire.decode(bytes_data=batch) if protocol == 'msgpack' else wire.decode(batch)
+            self.assertEqual(decoded, {'type': 'batch', 'events': events}, protocol)
+
+
+class CachedTokenAuthenticationTest(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='a', password='p')
+        self.token = Token.objects.create(user=self.user)
+
+    def test_lookup_is_cached(self):
+        from comrade_core.authentication import get_user_for_token
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_for_token(self.token.key), self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_for_token(self.token.key), self.user)
+        self.assertIsNone(get_user_for_token('missing'))
+
+    def test_user_save_refreshes_cached_user(self):
+        from comrade_core.authentication import get_user_for_token
+        get_user_for_token(self.token.key)
+        self.user.first_name = 'Ann'
+        self.user.save()
+        self.assertEqual(get_user_for_token(self.token.key).first_name, 'Ann')
+
+    def test_cache_holds_no_credentials_or_location(self):
+        from django.core.cache import cache
+        from django.utils.timezone import now
+        from comrade_core.authentication import get_user_for_token
+        from comrade_core.consumers import _write_locations
+        get_user_for_token(self.token.key)
+        fields = cache.get(f'auth:user:{self.user.id}')
+        self.assertEqual(fields['username'], 'a')
+        self.assertFalse({'password', 'latitude', 'longitude'} & set(fields))
+        # A location flush keeps the entry; the position is read from the database on access
+        _write_locations({self.user.id: (50.0, 14.0, now())})
+        self.assertIsNotNone(cache.get(f'auth:user:{self.user.id}'))
+        self.assertEqual(get_user_for_token(self.token.key).latitude, 50.0)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.assertEqual(self.client.get('/api/user/').status_code, 200)
+        self.token.delete()
+        self.assertEqual(self.client.get('/api/user/').status_code, 401)
+
+    def test_inactive_user_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/user/').status_code, 401)
+
+
+@override_settings(PRESENCE_BACKEND='comrade_core.presence.MemoryPresenceBackend')
+class PresenceTest(APITestCase):
+    def setUp(self):
+        from comrade_core import presence
+        presence.get_backend().clear()
+        self.user = User.objects.create_user(username='a', password='p')
+        self.friend = User.objects.create_user(username='f', password='p')
+        self.user.friends.add(self.friend)
+
+    def test_multiple_devices_count_as_one_presence(self):
+        from comrade_core import presence
+        self.assertTrue(presence.touch(self.friend.id, 'phone'))
+        self.assertFalse(presence.touch(self.friend.id, 'laptop'))
+        self.assertFalse(presence.leave(self.friend.id, 'phone'))
+        self.assertEqual(presence.online_ids([self.friend.id, self.user.id]), {self.friend.id})
+        self.assertTrue(presence.leave(self.friend.id, 'laptop'))
+        self.assertEqual(presence.online_ids([self.friend.id]), set())
+
+    def test_sweep_expires_missing_heartbeats(self):
+        from unittest import mock
+        from comrade_core import presence
+        presence.touch(self.friend.id, 'phone')
+        with mock.patch('comrade_core.ws_events._send_to_user') as send:
+            self.assertEqual(presence.sweep(), [])
+            with mock.patch('comrade_core.presence._time.time', return_value=presence._time.time() + 31):
+                self.assertEqual(presence.sweep(), [self.friend.id])
+        send.assert_called_once_with(self.user.id, {'type': 'presence_update', 'online': [], 'offline': [self.friend.id]})
+        self.assertEqual(presence.online_ids([self.friend.id]), set())
+
+    def test_friends_presence_endpoint(self):
+        from comrade_core import presence
+        stranger = User.objects.create_user(username='s', password='p')
+        presence.touch(self.friend.id, 'phone')
+        presence.touch(stranger.id, 'phone')
+        self.client.force_authenticate(self.user)
+        resp = self.client.get('/api/friends/presence/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, {'online': [self.friend.id]})
+
+    def test_second_device_does_not_announce_online(self):
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from comrade_core.consumers import LocationConsumer
+        user_token = Token.objects.create(user=self.user).key
+        friend_token = Token.objects.create(user=self.friend).key
+
+        async def scenario():
+            watcher = WebsocketCommunicator(LocationConsumer.as_asgi(), f'/ws/location/?token={user_token}')
+            await watcher.connect()
+            devices = []
+            for _ in range(2):
+                device = WebsocketCommunicator(LocationConsumer.as_asgi(), f'/ws/location/?token={friend_token}')
+                await device.connect()
+                devices.append(device)
+            events = []
+            for device in devices:
+                await device.disconnect()
+                while not await watcher.receive_nothing(timeout=0.1):
+                    events.append(await watcher.receive_json_from())
+            await watcher.disconnect()
+            return events
+
+        events = async_to_sync(scenario)()
+        self.assertEqual([e['type'] for e in events], ['friend_online', 'user_offline'])
+
+
+class WebSocketEventDispatchTest(TestCase):
+    def test_batch_sends_committed_events_once_on_exit(self):
+        from unittest import mock
+        from comrade_core import ws_events
+        with mock.patch.object(ws_events, '_flush') as flush:
+            with ws_events.batched():
+                with self.captureOnCommitCallbacks(execute=True):
+                    ws_events.send_tasks_changed(1)
+                    ws_events.send_friend_event(2, {'type': 'friend_removed', 'userId': 1})
+                    ws_events.send_tasks_changed(1)
+                flush.assert_not_called()
+        flush.assert_called_once_with([
+            ('location_1', {'type': 'tasks_changed'}),
+            ('location_2', {'type': 'friend_removed', 'userId': 1}),
+        ])
+
+    def test_rolled_back_events_are_not_sent(self):
+        from unittest import mock
+        from django.db import transaction
+        from comrade_core import ws_events
+        with mock.patch.object(ws_events, '_flush') as flush:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(ValueError), transaction.atomic():
+                    ws_events.send_tasks_changed(1)
+                    raise ValueError
+        self.assertEqual(callbacks, [])
+        flush.assert_not_called()
+
+
+@override_settings(PRESENCE_BACKEND='comrade_core.presence.MemoryPresenceBackend')
+class ChatTest(APITestCase):
+    def setUp(self):
+        from comrade_core import presence
+        presence.get_backend().clear()
+        self.user = User.objects.create_user(username='a', password='p')
+        self.friend = User.objects.create_user(username='f', password='p')
+        self.stranger = User.objects.create_user(username='s', password='p')
+        self.user.friends.add(self.friend)
+        self.client.force_authenticate(self.user)
+
+    def test_post_delivers_to_sender_and_recipients(self):
+        from comrade_core.models import ChatMessage
+        msg = ChatMessage.post(self.friend, 'hi', [self.user.id])
+        self.assertEqual(set(msg.deliveries.values_list('recipient_id', flat=True)), {self.friend.id, self.user.id})
+
+    def test_history_is_cursor_paginated(self):
+        from comrade_core.models import ChatMessage
+        ids = [ChatMessage.post(self.friend, f'm{i}', [self.user.id]).id for i in range(5)]
+        ChatMessage.post(self.stranger, 'not for you')
+
+        resp = self.client.get('/api/chat/history/?limit=3')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([m['id'] for m in resp.data['messages']], ids[2:])
+        self.assertTrue(resp.data['hasMore'])
+
+        resp = self.client.get(f'/api/chat/history/?limit=3&before={ids[2]}')
+        self.assertEqual([m['text'] for m in resp.data['messages']], ['m0', 'm1'])
+        self.assertFalse(resp.data['hasMore'])
+
+        self.assertEqual(self.client.get('/api/chat/history/?before=x').status_code, 400)
+
+    def test_history_keeps_messages_after_unfriending(self):
+        from comrade_core.models import ChatMessage
+        ChatMessage.post(self.friend, 'hi', [self.user.id])
+        self.user.friends.remove(self.friend)
+        resp = self.client.get('/api/chat/history/')
+        self.assertEqual([m['text'] for m in resp.data['messages']], ['hi'])
+
+    def test_socket_message_reaches_friend_and_inbox(self):
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from comrade_core.consumers import LocationConsumer
+        user_token = Token.objects.create(user=self.user).key
+        friend_token = Token.objects.create(user=self.friend).key
+
+        async def scenario():
+            sender = WebsocketCommunicator(LocationConsumer.as_asgi(), f'/ws/location/?token={user_token}')
+            await sender.connect()
+            receiver = WebsocketCommunicator(LocationConsumer.as_asgi(), f'/ws/location/?token={friend_token}')
+            await receiver.connect()
+            await sender.receive_json_from()  # friend_online
+            await sender.send_json_to({'type': 'chat_message', 'message': 'hello'})
+            event = await receiver.receive_json_from()
+            await sender.disconnect()
+            await receiver.disconnect()
+            return event
+
+        event = async_to_sync(scenario)()
+        self.assertEqual((event['type'], event['message'], event['sender']), ('chat_message', 'hello', 'a'))
+        self.assertEqual(self.friend.chat_inbox.get().message_id, event['msgId'])
+
+
 class AchievementTest(TestCase):
     def test_compute_progress_task_count(self):
         user = User.objects.create_user(username='a', password='p')
@@ -318,7 +1218,8 @@ class AchievementTest(TestCase):
             name='First Task', condition_type='task_count', condition_value=1
         )
         self.assertEqual(achievement.compute_progress(user), 0)
-        Task.objects.create(name='t', owner=owner, assignee=user, state=Task.State.DONE)
+        task = Task.objects.create(name='t', owner=owner, assignee=user, state=Task.State.IN_REVIEW)
+        task.accept_review(owner)
         self.assertEqual(achievement.compute_progress(user), 1)
 
     def test_check_and_award_achievements(self):
@@ -331,9 +1232,275 @@ class AchievementTest(TestCase):
         awards = user.check_and_award_achievements()
         self.assertEqual(len(awards), 1)
         self.assertEqual(awards[0].name, 'First Task')
-        user.refresh_from_db()
+        user.refresh_balances()
         self.assertEqual(user.coins, 10)
 
+    def test_compute_metrics_reads_stats_counters(self):
+        user = User.objects.create_user(username='a', password='p')
+        owner = User.objects.create_user(username='o', password='p')
+        medical = Skill.objects.create(name='Medical')
+        t1 = Task.objects.create(name='t1', owner=owner, assignee=user, state=Task.State.DONE, criticality=3)
+        t1.skill_execute.add(medical)
+        Task.objects.create(name='t2', owner=owner, assignee=user, state=Task.State.DONE)
+        Task.objects.create(name='mine', owner=user)
+        keys = [
+            ('task_count',), ('task_count_skill', 'Medical'),
+            ('task_count_criticality', 2), ('tasks_created',),
+        ]
+        with self.assertNumQueries(2):  # UserStats row + UserSkillStats
+            metrics = Achievement.compute_metrics(user, keys)
+        self.assertEqual(metrics, {
+            ('task_count',): 2, ('task_count_skill', 'Medical'): 1,
+            ('task_count_criticality', 2): 1, ('tasks_created',): 1,
+        })
+
+    def test_awards_all_tiers_and_reward_cascade(self):
+        user = User.objects.create_user(username='a', password='p')
+        owner = User.objects.create_user(username='o', password='p')
+        for threshold in (1, 2, 5):
+            Achievement.objects.create(
+                name=f'Tasks {threshold}', condition_type='task_count', condition_value=threshold, reward_xp=50,
+            )
+        Achievement.objects.create(name='XP 100', condition_type='xp_total', condition_value=100, reward_coins=5)
+        Task.objects.create(name='t1', owner=owner, assignee=user, state=Task.State.DONE)
+        Task.objects.create(name='t2', owner=owner, assignee=user, state=Task.State.DONE)
+        awards = user.check_and_award_achievements()
+        self.assertEqual(sorted(a.name for a in awards), ['Tasks 1', 'Tasks 2', 'XP 100'])
+        user.refresh_balances()
+        self.assertEqual(user.total_xp_earned, 100)
+        self.assertEqual(user.coins, 5)
+        self.assertEqual(user.check_and_award_achievements(), [])
+
+    def test_event_only_checks_triggered_conditions(self):
+        user = User.objects.create_user(username='a', password='p')
+        owner = User.objects.create_user(username='o', password='p')
+        Achievement.objects.create(name='First Task', condition_type='task_count', condition_value=1)
+        Task.objects.create(name='t', owner=owner, assignee=user, state=Task.State.DONE)
+        self.assertEqual(user.check_and_award_achievements(Achievement.EVENT_RATING_CREATED), [])
+        awards = user.check_and_award_achievements(Achievement.EVENT_TASK_ACCEPTED)
+        self.assertEqual([a.name for a in awards], ['First Task'])
+
+    def test_event_rewards_cascade_to_other_conditions(self):
+        user = User.objects.create_user(username='a', password='p')
+        friend = User.objects.create_user(username='f', password='p')
+        Achievement.objects.create(name='Friendly', condition_type='friends_count', condition_value=1, reward_xp=100)
+        Achievement.objects.create(name='XP 100', condition_type='xp_total', condition_value=100)
+        friend.send_friend_request(user)
+        user.accept_friend_request(friend)
+        awards = user.check_and_award_achievements(Achievement.EVENT_FRIEND_ADDED)
+        self.assertEqual(sorted(a.name for a in awards), ['Friendly', 'XP 100'])
+
+    def test_triggered_by_cache_sees_new_and_deleted_achievements(self):
+        Achievement.invalidate_cache()
+        self.assertEqual(Achievement.triggered_by(Achievement.EVENT_RATING_CREATED), [])
+        achievement = Achievement.objects.create(name='Critic', condition_type='ratings_given', condition_value=1)
+        self.assertEqual(Achievement.triggered_by(Achievement.EVENT_RATING_CREATED), [achievement])
+        self.assertEqual(Achievement.triggered_by(Achievement.EVENT_FRIEND_ADDED), [])
+        achievement.delete()
+        self.assertEqual(Achievement.triggered_by(Achievement.EVENT_RATING_CREATED), [])
+
+    def test_triggered_by_cache_follows_shared_version(self):
+        from comrade_core.models import achievement as achievement_module
+        Achievement.invalidate_cache()
+        self.assertEqual(Achievement.triggered_by(Achievement.EVENT_RATING_CREATED), [])
+        # Saved by another process: this one only sees the shared version move
+        created = Achievement.objects.bulk_create([Achievement(name='Critic', condition_type='ratings_given', condition_value=1)])
+        Achievement._bump_version()
+        self.assertEqual(Achievement.triggered_by(Achievement.EVENT_RATING_CREATED), [])
+        achievement_module._achievement_cache['checked'] -= achievement_module._VERSION_CHECK_INTERVAL
+        self.assertEqual(Achievement.triggered_by(Achievement.EVENT_RATING_CREATED), created)
+
+    def test_stats_counters_track_write_paths(self):
+        from comrade_core.models import UserStats, Rating
+        user = User.objects.create_user(username='a', password='p')
+        owner = User.objects.create_user(username='o', password='p')
+        medical = Skill.objects.create(name='Medical')
+        task = Task.objects.create(name='t', owner=owner, assignee=user, state=Task.State.IN_REVIEW, criticality=2)
+        task.skill_execute.add(medical)
+        task.accept_review(owner)
+        Rating.objects.create(task=task, user=user)
+        user.send_friend_request(owner)
+        owner.accept_friend_request(user)
+        Task.objects.create(name='mine', owner=user)
+        stats = UserStats.objects.get(user=user)
+        self.assertEqual(
+            (stats.tasks_completed, stats.tasks_completed_medium, stats.ratings_given, stats.friends_count, stats.tasks_created),
+            (1, 1, 1, 1, 1),
+        )
+        self.assertEqual(user.skill_stats.get(skill=medical).tasks_completed, 1)
+        owner.remove_friend(user)
+        self.assertEqual(UserStats.objects.get(user=owner).friends_count, 0)
+        # Counters survive respawn (completions are history, not current state)
+        Task.objects.filter(pk=task.pk).update(state=Task.State.OPEN, assignee=None)
+        self.assertEqual(Achievement.compute_metrics(user, [('task_count',)]), {('task_count',): 1})
+
+    def test_rebuild_matches_live_counters(self):
+        from comrade_core.models import UserStats, Rating
+        user = User.objects.create_user(username='a', password='p')
+        owner = User.objects.create_user(username='o', password='p')
+        medical = Skill.objects.create(name='Medical')
+        task = Task.objects.create(name='t', owner=owner, assignee=user, state=Task.State.IN_REVIEW, criticality=3)
+        task.skill_execute.add(medical)
+        task.accept_review(owner)
+        # Completed before the ledger existed: only the DONE row is left
+        Task.objects.create(name='old', owner=owner, assignee=user, state=Task.State.DONE)
+        rating = Rating.objects.create(task=task, user=user)
+        rating.delete()
+        created = Task.objects.create(name='mine', owner=user)
+        created.delete()
+        # Respawned: the accepted task is no longer DONE
+        Task.objects.filter(pk=task.pk).update(state=Task.State.OPEN, assignee=None)
+        live = UserStats.objects.get(user=user)
+        rebuilt = UserStats.rebuild(user.id)
+        fields = ('tasks_completed', 'tasks_completed_high', 'tasks_created', 'ratings_given')
+        self.assertEqual([getattr(rebuilt, f) for f in fields], [2, 1, 0, 0])
+        # The live row never saw the pre-ledger completion; everything else agrees
+        self.assertEqual([getattr(live, f) for f in fields], [1, 1, 0, 0])
+        self.assertEqual(user.skill_stats.get(skill=medical).tasks_completed, 1)
+
+    def test_counter_decrements_stop_at_zero(self):
+        from comrade_core.models import UserStats
+        user = User.objects.create_user(username='a', password='p')
+        UserStats.rebuild(user.id)
+        UserStats.record(user.id, friends_count=-1)
+        self.assertEqual(UserStats.objects.get(user=user).friends_count, 0)
+
+
+class AchievementsViewTest(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username='a', password='p')
+        self.owner = User.objects.create_user(username='o', password='p')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.user).key)
+        for threshold in (1, 5, 10):
+            Achievement.objects.create(name=f'Tasks {threshold}', condition_type='task_count', condition_value=threshold)
+
+    def test_snapshot_cached_with_etag(self):
+        resp = self.client.get('/api/achievements/')
+        self.assertEqual(resp.status_code, 200)
+        etag = resp['ETag']
+        with self.assertNumQueries(0):  # token authentication is cached as well
+            resp = self.client.get('/api/achievements/')
+        self.assertEqual(resp['ETag'], etag)
+        resp = self.client.get('/api/achievements/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+    def test_queries_do_not_grow_with_achievement_count(self):
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.get('/api/achievements/')  # first use builds the UserStats row
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self.client.get('/api/achievements/')
+        cache.clear()
+        for threshold in range(20, 40):
+            Achievement.objects.create(name=f'Tasks {threshold}', condition_type='task_count', condition_value=threshold)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get('/api/achievements/')
+        self.assertEqual(len(few), len(many))
+
+    def test_metric_change_invalidates_snapshot(self):
+        etag = self.client.get('/api/achievements/')['ETag']
+        task = Task.objects.create(name='t', owner=self.owner, assignee=self.user, state=Task.State.IN_REVIEW)
+        with self.captureOnCommitCallbacks(execute=True):
+            task.accept_review(self.owner)
+        resp = self.client.get('/api/achievements/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        earned = {a['name'] for a in resp.data['achievements'] if a['earned']}
+        self.assertEqual(earned, {'Tasks 1'})
+        progress = {a['name']: a['progress'] for a in resp.data['achievements']}
+        self.assertEqual(progress['Tasks 5'], 1)
+
+
+@override_settings(LEADERBOARD_BACKEND='comrade_core.leaderboard.MemoryLeaderboardBackend')
+class LeaderboardTest(APITestCase):
+    def setUp(self):
+        from comrade_core import leaderboard
+        self.backend = leaderboard.get_backend()
+        self.backend.clear()
+        self.skill = Skill.objects.create(name='Cooking')
+        self.owner = User.objects.create_user(username='owner', password='p')
+        self.users = [User.objects.create_user(username=f'u{i}', password='p') for i in range(3)]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.users[0]).key)
+
+    def complete(self, user, xp, skill=None):
+        task = Task.objects.create(name='t', owner=self.owner, assignee=user, state=Task.State.IN_REVIEW, xp=xp, coins=xp / 10)
+        if skill:
+            task.skill_execute.add(skill)
+        with self.captureOnCommitCallbacks(execute=True):
+            task.accept_review(self.owner)
+        user.refresh_balances()
+
+    def test_accept_review_updates_boards(self):
+        self.complete(self.users[0], 10, skill=self.skill)
+        self.complete(self.users[1], 50)
+        self.complete(self.users[1], 50)
+        from comrade_core import leaderboard
+        top = leaderboard.top('xp', limit=10)
+        self.assertEqual([user_id for user_id, _ in top], [self.users[1].id, self.users[0].id])
+        self.assertAlmostEqual(top[0][1], self.users[1].total_xp_earned)
+        self.assertEqual(leaderboard.rank_of(self.users[0].id, 'xp')[0], 2)
+        self.assertEqual(leaderboard.rank_of(self.users[1].id, 'streak'), (1, 2))
+        self.assertAlmostEqual(leaderboard.top('xp', 'week')[0][1], self.users[1].total_xp_earned)
+        self.assertEqual([u for u, _ in leaderboard.top('xp', skill_id=self.skill.id)], [self.users[0].id])
+        self.assertIsNone(leaderboard.rank_of(self.users[2].id, 'xp'))
+
+    def test_rollback_does_not_touch_boards(self):
+        from comrade_core import leaderboard
+        task = Task.objects.create(name='t', owner=self.owner, assignee=self.users[0], state=Task.State.IN_REVIEW, xp=10)
+        with self.captureOnCommitCallbacks(execute=False):
+            task.accept_review(self.owner)
+        self.assertEqual(leaderboard.top('xp'), [])
+
+    def test_abandon_resets_streak(self):
+        from comrade_core import leaderboard
+        self.complete(self.users[0], 10)
+        task = Task.objects.create(name='t2', owner=self.owner, assignee=self.users[0], state=Task.State.IN_PROGRESS)
+        with self.captureOnCommitCallbacks(execute=True):
+            task.abandon(self.users[0])
+        self.assertEqual(leaderboard.rank_of(self.users[0].id, 'streak'), (1, 0))
+
+    def test_achievement_rewards_count(self):
+        from comrade_core import leaderboard
+        Achievement.objects.create(name='First', condition_type='task_count', condition_value=1, reward_xp=1000)
+        self.complete(self.users[0], 10)
+        self.assertAlmostEqual(leaderboard.top('xp')[0][1], self.users[0].total_xp_earned)
+        self.assertGreater(self.users[0].total_xp_earned, 1000)
+
+    def test_global_endpoint_with_my_rank(self):
+        self.complete(self.users[1], 50)
+        self.complete(self.users[0], 10)
+        resp = self.client.get('/api/leaderboard/?limit=1')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([e['userId'] for e in resp.data['entries']], [self.users[1].id])
+        self.assertEqual(resp.data['me']['rank'], 2)
+
+    def test_friends_endpoint(self):
+        self.complete(self.users[1], 50)
+        self.complete(self.users[2], 80)
+        self.users[0].friends.add(self.users[1])
+        resp = self.client.get('/api/leaderboard/?scope=friends')
+        self.assertEqual([e['userId'] for e in resp.data['entries']], [self.users[1].id, self.users[0].id])
+        self.assertEqual(resp.data['me'], {'rank': 2, 'score': 0.0})
+
+    def test_invalid_params(self):
+        self.assertEqual(self.client.get('/api/leaderboard/?metric=karma').status_code, 400)
+        self.assertEqual(self.client.get('/api/leaderboard/?metric=streak&period=week').status_code, 400)
+        self.assertEqual(self.client.get('/api/leaderboard/?skill=999').status_code, 404)
+
+    def test_rebuild(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from comrade_core import leaderboard
+        User.objects.filter(pk=self.users[2].pk).update(total_xp_earned=500, task_streak=3)
+        call_command('rebuild_leaderboards', stdout=StringIO())
+        self.assertEqual(leaderboard.top('xp', limit=1), [(self.users[2].id, 500.0)])
+        self.assertEqual(leaderboard.rank_of(self.users[2].id, 'streak'), (1, 3))
+
 
 class TutorialTest(TestCase):
     def setUp(self):
@@ -507,6 +1674,20 @@ class TaskAPITest(APITestCase):
         resp = self.client.post(f'/api/task/{self.task.id}/resume')
         self.assertEqual(resp.status_code, 200)
 
+    def test_start_announces_auto_paused_task(self):
+        from unittest import mock
+        first = Task.objects.create(name='first', owner=self.owner, state=Task.State.OPEN)
+        first.start(self.worker)
+        with mock.patch('comrade_core.ws_events._deliver') as deliver, self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(f'/api/task/{self.task.id}/start')
+        self.assertEqual(resp.status_code, 200)
+        sent = [call.args for call in deliver.call_args_list]
+        self.assertIn(f'location_{self.worker.id}', [
+            group for group, event in sent if event['type'] == 'task_update' and event['taskId'] == first.id and event['action'] == 'pause'
+        ])
+        delta_rows = [row['row'] for group, event in sent if event['type'] == 'task_delta' for row in event['tasks']]
+        self.assertIn((first.id, Task.State.WAITING), [(row['id'], row['state']) for row in delta_rows])
+
     def test_finish_task(self):
         self.task.start(self.worker)
         self.task.save()
@@ -577,6 +1758,25 @@ class FriendsAPITest(APITestCase):
         self.assertEqual(resp.status_code, 200)
         self.assertIn('friends', resp.data)
 
+    def test_get_friends_matches_sync_serializer(self):
+        from comrade_core.serializers import UserDetailSerializer
+        reward = Skill.objects.create(name='Onboarded')
+        medic = Skill.objects.create(name='Medic')
+        tutorial = TutorialTask.objects.create(name='Intro', reward_skill=reward)
+        OnboardingTemplate.objects.create(tutorial=tutorial, order=0)
+        u3 = User.objects.create_user(username='u3', password='pass')
+        for friend in (self.u2, u3):
+            friend.skills.add(reward, medic)
+            self.u1.friends.add(friend)
+            UserOnboardingTutorial.objects.create(user=friend, tutorial=tutorial, lat=0, lon=0)
+        TutorialProgress.objects.create(user=u3, tutorial=tutorial, state=TutorialProgress.State.DONE)
+        resp = self.client.get('/api/friends/')
+        by_name = {f['username']: f for f in resp.data['friends']}
+        self.assertEqual(by_name['u2']['skills'], ['Onboarded', 'Medic'])  # still onboarding
+        self.assertEqual(by_name['u3']['skills'], ['Medic'])
+        for friend in (self.u2, u3):
+            self.assertEqual(by_name[friend.username], UserDetailSerializer(friend).data)
+
     def test_get_pending(self):
         resp = self.client.get('/api/friends/pending/')
         self.assertEqual(resp.status_code, 200)
@@ -679,6 +1879,31 @@ class GlobalConfigAPITest(APITestCase):
         resp = c.get('/api/settings/global/')
         self.assertEqual(resp.status_code, 200)
 
+    def test_saved_config_reaches_other_processes_by_version(self):
+        from comrade_core.models import GlobalConfig
+        from comrade_core.models import config as config_module
+        from django.core.cache import cache
+        cache.clear()
+        config_module._config_cache.update(obj=None, version=None, checked=0)
+        GlobalConfig.get_config()
+        # What another worker holds: its own copy under the current version
+        other_worker = {**config_module._config_cache, 'obj': GlobalConfig.objects.get(pk=1)}
+
+        c = APIClient()
+        c.credentials(HTTP_AUTHORIZATION='Token ' + self.admin_token.key)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = c.patch('/api/settings/global/', {'xp_modifier': 3.0}, format='json')
+        self.assertEqual(resp.status_code, 200)
+
+        config_module._config_cache.update(other_worker)
+        self.assertNotEqual(GlobalConfig.get_config().xp_modifier, 3.0)  # within the check interval
+        config_module._config_cache.update(other_worker, checked=0)
+        self.assertEqual(GlobalConfig.get_config().xp_modifier, 3.0)
+        # Later workers load it from the shared cache, not the database
+        config_module._config_cache.update(other_worker, checked=0)
+        with self.assertNumQueries(0):
+            self.assertEqual(GlobalConfig.get_config().xp_modifier, 3.0)
+
 
 class TutorialSubmissionPersistenceTest(APITestCase):
     """Verify freetext and file submissions are persisted."""
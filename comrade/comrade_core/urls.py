@@ -21,6 +21,7 @@ urlpatterns = [
     path('tasks/create', views.TaskCreateView.as_view(), name='create_task'),
     path('skills/', views.SkillListView.as_view(), name='skill_list'),
     path('achievements/', views.AchievementsView.as_view(), name='achievements'),
+    path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
     path('settings/proximity/', views.ProximitySettingsView.as_view(), name='proximity_settings'),
     path('settings/global/', views.GlobalConfigView.as_view(), name='global_config'),
     path('tutorial/<int:task_id>/', views.TutorialDetailView.as_view(), name='tutorial_detail'),
@@ -36,6 +37,7 @@ urlpatterns = [
     path('friends/reject/<int:user_id>/', views.reject_friend_request, name='reject_friend_request'),
     path('friends/remove/<int:user_id>/', views.remove_friend, name='remove_friend'),
     path('friends/', views.get_friends, name='get_friends'),
+    path('friends/presence/', views.get_friends_presence, name='get_friends_presence'),
     path('friends/pending/', views.get_pending_requests, name='get_pending_requests'),
     path('friends/sent/', views.get_sent_requests, name='get_sent_requests'),
     path('location/preferences/', views.LocationSharingPreferencesView.as_view(), name='location_preferences'),
@@ -13,18 +13,143 @@ def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
 
 
+_LEVEL_BASE_XP = 1000.0
+_LEVEL_GROWTH = 1.1
+_LOG_LEVEL_GROWTH = math.log(_LEVEL_GROWTH)
+
+
+def _level_from_xp(total_xp: float, base: float) -> tuple[int, float, float]:
+    if total_xp < base:
+        return 0, total_xp, base
+    # Reaching level L takes base * (1.1^L - 1) / 0.1 XP in total (geometric series)
+    lvl = int(math.log1p(total_xp * (_LEVEL_GROWTH - 1) / base) / _LOG_LEVEL_GROWTH)
+    threshold = base * (_LEVEL_GROWTH ** lvl - 1) / (_LEVEL_GROWTH - 1)
+    # Correct float rounding right at a level boundary
+    while lvl > 0 and threshold > total_xp:
+        lvl -= 1
+        threshold = base * (_LEVEL_GROWTH ** lvl - 1) / (_LEVEL_GROWTH - 1)
+    required = base * _LEVEL_GROWTH ** lvl
+    while total_xp - threshold >= required:
+        lvl += 1
+        threshold += required
+        required *= _LEVEL_GROWTH
+    return lvl, total_xp - threshold, required
+
+
 def compute_level(total_xp: float, modifier: float) -> tuple[int, float, float]:
     """Compute (level, current_xp_in_level, xp_required_for_next_level) from total XP.
 
-    Base 1000 XP per level, +10% per level, scaled by modifier.
+    Base 1000 XP per level, +10% per level, scaled by modifier. Closed form, O(1).
     """
     if modifier <= 0:
         modifier = 1.0
-    xp = total_xp
-    lvl = 0
-    required = 1000.0 * modifier
-    while xp >= required:
-        xp -= required
-        lvl += 1
-        required = 1000.0 * modifier * (1.1 ** lvl)
-    return lvl, xp, required
+    return _level_from_xp(total_xp, _LEVEL_BASE_XP * modifier)
+
+
+def compute_levels(total_xps, modifier: float) -> list[tuple[int, float, float]]:
+    """compute_level for many XP totals with the same modifier (leaderboards, bulk exports)."""
+    if modifier <= 0:
+        modifier = 1.0
+    base = _LEVEL_BASE_XP * modifier
+    return [_level_from_xp(xp, base) for xp in total_xps]
+
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9  # ~5m x 5m cells
+
+
+def geohash_encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a lat/lon pair as a base32 geohash string of the given length."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    ch = 0
+    bit = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        ch <<= 1
+        if value >= mid:
+            ch |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(_GEOHASH_BASE32[ch])
+            ch = 0
+            bit = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision: int) -> tuple[float, float]:
+    """Return (lat_degrees, lon_degrees) spanned by a single geohash cell."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = (5 * precision) // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def geohash_cover(min_lat: float, min_lon: float, max_lat: float, max_lon: float, max_cells: int = 32) -> list[str]:
+    """Return geohash prefixes that together cover the bounding box.
+
+    Picks the finest precision that needs at most max_cells cells, so the
+    resulting prefix lookups stay cheap regardless of the viewport size.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        dlat, dlon = geohash_cell_size(precision)
+        rows = int((max_lat + 90) // dlat) - int((min_lat + 90) // dlat) + 1
+        cols = int((max_lon + 180) // dlon) - int((min_lon + 180) // dlon) + 1
+        if rows * cols <= max_cells:
+            break
+    lat_cells = int(round(180.0 / dlat))
+    lon_cells = int(round(360.0 / dlon))
+    cells = set()
+    for i in range(int((min_lat + 90) // dlat), min(int((max_lat + 90) // dlat), lat_cells - 1) + 1):
+        for j in range(int((min_lon + 180) // dlon), min(int((max_lon + 180) // dlon), lon_cells - 1) + 1):
+            cells.add(geohash_encode(-90 + (i + 0.5) * dlat, -180 + (j + 0.5) * dlon, precision))
+    return sorted(cells)
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> tuple[float, float, float, float]:
+    """Return (min_lat, min_lon, max_lat, max_lon) of the square enclosing a circle."""
+    dlat = radius_km / 111.32
+    dlon = radius_km / (111.32 * max(math.cos(math.radians(lat)), 1e-6))
+    return (
+        max(lat - dlat, -90.0), max(lon - dlon, -180.0),
+        min(lat + dlat, 90.0), min(lon + dlon, 180.0),
+    )
+
+
+# Latitude up to which geohash_precision_for_radius() guarantees coverage;
+# further north/south, longitude cells shrink below the requested radius
+_CELL_COVERED_LAT = 60.0
+
+
+def geohash_precision_for_radius(radius_km: float) -> int:
+    """Finest geohash precision whose cells are at least radius_km across.
+
+    A point's cell and its 8 neighbours then contain every point within
+    radius_km of it (up to ±60° latitude).
+    """
+    lon_scale = math.cos(math.radians(_CELL_COVERED_LAT))
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        dlat, dlon = geohash_cell_size(precision)
+        if min(dlat * 111.32, dlon * 111.32 * lon_scale) >= radius_km:
+            return precision
+    return 1
+
+
+def geohash_neighborhood(lat: float, lon: float, precision: int) -> list[str]:
+    """The geohash cell containing lat/lon plus its (up to 8) neighbouring cells."""
+    dlat, dlon = geohash_cell_size(precision)
+    cells = set()
+    for i in (-1, 0, 1):
+        cell_lat = lat + i * dlat
+        if not -90.0 <= cell_lat <= 90.0:
+            continue
+        for j in (-1, 0, 1):
+            cell_lon = (lon + j * dlon + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(cell_lat, cell_lon, precision))
+    return sorted(cells)
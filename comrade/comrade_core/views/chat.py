@@ -1,12 +1,14 @@
 import math
 import random
 
+from adrf.decorators import api_view as async_api_view
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from ..models import ChatMessage, GlobalConfig
+from ..models import ChatDelivery, GlobalConfig
+from ..ws_events import send_tasks_changed
 
 
 def _random_point_within(lat, lon, radius_meters):
@@ -18,27 +20,46 @@ def _random_point_within(lat, lon, radius_meters):
     return lat + r * math.cos(angle), lon + r * math.sin(angle) / math.cos(math.radians(lat))
 
 
-@api_view(['GET'])
+_HISTORY_PAGE_SIZE = 100
+
+
+@async_api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def chat_history(request):
-    """Return the last 100 chat messages from friends only."""
-    friend_ids = request.user.friends.values_list('id', flat=True)
-    messages = (
-        ChatMessage.objects
-        .filter(sender__in=[request.user.id, *friend_ids])
-        .select_related('sender')
-        .order_by('-created_at')[:100]
-    )
+async def chat_history(request):
+    """Return a page of the user's chat inbox, oldest first.
+
+    `?before=<message id>` returns the page preceding that message; `hasMore`
+    tells whether an older page exists. `?limit=` caps the page (max 100).
+    """
+    try:
+        before = request.query_params.get('before')
+        before = int(before) if before is not None else None
+    except ValueError:
+        return Response({'error': 'Invalid before'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.query_params.get('limit', _HISTORY_PAGE_SIZE)), 1), _HISTORY_PAGE_SIZE)
+    except ValueError:
+        return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+
+    deliveries = ChatDelivery.objects.filter(recipient=request.user)
+    if before is not None:
+        deliveries = deliveries.filter(message_id__lt=before)
+    page = [
+        d async for d in deliveries
+        .select_related('message__sender')
+        .order_by('-message_id')[:limit + 1]
+    ]
+    has_more = len(page) > limit
     data = [
         {
-            'id': m.id,
-            'text': m.text,
-            'sender': m.sender.username,
-            'timestamp': m.created_at.isoformat(),
+            'id': d.message.id,
+            'text': d.message.text,
+            'sender': d.message.sender.username,
+            'timestamp': d.message.created_at.isoformat(),
         }
-        for m in reversed(messages)
+        for d in reversed(page[:limit])
     ]
-    return Response({'messages': data}, status=status.HTTP_200_OK)
+    return Response({'messages': data, 'hasMore': has_more}, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -80,6 +101,8 @@ def welcome_accept(request):
                     defaults={'lat': spawn_lat, 'lon': spawn_lon},
                 )
 
+        send_tasks_changed(request.user.id)
+
     request.user.welcome_accepted = True
     request.user.save(update_fields=['welcome_accepted'])
     return Response({'message': 'ok'}, status=status.HTTP_200_OK)
@@ -1,3 +1,9 @@
+import hashlib
+import json
+
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
+from django.utils.http import parse_etags
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -52,14 +58,38 @@ class GlobalConfigView(APIView):
         return Response({f: getattr(config, f) for f in self.FIELDS})
 
 
-class AchievementsView(APIView):
+class AchievementsView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        user = request.user
-        earned_map = {ua.achievement_id: ua for ua in user.user_achievements.select_related('achievement').all()}
+    async def get(self, request):
+        # Snapshot is cached per user and invalidated by the write paths that move
+        # achievement metrics; clients revalidate with If-None-Match
+        snapshot = await Achievement.aget_progress_snapshot(request.user.id)
+        if snapshot is None:
+            data = await self._build(request.user)
+            snapshot = {
+                'etag': '"%s"' % hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest(),
+                'data': data,
+            }
+            await Achievement.aset_progress_snapshot(request.user.id, snapshot)
+
+        headers = {'ETag': snapshot['etag'], 'Cache-Control': 'private, no-cache'}
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and snapshot['etag'] in parse_etags(if_none_match):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response({'achievements': snapshot['data']}, headers=headers)
+
+    @staticmethod
+    async def _build(user) -> list:
+        earned_map = {ua.achievement_id: ua async for ua in user.user_achievements.select_related('achievement')}
+        achievements = [a async for a in Achievement.objects.filter(is_active=True).select_related('reward_skill')]
+        # Progress for unearned, visible achievements: each distinct metric computed once.
+        # compute_metrics is shared with the sync award path, so it runs in one executor hop.
+        metrics = await sync_to_async(Achievement.compute_metrics)(user, {
+            a.metric_key() for a in achievements if a.id not in earned_map and not a.is_secret
+        })
         data = []
-        for achievement in Achievement.objects.filter(is_active=True).select_related('reward_skill'):
+        for achievement in achievements:
             ua = earned_map.get(achievement.id)
             earned = ua is not None
             if achievement.is_secret and not earned:
@@ -78,7 +108,7 @@ class AchievementsView(APIView):
                     'reward_skill': None,
                 })
             else:
-                progress = ua.progress if ua else achievement.compute_progress(user)
+                progress = ua.progress if ua else metrics[achievement.metric_key()]
                 data.append({
                     'id': achievement.id,
                     'name': achievement.name,
@@ -93,7 +123,7 @@ class AchievementsView(APIView):
                     'reward_xp': achievement.reward_xp,
                     'reward_skill': achievement.reward_skill.name if achievement.reward_skill else None,
                 })
-        return Response({'achievements': data})
+        return data
 
 
 class SkillListView(APIView):
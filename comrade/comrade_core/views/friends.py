@@ -1,17 +1,17 @@
 import logging
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from adrf.decorators import api_view as async_api_view
 from django.core.exceptions import ValidationError
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from ..models import User
+from .. import presence
+from ..models import Achievement, GlobalConfig, User
 
 logger = logging.getLogger(__name__)
-from ..serializers import UserDetailSerializer
+from ..serializers import UserDetailSerializer, aload_skill_names
 from ..ws_events import send_friend_event, send_achievements, send_user_stats, send_tasks_changed
 from .task import _serialize_achievements
 
@@ -41,9 +41,6 @@ def accept_friend_request(request, user_id):
         request.user.accept_friend_request(target_user)
         logger.info("Friend accepted: user %d ↔ user %d", request.user.id, target_user.id)
 
-        # Get channel layer for WebSocket communication
-        channel_layer = get_channel_layer()
-
         # Get both users' friends and skills
         current_user_friends = request.user.get_friends()
         target_user_friends = target_user.get_friends()
@@ -66,14 +63,8 @@ def accept_friend_request(request, user_id):
         }
 
         # Send friend details to both users
-        async_to_sync(channel_layer.group_send)(
-            f"location_{target_user.id}",
-            current_user_details
-        )
-        async_to_sync(channel_layer.group_send)(
-            f"location_{request.user.id}",
-            target_user_details
-        )
+        send_friend_event(target_user.id, current_user_details)
+        send_friend_event(request.user.id, target_user_details)
 
         # Notify the sender that their request was accepted
         send_friend_event(target_user.id, {
@@ -81,11 +72,11 @@ def accept_friend_request(request, user_id):
             'user': {'id': request.user.id, 'username': request.user.username},
         })
 
-        new_achievements = request.user.check_and_award_achievements()
+        new_achievements = request.user.check_and_award_achievements(Achievement.EVENT_FRIEND_ADDED)
         send_achievements(request.user.id, new_achievements)
         if new_achievements:
             send_user_stats(request.user)
-            send_tasks_changed()
+            send_tasks_changed(request.user.id)
         return Response({'message': 'Friend request accepted', 'new_achievements': _serialize_achievements(new_achievements)}, status=status.HTTP_200_OK)
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -126,13 +117,22 @@ def remove_friend(request, user_id):
     except ValidationError as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(['GET'])
+@async_api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_friends(request):
-    friends = request.user.get_friends()
-    serializer = UserDetailSerializer(friends, many=True)
+async def get_friends(request):
+    friends = [friend async for friend in request.user.get_friends()]
+    # Loads this process's config copy, so the level fields below need no query
+    await GlobalConfig.aget_config()
+    skill_names = await aload_skill_names(friend.id for friend in friends)
+    serializer = UserDetailSerializer(friends, many=True, context={'skill_names': skill_names})
     return Response({'friends': serializer.data}, status=status.HTTP_200_OK)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_friends_presence(request):
+    friend_ids = list(request.user.friends.values_list('id', flat=True))
+    return Response({'online': sorted(presence.online_ids(friend_ids))}, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_pending_requests(request):
@@ -0,0 +1,81 @@
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .. import leaderboard
+from ..models import Skill, User
+
+
+class LeaderboardView(APIView):
+    """Top-N plus the caller's rank.
+
+    Query params: metric (xp|coins|streak), scope (global|friends),
+    period (all|week|month), skill (skill id, XP only), limit (1-100).
+    """
+    permission_classes = [IsAuthenticated]
+
+    MAX_LIMIT = 100
+
+    def get(self, request):
+        metric = request.query_params.get('metric', 'xp')
+        scope = request.query_params.get('scope', 'global')
+        period = request.query_params.get('period', 'all')
+        skill_id = request.query_params.get('skill')
+        if metric not in leaderboard.METRICS:
+            return Response({"error": "Invalid metric"}, status=status.HTTP_400_BAD_REQUEST)
+        if scope not in ('global', 'friends'):
+            return Response({"error": "Invalid scope"}, status=status.HTTP_400_BAD_REQUEST)
+        if period not in leaderboard.PERIODS:
+            return Response({"error": "Invalid period"}, status=status.HTTP_400_BAD_REQUEST)
+        if metric == 'streak' and period != 'all':
+            return Response({"error": "Streaks have no weekly or monthly board"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), self.MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "Invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+        if skill_id is not None:
+            if metric != 'xp' or period != 'all':
+                return Response({"error": "Skill boards only rank all-time XP"}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                skill_id = int(skill_id)
+            except ValueError:
+                return Response({"error": "Invalid skill"}, status=status.HTTP_400_BAD_REQUEST)
+            if not Skill.objects.filter(id=skill_id).exists():
+                return Response({"error": "Skill not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        me = {'rank': None, 'score': 0}
+        if scope == 'friends':
+            user_ids = [request.user.id, *request.user.friends.values_list('id', flat=True)]
+            ranked = leaderboard.among(user_ids, metric, period, skill_id)
+            for position, (user_id, score) in enumerate(ranked, start=1):
+                if user_id == request.user.id:
+                    me = {'rank': position, 'score': score}
+                    break
+            rows = ranked[:limit]
+        else:
+            rows = leaderboard.top(metric, period, skill_id, limit=limit)
+            mine = leaderboard.rank_of(request.user.id, metric, period, skill_id)
+            if mine is not None:
+                me = {'rank': mine[0], 'score': mine[1]}
+
+        users = User.objects.only('id', 'username', 'first_name', 'last_name').in_bulk([user_id for user_id, _ in rows])
+        entries = []
+        for position, (user_id, score) in enumerate(rows, start=1):
+            user = users.get(user_id)
+            if user is None:
+                continue
+            entries.append({
+                'rank': position,
+                'userId': user_id,
+                'name': f"{user.first_name} {user.last_name}".strip() or user.username,
+                'score': score,
+            })
+        return Response({
+            'metric': metric,
+            'scope': scope,
+            'period': period,
+            'skill': skill_id,
+            'entries': entries,
+            'me': me,
+        }, status=status.HTTP_200_OK)
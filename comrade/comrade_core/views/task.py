@@ -1,21 +1,33 @@
+import json
 import logging
 
+from adrf.views import APIView as AsyncAPIView
 from django.core.exceptions import ValidationError
 from django.db import models, transaction
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
-from ..models import Task, Rating, Review, Skill, GlobalConfig, TutorialTask, TutorialProgress, OnboardingTemplate, UserOnboardingTutorial, UserOnboardingTask
+from ..models import Achievement, Task, TaskChange, Rating, Review, Skill, GlobalConfig, TutorialTask, TutorialProgress, TutorialReview, UserOnboardingTask
 from ..serializers import TaskSerializer, SkillSerializer, TutorialTaskFlatSerializer, TaskCreateSerializer
-from ..utils import haversine_km
-from ..ws_events import send_task_update, send_user_stats, send_achievements, send_tasks_changed
+from ..models.geo import GeohashIndexed
+from ..utils import haversine_km, bounding_box
+from ..visibility import TaskVisibility
+from ..ws_events import send_task_update, send_task_delta, send_user_stats, send_achievements, send_tasks_changed
 
 logger = logging.getLogger(__name__)
 
 
+def _send_auto_paused(task_ids):
+    """Announce the tasks a start/resume paused, to their assignee (the actor's other clients) and owner."""
+    for task in Task.objects.filter(id__in=task_ids).select_related('owner', 'assignee'):
+        send_task_update(task, action='pause')
+
+
 # POST /task/{taskId}/start
 class TaskStartView(APIView):
     permission_classes = [IsAuthenticated]
@@ -23,7 +35,7 @@ class TaskStartView(APIView):
     def post(self, request: Request, task_id: int):
         with transaction.atomic():
             try:
-                task = Task.objects.select_for_update().get(pk=task_id)
+                task = Task.objects.get(pk=task_id)
             except Task.DoesNotExist:
                 return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -47,12 +59,13 @@ class TaskStartView(APIView):
                     )
 
             try:
-                task.start(request.user)
+                paused_ids = task.start(request.user)
             except ValidationError as e:
                 return Response({"error": str(e)}, status=status.HTTP_412_PRECONDITION_FAILED)
 
         logger.info("Task %d started by user %d (%s)", task.id, request.user.id, request.user.username)
         send_task_update(task, action='start', exclude_user_id=request.user.id)
+        _send_auto_paused(paused_ids)
         return Response(
             {"message": "Task started!"},
             status=status.HTTP_200_OK,
@@ -64,7 +77,7 @@ class TaskFinishView(APIView):
     def post(self, request: Request, task_id: int):
         with transaction.atomic():
             try:
-                task = Task.objects.select_for_update().get(pk=task_id)
+                task = Task.objects.get(pk=task_id)
             except Task.DoesNotExist:
                 return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -91,9 +104,9 @@ class TaskFinishView(APIView):
                 new_achievements = task.accept_review(request.user)
                 logger.info("Task %d auto-accepted (no owner) by user %d (%s)", task.id, request.user.id, request.user.username)
                 # Mark onboarding task as completed (persists through respawn)
-                UserOnboardingTask.objects.filter(user=request.user, task=task).update(completed=True)
+                if UserOnboardingTask.objects.filter(user=request.user, task=task).update(completed=True):
+                    send_tasks_changed(request.user.id)
                 send_task_update(task, action='accept_review', exclude_user_id=request.user.id)
-                task.assignee.refresh_from_db()
                 send_user_stats(task.assignee)
                 send_achievements(task.assignee.id, new_achievements)
                 return Response({
@@ -127,11 +140,11 @@ class TaskRateView(APIView):
             time=time_rating,
             feedback=feedback,
         )
-        new_achievements = request.user.check_and_award_achievements()
+        new_achievements = request.user.check_and_award_achievements(Achievement.EVENT_RATING_CREATED)
         send_achievements(request.user.id, new_achievements)
         if new_achievements:
             send_user_stats(request.user)
-            send_tasks_changed()
+            send_tasks_changed(request.user.id)
         return Response({"message": "Rating saved!", "new_achievements": _serialize_achievements(new_achievements)}, status=status.HTTP_200_OK)
 
 class TaskPauseView(APIView):
@@ -140,7 +153,7 @@ class TaskPauseView(APIView):
     def post(self, request: Request, task_id: int):
         with transaction.atomic():
             try:
-                task = Task.objects.select_for_update().get(pk=task_id)
+                task = Task.objects.get(pk=task_id)
             except Task.DoesNotExist:
                 return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -161,7 +174,7 @@ class TaskResumeView(APIView):
     def post(self, request: Request, task_id: int):
         with transaction.atomic():
             try:
-                task = Task.objects.select_for_update().get(pk=task_id)
+                task = Task.objects.get(pk=task_id)
             except Task.DoesNotExist:
                 return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -184,107 +197,132 @@ class TaskResumeView(APIView):
                     )
 
             try:
-                task.resume(request.user)
+                paused_ids = task.resume(request.user)
             except ValidationError as e:
                 return Response({"error": str(e)}, status=status.HTTP_412_PRECONDITION_FAILED)
 
         send_task_update(task, action='resume', exclude_user_id=request.user.id)
+        _send_auto_paused(paused_ids)
         return Response(
             {"message": "Task resumed!"},
             status=status.HTTP_200_OK,
         )
 
-class TaskListView(APIView):
+def _parse_viewport(params) -> tuple[float, float, float, float] | None:
+    """Parse ?bbox=min_lon,min_lat,max_lon,max_lat or ?lat=&lon=&radius_km= into (min_lat, min_lon, max_lat, max_lon).
+
+    Returns None when no viewport is requested. Raises ValueError on malformed input.
+    """
+    if 'bbox' in params:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in params['bbox'].split(','))
+        if min_lat > max_lat or min_lon > max_lon:
+            raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+        if not (-90 <= min_lat and max_lat <= 90 and -180 <= min_lon and max_lon <= 180):
+            raise ValueError("bbox out of range")
+        return min_lat, min_lon, max_lat, max_lon
+    if 'radius_km' in params:
+        radius_km = float(params['radius_km'])
+        if radius_km <= 0:
+            raise ValueError("radius_km must be positive")
+        return bounding_box(float(params['lat']), float(params['lon']), radius_km)
+    return None
+
+
+def _in_viewport(lat, lon, viewport) -> bool:
+    if viewport is None:
+        return True
+    min_lat, min_lon, max_lat, max_lon = viewport
+    return min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+
+
+async def _achunks(aiterable, size: int):
+    chunk = []
+    async for item in aiterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class TaskListView(AsyncAPIView):
+    """Tasks and tutorials visible to the user.
+
+    `?since=<revision>` returns a delta, `bbox` / `lat,lon,radius_km` a viewport.
+    `?stream=1` streams the full list as it is read (chunks of STREAM_CHUNK_SIZE
+    rows), keeping memory flat for large lists; the body is the same JSON.
+
+    Async: queries go through the async ORM and the row cache is read and
+    written with the async cache API, so serialization works on prefetched
+    rows and never blocks the event loop.
+    """
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        Task.check_and_respawn()
-        Task.check_and_reset_stale()
+    STREAM_CHUNK_SIZE = 500
+
+    async def get(self, request):
+        try:
+            viewport = _parse_viewport(request.query_params)
+        except (KeyError, ValueError) as e:
+            return Response({"error": f"Invalid viewport: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            since = int(request.query_params['since']) if 'since' in request.query_params else None
+        except ValueError:
+            return Response({"error": "since must be an integer revision"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Read the revision first: changes racing with this request (or committing late, see
+        # TaskChange.REPLAY_WINDOW) are re-sent on the next delta
+        revision = await TaskChange.acurrent_revision()
+        if since is not None and not await TaskChange.acovers(since):
+            # Feed was pruned past the client's revision — fall back to a full list
+            since = None
+
         user = request.user
-        # Visibility rules:
-        # - Always visible: owned tasks, assigned tasks, write-skill IN_REVIEW tasks
-        # - Otherwise: visible if task has no read skills OR user has a matching read skill
-        # Get onboarding template IDs (tutorials + tasks)
-        onboarding_tutorial_ids = set(
-            OnboardingTemplate.objects.filter(is_active=True, tutorial__isnull=False).values_list('tutorial_id', flat=True)
-        )
-        onboarding_task_ids = set(
-            OnboardingTemplate.objects.filter(is_active=True, task__isnull=False).values_list('task_id', flat=True)
-        )
+        visibility = await TaskVisibility.aload(user)
 
-        # Get user's spawned onboarding items
-        user_onboarding_tutorials = {
-            uo.tutorial_id: uo
-            for uo in UserOnboardingTutorial.objects.filter(user=user)
-        }
-        user_onboarding_tasks = {
-            uo.task_id: uo
-            for uo in UserOnboardingTask.objects.filter(user=user)
-        }
-
-        # Determine if user is still in onboarding
-        # Check tutorials (via TutorialProgress DONE) and tasks (via UserOnboardingTask.completed flag)
-        # The completed flag persists through task respawn, avoiding the re-trigger bug.
-        onboarding_in_progress = False
-        if user_onboarding_tutorials or user_onboarding_tasks:
-            completed_tutorial_ids = set(
-                TutorialProgress.objects.filter(
-                    user=user, state=TutorialProgress.State.DONE,
-                    tutorial_id__in=user_onboarding_tutorials.keys(),
-                ).values_list('tutorial_id', flat=True)
-            ) if user_onboarding_tutorials else set()
-            completed_task_ids = set(
-                UserOnboardingTask.objects.filter(
-                    user=user, completed=True,
-                    task_id__in=user_onboarding_tasks.keys(),
-                ).values_list('task_id', flat=True)
-            ) if user_onboarding_tasks else set()
-            onboarding_in_progress = (
-                set(user_onboarding_tutorials.keys()) - completed_tutorial_ids != set()
-                or set(user_onboarding_tasks.keys()) - completed_task_ids != set()
+        def keep(item, tutorial=False):
+            # Onboarding spawns are placed per-user, so their viewport check happens here
+            onboarding_ids = visibility.onboarding_tutorial_ids if tutorial else visibility.onboarding_task_ids
+            return visibility.visible(item, tutorial=tutorial) and (
+                item.id not in onboarding_ids or _in_viewport(item._user_lat, item._user_lon, viewport)
             )
 
-        # ── Regular tasks ──
-        # After onboarding, exclude onboarding reward skills from visibility/permission checks
-        # so onboarding-gated tasks don't leak into the normal task list
-        if not onboarding_in_progress:
-            onboarding_skill_ids = set(
-                OnboardingTemplate.objects.filter(
-                    is_active=True, tutorial__isnull=False,
-                ).values_list('tutorial__reward_skill_id', flat=True)
+        tasks_qs = self._tasks_queryset(user, visibility, viewport)
+        if since is not None:
+            return await self._delta(request, tasks_qs, keep, since, revision)
+        tutorial_tasks_qs = self._tutorial_tasks_queryset(user, visibility, viewport)
+        if request.query_params.get('stream') in ('1', 'true'):
+            return StreamingHttpResponse(
+                self._stream(request, tasks_qs, tutorial_tasks_qs, keep, revision), content_type='application/json',
             )
-            effective_skills = user.skills.exclude(id__in=onboarding_skill_ids)
-        else:
-            effective_skills = user.skills.all()
 
-        tasks_qs = Task.objects.filter(
-            models.Q(owner=user)
-            | models.Q(assignee=user)
-            | models.Q(state=Task.State.IN_REVIEW, skill_write__in=effective_skills)
-            | models.Q(skill_read__isnull=True)
-            | models.Q(skill_read__in=effective_skills)
-        ).distinct().select_related('owner', 'assignee').prefetch_related('skill_execute', 'skill_read', 'skill_write', 'reviews')
-
-        tasks = []
-        for t in tasks_qs:
-            if t.id in onboarding_task_ids:
-                if onboarding_in_progress:
-                    # During onboarding, show with per-user location
-                    uo = user_onboarding_tasks.get(t.id)
-                    if uo:
-                        t._user_lat = uo.lat
-                        t._user_lon = uo.lon
-                        tasks.append(t)
-                # After onboarding complete: hide onboarding tasks entirely
-            elif onboarding_in_progress:
-                # During onboarding, hide non-onboarding tasks
-                pass
-            else:
-                tasks.append(t)
+        task_rows = await TaskSerializer([t async for t in tasks_qs if keep(t)], many=True, context={'request': request}).adata()
+        tutorial_rows = await self._serialize_tutorials(request, [t async for t in tutorial_tasks_qs if keep(t, tutorial=True)])
+        return Response(
+            {"tasks": list(task_rows) + list(tutorial_rows), "revision": revision},
+            status=status.HTTP_200_OK,
+        )
 
-        task_serializer = TaskSerializer(tasks, many=True, context={'request': request})
+    @staticmethod
+    def _tasks_queryset(user, visibility, viewport):
+        tasks_qs = Task.objects.filter(
+            visibility.tasks_q()
+        ).select_related('owner', 'assignee').prefetch_related('skill_execute', 'skill_read', 'skill_write', 'reviews')
+        if viewport is not None:
+            # Viewport mode: geohash-indexed lookup, plus tasks without a location,
+            # the user's own assignments, and onboarding spawns (placed per-user, checked by keep())
+            tasks_qs = tasks_qs.filter(
+                GeohashIndexed.bbox_q(*viewport)
+                | models.Q(lat__isnull=True)
+                | models.Q(lon__isnull=True)
+                | models.Q(assignee=user)
+                | models.Q(id__in=visibility.user_onboarding_tasks.keys())
+            )
+        return tasks_qs
 
-        # ── Tutorial tasks ──
+    @staticmethod
+    def _tutorial_tasks_queryset(user, visibility, viewport):
         # Include: tutorials user hasn't completed (no reward skill) OR tutorials user owns
         tutorial_tasks_qs = (
             TutorialTask.objects.filter(
@@ -294,38 +332,71 @@ class TaskListView(APIView):
             .select_related('reward_skill')
             .prefetch_related('skill_execute')
         )
+        if viewport is not None:
+            tutorial_tasks_qs = tutorial_tasks_qs.filter(
+                GeohashIndexed.bbox_q(*viewport)
+                | models.Q(lat__isnull=True)
+                | models.Q(lon__isnull=True)
+                | models.Q(id__in=visibility.user_onboarding_tutorials.keys())
+            )
+        return tutorial_tasks_qs
 
-        tutorial_tasks = []
-        for t in tutorial_tasks_qs:
-            if t.id in onboarding_tutorial_ids:
-                if onboarding_in_progress:
-                    uo = user_onboarding_tutorials.get(t.id)
-                    if uo:
-                        t._user_lat = uo.lat
-                        t._user_lon = uo.lon
-                        tutorial_tasks.append(t)
-                # After onboarding complete: hide onboarding tutorials entirely
-            elif onboarding_in_progress:
-                # During onboarding, hide non-onboarding tutorials
-                pass
-            else:
-                tutorial_tasks.append(t)
-        # Batch lookup: which tutorials does this user have in progress?
-        in_progress_ids = set(
-            TutorialProgress.objects.filter(
-                user=user, state=TutorialProgress.State.IN_PROGRESS,
-                tutorial__in=tutorial_tasks,
-            ).values_list('tutorial_id', flat=True)
-        ) if tutorial_tasks else set()
-        tutorial_serializer = TutorialTaskFlatSerializer(
-            tutorial_tasks, many=True,
-            context={'request': request, 'in_progress_ids': in_progress_ids},
-        )
+    @staticmethod
+    async def _delta(request, tasks_qs, keep, since, revision):
+        # Delta mode: changed rows the user can see, and changed ids they can no longer see
+        changed_ids = await TaskChange.achanged_since(since)
+        tasks = [t async for t in tasks_qs.filter(id__in=changed_ids) if keep(t)]
+        return Response({
+            "tasks": await TaskSerializer(tasks, many=True, context={'request': request}).adata(),
+            "removed": sorted(changed_ids - {t.id for t in tasks}),
+            "revision": revision,
+        }, status=status.HTTP_200_OK)
 
-        return Response(
-            {"tasks": list(task_serializer.data) + list(tutorial_serializer.data)},
-            status=status.HTTP_200_OK,
-        )
+    async def _stream(self, request, tasks_qs, tutorial_tasks_qs, keep, revision):
+        yield '{"revision":%d,"tasks":[' % revision
+        separator = ''
+        async for chunk in _achunks(tasks_qs.aiterator(chunk_size=self.STREAM_CHUNK_SIZE), self.STREAM_CHUNK_SIZE):
+            rows = await TaskSerializer([t for t in chunk if keep(t)], many=True, context={'request': request}).adata()
+            if rows:
+                yield separator + ','.join(json.dumps(row, cls=JSONEncoder, separators=(',', ':')) for row in rows)
+                separator = ','
+        async for chunk in _achunks(tutorial_tasks_qs.aiterator(chunk_size=self.STREAM_CHUNK_SIZE), self.STREAM_CHUNK_SIZE):
+            rows = await self._serialize_tutorials(request, [t for t in chunk if keep(t, tutorial=True)])
+            if rows:
+                yield separator + ','.join(json.dumps(row, cls=JSONEncoder, separators=(',', ':')) for row in rows)
+                separator = ','
+        yield ']}'
+
+    @staticmethod
+    async def _serialize_tutorials(request, tutorial_tasks):
+        # Batch lookups for the per-user fields: in progress, awaiting review, and
+        # pending reviews on the user's own tutorials
+        user = request.user
+        in_progress_ids, pending_review_ids, owner_pending_counts = set(), set(), {}
+        if tutorial_tasks:
+            ids = [t.id for t in tutorial_tasks]
+            async for tutorial_id, state, review_status in TutorialProgress.objects.filter(
+                models.Q(state=TutorialProgress.State.IN_PROGRESS) | models.Q(review_status='pending'),
+                user=user, tutorial_id__in=ids,
+            ).values_list('tutorial_id', 'state', 'review_status'):
+                if state == TutorialProgress.State.IN_PROGRESS:
+                    in_progress_ids.add(tutorial_id)
+                if review_status == 'pending':
+                    pending_review_ids.add(tutorial_id)
+            owned_ids = [t.id for t in tutorial_tasks if t.owner_id == user.id]
+            if owned_ids:
+                owner_pending_counts = {
+                    tutorial_id: count async for tutorial_id, count in TutorialReview.objects.filter(
+                        tutorial_id__in=owned_ids, status='pending',
+                    ).values('tutorial_id').annotate(count=models.Count('id')).values_list('tutorial_id', 'count')
+                }
+        return TutorialTaskFlatSerializer(
+            tutorial_tasks, many=True,
+            context={
+                'request': request, 'in_progress_ids': in_progress_ids,
+                'pending_review_ids': pending_review_ids, 'owner_pending_counts': owner_pending_counts,
+            },
+        ).data
 
 class TaskAbandonView(APIView):
     permission_classes = [IsAuthenticated]
@@ -333,7 +404,7 @@ class TaskAbandonView(APIView):
     def post(self, request: Request, task_id: int):
         with transaction.atomic():
             try:
-                task = Task.objects.select_for_update().get(pk=task_id)
+                task = Task.objects.get(pk=task_id)
             except Task.DoesNotExist:
                 return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
             try:
@@ -363,12 +434,11 @@ class TaskAcceptReviewView(APIView):
 
         logger.info("Task %d review accepted by user %d (%s)", task.id, request.user.id, request.user.username)
         # Mark onboarding task as completed if applicable
-        if task.assignee:
-            UserOnboardingTask.objects.filter(user=task.assignee, task=task).update(completed=True)
+        if task.assignee and UserOnboardingTask.objects.filter(user=task.assignee, task=task).update(completed=True):
+            send_tasks_changed(task.assignee_id)
         send_task_update(task, action='accept_review', exclude_user_id=request.user.id)
         # Push stats and achievements to the ASSIGNEE (not the owner who called this)
         if task.assignee:
-            task.assignee.refresh_from_db()
             send_user_stats(task.assignee)
             send_achievements(task.assignee.id, new_achievements)
 
@@ -466,7 +536,11 @@ class TaskCreateView(APIView):
             task.skill_execute.set(data['skill_execute'])
 
         response_serializer = TaskSerializer(task, context={'request': request})
-        send_tasks_changed()
+        send_task_delta([task])
+        new_achievements = user.check_and_award_achievements(Achievement.EVENT_TASK_CREATED)
+        if new_achievements:
+            send_achievements(user.id, new_achievements)
+            send_user_stats(user)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
 
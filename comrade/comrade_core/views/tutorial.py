@@ -6,7 +6,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..models import GlobalConfig, Skill, TutorialTask, TutorialPart, TutorialQuestion, TutorialAnswer, TutorialProgress, TutorialReview, TutorialPartSubmission, UserOnboardingTutorial
+from ..models import Achievement, GlobalConfig, Skill, TutorialTask, TutorialPart, TutorialQuestion, TutorialAnswer, TutorialProgress, TutorialReview, TutorialPartSubmission, UserOnboardingTutorial, UserStats
 from ..serializers import TutorialTaskDetailSerializer
 from ..utils import haversine_km
 from ..ws_events import send_user_stats, send_achievements, send_tutorial_review_accepted, send_tutorial_review_declined, send_tasks_changed
@@ -102,10 +102,13 @@ class TutorialSubmitPartView(APIView):
                 request.user.skills.add(tutorial.reward_skill)
                 progress.state = TutorialProgress.State.DONE
                 progress.save()
-                new_achievements = request.user.check_and_award_achievements()
+                UserStats.record(request.user.id, tutorials_completed=1)
+                new_achievements = request.user.check_and_award_achievements(
+                    Achievement.EVENT_TUTORIAL_COMPLETED, Achievement.EVENT_SKILL_GAINED,
+                )
                 send_user_stats(request.user)
                 send_achievements(request.user.id, new_achievements)
-                send_tasks_changed()
+                send_tasks_changed(request.user.id)
                 logger.info("Tutorial %d completed by user %d (%s) — auto-accepted", tutorial.id, request.user.id, request.user.username)
                 return Response({
                     "completed": True,
@@ -117,7 +120,8 @@ class TutorialSubmitPartView(APIView):
                 progress.review_status = TutorialProgress.ReviewStatus.PENDING
                 progress.save()
                 TutorialReview.objects.get_or_create(tutorial=tutorial, user=request.user, status=TutorialReview.Status.PENDING)
-                send_tasks_changed()
+                send_tasks_changed(request.user.id)
+                send_tasks_changed(tutorial.owner_id)  # owner's pending review count
                 logger.info("Tutorial %d completed by user %d (%s) — pending review by owner %d", tutorial.id, request.user.id, request.user.username, tutorial.owner_id)
                 return Response({
                     "completed": True,
@@ -195,7 +199,7 @@ class TutorialTaskAbandonView(APIView):
         TutorialPartSubmission.objects.filter(progress=progress).delete()
         TutorialReview.objects.filter(tutorial=tutorial, user=request.user, status=TutorialReview.Status.PENDING).delete()
         progress.delete()
-        send_tasks_changed()
+        send_tasks_changed(request.user.id)
 
         return Response({"message": "Tutorial abandoned."}, status=status.HTTP_200_OK)
 
@@ -231,14 +235,17 @@ class TutorialAcceptReviewView(APIView):
         progress.review_status = TutorialProgress.ReviewStatus.ACCEPTED
         progress.state = TutorialProgress.State.DONE
         progress.save()
+        UserStats.record(review.user_id, tutorials_completed=1)
 
         # Award skill and check achievements
         review.user.skills.add(tutorial.reward_skill)
-        new_achievements = review.user.check_and_award_achievements()
+        new_achievements = review.user.check_and_award_achievements(
+            Achievement.EVENT_TUTORIAL_COMPLETED, Achievement.EVENT_SKILL_GAINED,
+        )
         send_user_stats(review.user)
         send_achievements(review.user.id, new_achievements)
         send_tutorial_review_accepted(review.user.id, tutorial.id, tutorial.name, tutorial.reward_skill.name)
-        send_tasks_changed()
+        send_tasks_changed(review.user.id)
 
         logger.info("Tutorial %d review accepted for user %d by owner %d", tutorial.id, review.user.id, request.user.id)
         return Response({
@@ -281,7 +288,7 @@ class TutorialDeclineReviewView(APIView):
             TutorialPartSubmission.objects.filter(progress=progress).delete()
             progress.delete()
         send_tutorial_review_declined(review.user.id, tutorial.id, tutorial.name, review.decline_reason or '')
-        send_tasks_changed()
+        send_tasks_changed(review.user.id)
 
         logger.info("Tutorial %d review declined for user %d by owner %d", tutorial.id, review.user.id, request.user.id)
         return Response({"message": "Tutorial review declined, progress deleted."}, status=status.HTTP_200_OK)
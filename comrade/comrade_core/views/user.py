@@ -1,20 +1,25 @@
-from rest_framework import generics, status
+from adrf.views import APIView as AsyncAPIView
+from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from ..models import User
-from ..serializers import UserDetailSerializer
+from ..models import GlobalConfig, User
+from ..serializers import UserDetailSerializer, aload_skill_names
 
 
-class UserDetailView(generics.RetrieveAPIView):
-    serializer_class = UserDetailSerializer
+class UserDetailView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get_object(self):
-        return self.request.user
+    async def get(self, request):
+        user = request.user
+        await user.arefresh_balances()
+        # Loads this process's config copy, so the level fields below need no query
+        await GlobalConfig.aget_config()
+        serializer = UserDetailSerializer(user, context={'skill_names': await aload_skill_names([user.id])})
+        return Response(serializer.data)
 
 
 @api_view(['GET'])
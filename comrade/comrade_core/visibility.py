@@ -0,0 +1,164 @@
+"""
+Per-user task visibility.
+
+One set of rules shared by the task list endpoint (as a SQL filter) and the
+WebSocket consumer (as an in-memory check against `task_delta` descriptors),
+so both agree on which tasks a user can see.
+
+Rules:
+- During onboarding only the user's spawned onboarding items are visible,
+  at their per-user location.
+- After onboarding, onboarding items are hidden and the onboarding reward
+  skills no longer count towards visibility.
+- Otherwise a task is visible to its owner and assignee, to users with a
+  matching write skill while IN_REVIEW, and to users with a matching read
+  skill (or everyone, if the task has no read skills).
+"""
+
+from django.db import models
+
+from .models import OnboardingTemplate, Task, TutorialProgress, UserOnboardingTask, UserOnboardingTutorial
+
+
+class TaskVisibility:
+    def __init__(self, user):
+        self._set_onboarding(
+            user,
+            OnboardingTemplate.objects.filter(is_active=True).values_list('tutorial_id', 'task_id'),
+            UserOnboardingTutorial.objects.filter(user=user),
+            UserOnboardingTask.objects.filter(user=user),
+        )
+        self._set_onboarding_progress(
+            self._completed_tutorials().values_list('tutorial_id', flat=True) if self.user_onboarding_tutorials else ()
+        )
+        self.effective_skill_ids = set(self._effective_skills().values_list('id', flat=True))
+
+    @classmethod
+    async def aload(cls, user) -> 'TaskVisibility':
+        """TaskVisibility(user) for async views: the same queries through the async ORM."""
+        self = cls.__new__(cls)
+        self._set_onboarding(
+            user,
+            [row async for row in OnboardingTemplate.objects.filter(is_active=True).values_list('tutorial_id', 'task_id')],
+            [uo async for uo in UserOnboardingTutorial.objects.filter(user=user)],
+            [uo async for uo in UserOnboardingTask.objects.filter(user=user)],
+        )
+        self._set_onboarding_progress(
+            [tutorial_id async for tutorial_id in self._completed_tutorials().values_list('tutorial_id', flat=True)]
+            if self.user_onboarding_tutorials else ()
+        )
+        self.effective_skill_ids = {skill_id async for skill_id in self._effective_skills().values_list('id', flat=True)}
+        return self
+
+    def _set_onboarding(self, user, template_rows, user_tutorials, user_tasks):
+        self.user = user
+        self.onboarding_tutorial_ids = set()
+        self.onboarding_task_ids = set()
+        for tutorial_id, task_id in template_rows:
+            if tutorial_id is not None:
+                self.onboarding_tutorial_ids.add(tutorial_id)
+            if task_id is not None:
+                self.onboarding_task_ids.add(task_id)
+
+        # User's spawned onboarding items
+        self.user_onboarding_tutorials = {uo.tutorial_id: uo for uo in user_tutorials}
+        self.user_onboarding_tasks = {uo.task_id: uo for uo in user_tasks}
+
+    def _completed_tutorials(self):
+        return TutorialProgress.objects.filter(
+            user=self.user, state=TutorialProgress.State.DONE,
+            tutorial_id__in=self.user_onboarding_tutorials.keys(),
+        )
+
+    def _set_onboarding_progress(self, completed_tutorial_ids):
+        # Determine if user is still in onboarding
+        # Check tutorials (via TutorialProgress DONE) and tasks (via UserOnboardingTask.completed flag)
+        # The completed flag persists through task respawn, avoiding the re-trigger bug.
+        completed_tutorial_ids = set(completed_tutorial_ids)
+        completed_task_ids = {
+            task_id for task_id, uo in self.user_onboarding_tasks.items() if uo.completed
+        }
+        self.onboarding_in_progress = (
+            set(self.user_onboarding_tutorials.keys()) - completed_tutorial_ids != set()
+            or set(self.user_onboarding_tasks.keys()) - completed_task_ids != set()
+        )
+
+    def _effective_skills(self):
+        # After onboarding, exclude onboarding reward skills from visibility/permission checks
+        # so onboarding-gated tasks don't leak into the normal task list
+        skills = self.user.skills.all()
+        if not self.onboarding_in_progress:
+            skills = skills.exclude(id__in=OnboardingTemplate.objects.filter(
+                is_active=True, tutorial__isnull=False,
+            ).values('tutorial__reward_skill_id'))
+        return skills
+
+    def tasks_q(self) -> models.Q:
+        """Skill/ownership filter for Task querysets. Onboarding rules are applied by `visible()`.
+
+        Public tasks come from the indexed is_public flag, and skill matches are
+        `id IN` subqueries on the skill side of the M2M tables, so the filter
+        needs no joins and no DISTINCT.
+        """
+        q = models.Q(is_public=True) | models.Q(owner=self.user) | models.Q(assignee=self.user)
+        if self.effective_skill_ids:
+            q |= models.Q(id__in=Task.skill_read.through.objects.filter(
+                skill_id__in=self.effective_skill_ids,
+            ).values('task_id'))
+            q |= models.Q(state=Task.State.IN_REVIEW, id__in=Task.skill_write.through.objects.filter(
+                skill_id__in=self.effective_skill_ids,
+            ).values('task_id'))
+        return q
+
+    def user_location(self, task_id: int, tutorial: bool = False) -> tuple[float, float] | None:
+        """Per-user (lat, lon) of an onboarding item, or None if it is not visible to this user.
+
+        Only meaningful for ids in onboarding_task_ids / onboarding_tutorial_ids.
+        """
+        if not self.onboarding_in_progress:
+            # After onboarding complete: hide onboarding items entirely
+            return None
+        uo = (self.user_onboarding_tutorials if tutorial else self.user_onboarding_tasks).get(task_id)
+        return (uo.lat, uo.lon) if uo else None
+
+    def visible(self, item, tutorial: bool = False) -> bool:
+        """Apply the onboarding rules to a task or tutorial that already passed the SQL filter.
+
+        Onboarding items that are visible get their per-user location set
+        as _user_lat/_user_lon for the serializers.
+        """
+        onboarding_ids = self.onboarding_tutorial_ids if tutorial else self.onboarding_task_ids
+        if item.id in onboarding_ids:
+            location = self.user_location(item.id, tutorial=tutorial)
+            if location is None:
+                return False
+            item._user_lat, item._user_lon = location
+            return True
+        # During onboarding, hide non-onboarding items
+        return not self.onboarding_in_progress
+
+    def descriptor_visible(self, descriptor: dict) -> bool:
+        """In-memory equivalent of tasks_q() + visible() for a `task_descriptor()`."""
+        if descriptor['id'] in self.onboarding_task_ids:
+            return self.user_location(descriptor['id']) is not None
+        if self.onboarding_in_progress:
+            return False
+        return (
+            descriptor['owner'] == self.user.id
+            or descriptor['assignee'] == self.user.id
+            or (descriptor['state'] == Task.State.IN_REVIEW and not self.effective_skill_ids.isdisjoint(descriptor['skillWrite']))
+            or not descriptor['skillRead']
+            or not self.effective_skill_ids.isdisjoint(descriptor['skillRead'])
+        )
+
+
+def task_descriptor(task) -> dict:
+    """The fields visibility depends on, shipped alongside each row in `task_delta` events."""
+    return {
+        'id': task.id,
+        'owner': task.owner_id,
+        'assignee': task.assignee_id,
+        'state': task.state,
+        'skillRead': [s.id for s in task.skill_read.all()],
+        'skillWrite': [s.id for s in task.skill_write.all()],
+    }
@@ -0,0 +1,145 @@
+"""
+WebSocket wire formats, negotiated per connection with `?proto=`.
+
+- `json` (default): the verbose JSON events documented in DOCS.md.
+- `compact`: JSON with short top-level keys and short type codes.
+- `msgpack`: the compact events as MessagePack binary frames.
+
+Fan-out events (locations, chat, task updates) travel through the channel
+layer as the plain event tagged with a frame id (`fanout()`); the first
+consumer in a process to deliver it encodes it for its protocol and the
+other sockets of that process reuse the frame (`frame_for()`) instead of
+re-serializing the event per socket. Clients may send in their own protocol; inbound messages are
+expanded back to the verbose keys.
+
+Connections that opt in to batching receive the events of each tick as one
+`batch` frame (`encode_batch()`), built from the already-encoded events.
+"""
+
+import json
+import uuid
+
+import msgpack
+
+PROTOCOLS = ('json', 'compact', 'msgpack')
+DEFAULT_PROTOCOL = 'json'
+
+_SHORT_KEYS = {
+    'type': 't',
+    'userId': 'u',
+    'name': 'n',
+    'latitude': 'la',
+    'longitude': 'lo',
+    'accuracy': 'a',
+    'timestamp': 'ts',
+    'friends': 'f',
+    'skills': 's',
+    'profilePicture': 'p',
+    'message': 'm',
+    'sender': 'se',
+    'msgId': 'i',
+    'taskId': 'ti',
+    'state': 'st',
+    'assignee': 'as',
+    'assigneeName': 'an',
+    'owner': 'o',
+    'datetimeStart': 'ds',
+    'datetimeFinish': 'df',
+    'datetimePaused': 'dp',
+    'action': 'ac',
+    'events': 'e',
+}
+_LONG_KEYS = {short: key for key, short in _SHORT_KEYS.items()}
+
+_SHORT_TYPES = {
+    'friend_location': 'fl',
+    'public_location': 'pl',
+    'location_update': 'lu',
+    'user_offline': 'uo',
+    'friend_online': 'fo',
+    'chat_message': 'cm',
+    'task_update': 'tu',
+    'heartbeat': 'hb',
+    'heartbeat_response': 'hr',
+    'batch': 'b',
+}
+_LONG_TYPES = {short: type_ for type_, short in _SHORT_TYPES.items()}
+
+_FRAME_ID = 'frameId'
+_FRAME_CACHE_SIZE = 1024
+_frame_cache = {}
+
+
+def compact(event: dict) -> dict:
+    """Shorten the top-level keys and the type of an event."""
+    out = {_SHORT_KEYS.get(key, key): value for key, value in event.items()}
+    if 't' in out:
+        out['t'] = _SHORT_TYPES.get(out['t'], out['t'])
+    return out
+
+
+def expand(message: dict) -> dict:
+    """Inverse of compact() (including the events of a batch); verbose messages pass through unchanged."""
+    out = {_LONG_KEYS.get(key, key): value for key, value in message.items()}
+    if 'type' in out:
+        out['type'] = _LONG_TYPES.get(out['type'], out['type'])
+    if out.get('type') == 'batch' and isinstance(out.get('events'), list):
+        out['events'] = [expand(e) if isinstance(e, dict) else e for e in out['events']]
+    return out
+
+
+def encode(event: dict, protocol: str) -> str | bytes:
+    """Serialize an event for a socket speaking protocol (str for text frames, bytes for binary)."""
+    if protocol == 'msgpack':
+        return msgpack.packb(compact(event), use_bin_type=True)
+    if protocol == 'compact':
+        return json.dumps(compact(event), separators=(',', ':'))
+    return json.dumps(event)
+
+
+def decode(text_data: str | None = None, bytes_data: bytes | None = None) -> dict | None:
+    """Parse an inbound frame in any protocol; None if it is not a valid message."""
+    try:
+        if bytes_data is not None:
+            message = msgpack.unpackb(bytes_data, raw=False)
+        else:
+            message = json.loads(text_data)
+    except (ValueError, TypeError, msgpack.UnpackException):
+        return None
+    if not isinstance(message, dict):
+        return None
+    return expand(message)
+
+
+def encode_batch(frames: list, protocol: str) -> str | bytes:
+    """Wrap already-encoded frames of one protocol in a single `batch` frame without re-encoding them."""
+    if protocol == 'msgpack':
+        packer = msgpack.Packer(use_bin_type=True)
+        return (
+            packer.pack_map_header(2) + packer.pack('t') + packer.pack(_SHORT_TYPES['batch'])
+            + packer.pack('e') + packer.pack_array_header(len(frames)) + b''.join(frames)
+        )
+    if protocol == 'compact':
+        return '{"t":"%s","e":[%s]}' % (_SHORT_TYPES['batch'], ','.join(frames))
+    return '{"type": "batch", "events": [%s]}' % ', '.join(frames)
+
+
+def fanout(event: dict) -> dict:
+    """Tag an event with a frame id, so the consumers of one process encode it only once per protocol."""
+    return {**event, _FRAME_ID: uuid.uuid4().hex}
+
+
+def frame_for(event: dict, protocol: str) -> str | bytes:
+    """Encode an event for protocol, reusing the frame of a fan-out event already encoded in this process."""
+    frame_id = event.get(_FRAME_ID)
+    if frame_id is None:
+        return encode(event, protocol)
+    key = (frame_id, protocol)
+    frame = _frame_cache.get(key)
+    if frame is None:
+        frame = encode({k: v for k, v in event.items() if k != _FRAME_ID}, protocol)
+        if len(_frame_cache) >= _FRAME_CACHE_SIZE:
+            # Evict the oldest entry; fan-out events are delivered within moments of each other
+            del _frame_cache[next(iter(_frame_cache))]
+        _frame_cache[key] = frame
+    return frame
@@ -3,28 +3,115 @@ WebSocket event broadcast utilities.
 
 Call these from synchronous Django views to push real-time events
 to connected users via the LocationConsumer channel groups.
+
+Events are sent after the current transaction commits and dropped if it
+rolls back. Inside a batched() block (every HTTP request, via
+WebSocketEventsMiddleware, and each scheduler pass) committed events are
+collected and sent together on exit, in one async_to_sync hop with the
+group sends running concurrently, instead of one hop per event. Async
+requests use abatched(), which awaits the sends directly.
 """
 
+import asyncio
+import logging
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from django.db import transaction
+
+from . import wire
+
+logger = logging.getLogger(__name__)
+
+# (group, event) pairs committed inside the current batched() block
+_pending: ContextVar[list | None] = ContextVar('ws_events_pending', default=None)
+
+
+async def _group_send_all(messages):
+    channel_layer = get_channel_layer()
+    await asyncio.gather(*(channel_layer.group_send(group, event) for group, event in messages))
+
+
+def _flush(messages):
+    if messages:
+        async_to_sync(_group_send_all)(messages)
+
+
+def _deliver(group: str, event: dict):
+    pending = _pending.get()
+    if pending is None:
+        _flush([(group, event)])
+    elif (group, event) not in pending:
+        pending.append((group, event))
+
+
+def _send(group: str, event: dict):
+    """Send an event to a channel group once the current transaction commits."""
+    transaction.on_commit(lambda: _deliver(group, event), robust=True)
 
 
 def _send_to_user(user_id: int, event: dict):
     """Send a WebSocket event to a specific user's channel group."""
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(f"location_{user_id}", event)
+    _send(f"location_{user_id}", event)
+
+
+@contextmanager
+def batched():
+    """Collect the events committed inside the block and send them together on exit.
+
+    Nested blocks join the outermost one.
+    """
+    if _pending.get() is not None:
+        yield
+        return
+    pending = []
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+        try:
+            _flush(pending)
+        except Exception:
+            logger.exception("Sending %d WebSocket event(s) failed", len(pending))
+
+
+@asynccontextmanager
+async def abatched():
+    """batched() for async callers: the collected events are awaited on exit, not sent via async_to_sync.
+
+    Sync code run from inside the block (sync_to_async) sees the same batch.
+    """
+    if _pending.get() is not None:
+        yield
+        return
+    pending = []
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+        if pending:
+            try:
+                await _group_send_all(pending)
+            except Exception:
+                logger.exception("Sending %d WebSocket event(s) failed", len(pending))
 
 
 def _display_name(user) -> str:
     return f"{user.first_name} {user.last_name}".strip() or user.username
 
 
-def send_task_update(task, action: str, exclude_user_id: int | None = None):
+def send_task_update(task, action: str, exclude_user_id: int | None = None, notify_user_ids=()):
     """Broadcast task state change to owner and assignee (excluding the actor).
 
-    Also sends tasks_changed to all connected users so their task lists refresh.
+    notify_user_ids adds recipients that are no longer on the task (e.g. the
+    previous assignee of a task reset by the scheduler).
+    Also sends a task_delta with the changed row to all connected users.
     """
-    event = {
+    event = wire.fanout({
         "type": "task_update",
         "taskId": task.id,
         "state": task.state,
@@ -35,8 +122,8 @@ def send_task_update(task, action: str, exclude_user_id: int | None = None):
         "datetimeFinish": task.datetime_finish.isoformat() if task.datetime_finish else None,
         "datetimePaused": task.datetime_paused.isoformat() if task.datetime_paused else None,
         "action": action,
-    }
-    recipients = set()
+    })
+    recipients = set(notify_user_ids)
     if task.owner_id:
         recipients.add(task.owner_id)
     if task.assignee_id:
@@ -45,12 +132,38 @@ def send_task_update(task, action: str, exclude_user_id: int | None = None):
         recipients.discard(exclude_user_id)
     for uid in recipients:
         _send_to_user(uid, event)
-    # Notify all users that task list has changed
-    send_tasks_changed()
+    send_task_delta([task])
+
+
+def send_task_delta(tasks, removed_ids=()):
+    """Broadcast changed task rows to all connected users.
+
+    Each row travels with its visibility descriptor; every consumer filters
+    the rows against its own user's visibility in memory, so a change costs
+    one serialization instead of one task-list fetch per connected user.
+    Consumers that did not opt in to deltas forward it as `tasks_changed`.
+    Rows are serialized against SITE_URL, so file URLs and row cache entries
+    match the REST task list.
+    """
+    from django.conf import settings
+    from .serializers import SiteRequest, TaskSerializer
+    from .visibility import task_descriptor
+
+    context = {'request': SiteRequest(settings.SITE_URL)} if settings.SITE_URL else {}
+    _send('public_locations', {
+        "type": "task_delta",
+        "revision": max([t.revision for t in tasks], default=0),
+        "tasks": [
+            {"row": TaskSerializer(t, context=context).data, "visibility": task_descriptor(t)}
+            for t in tasks
+        ],
+        "removed": list(removed_ids),
+    })
 
 
 def send_user_stats(user):
-    """Push updated coins/XP/level/skills to a specific user."""
+    """Push updated coins/XP/level/skills to a specific user (balances already on the instance are not re-read)."""
+    user.ensure_balances()
     event = {
         "type": "user_stats_update",
         "coins": float(user.coins),
@@ -99,16 +212,33 @@ def send_tutorial_review_declined(user_id: int, tutorial_id: int, tutorial_name:
     })
 
 
-def send_tasks_changed():
-    """Broadcast to all connected users that the task list has changed.
+def send_tasks_changed(user_id: int | None = None):
+    """Tell clients that their task list has changed and must be re-fetched.
 
     This is a lightweight signal — the frontend debounces and re-fetches /api/tasks/.
-    Use for changes that affect task visibility across multiple users (e.g., task creation,
-    state changes, skill-based visibility changes).
+    Pass user_id for changes that only affect what one user can see (skills gained,
+    onboarding progress); without it the signal goes to every connected user, which
+    is meant for changes outside the task change feed (e.g., tutorial creation).
+    Task row changes go through send_task_delta() instead.
     """
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)('public_locations', {
-        "type": "tasks_changed",
+    event = {"type": "tasks_changed"}
+    if user_id is not None:
+        _send_to_user(user_id, event)
+        return
+    _send('public_locations', event)
+
+
+def send_config_changed():
+    """Tell every WebSocket process that GlobalConfig changed, so they reload it now."""
+    _send('public_locations', {"type": "config_changed"})
+
+
+def send_presence(user_id: int, online=(), offline=()):
+    """Send a user one batched presence change for several of their friends."""
+    _send_to_user(user_id, {
+        "type": "presence_update",
+        "online": list(online),
+        "offline": list(offline),
     })
 
 